@@ -2,10 +2,30 @@ import streamlit as st
 import joblib
 import numpy as np
 import pandas as pd  # Importar Pandas
-import shap
-import matplotlib.pyplot as plt
-from traditional_method import calculate_traditional_fs
+from traditional_method import TRIGGERING_METHODS, calculate_traditional_fs, evaluate_methods
+from risk_classification import classify_confidence, classify_risk, classify_fs
+from instrumentation import metrics
+from compiled_forest import load_predictor, load_scaler, predict_distribution
+from forest_compaction import COMPACTION_REPORT_FILE
+from model_versions import active_version, artifact_paths, read_manifest, servable_variants
+from profile_analysis import analyze_profile, plot_profile_png, profile_template
+from scenario_sweep import AXIS_LABELS, SWEEP_AXES, evaluate_scenario_grid, grid_slice, plot_sweep_png
+from inverse_solver import THRESHOLD_VARIABLES, solve_thresholds
+from monte_carlo import (
+    FACTOR_KEYS, UNCERTAINTY_COLUMNS, default_cov, load_case_histories, plot_monte_carlo_png, run_monte_carlo,
+)
+from global_explanations import GlobalExplanations
+from case_index import CaseIndex
+from session_history import HISTORY_MAX_SIZE, AnalysisHistory, SessionWorkDir, compact_result
+from pdf_reports import generate_reports
+from regional_map import MAP_VARIABLES, grid_from_csv, plot_regional_map_png, run_regional, synthetic_grid
+from batch_analysis import (
+    FEATURE_ORDER_IA, KPA_TO_PSF, analyze_batch, batch_template, build_ia_features, read_batch_file,
+)
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import json
+import os
 import time
 
 # --- 1. Configuración de la Página ---
@@ -16,15 +36,32 @@ st.set_page_config(
 )
 
 # --- 2. Funciones de Carga y Clasificación ---
-@st.cache_resource
-def load_artifacts():
+# Nombres de las variantes del modelo en la barra lateral
+VARIANT_LABELS = {
+    "completo": "Completo (todos los árboles)",
+    "compacto": "Compacto (menor latencia)",
+}
+
+# Los recursos del modelo se memorizan por (variante, versión): al publicarse una
+# versión nueva la clave cambia y las versiones anteriores salen del cache
+ARTIFACT_CACHE_ENTRIES = 4
+
+@st.cache_resource(max_entries=ARTIFACT_CACHE_ENTRIES)
+def load_artifacts(variant="completo", version=None):
     """
     Carga el modelo de ML y el scaler desde los archivos.
-    Usa cache para que solo se carguen una vez.
+    Usa cache para que solo se carguen una vez (por variante y versión del modelo).
+
+    Si existe el bosque compilado ('modelo_rf_arrays/') se usa para la
+    predicción: sus arrays se abren con mmap_mode (compartidos entre procesos)
+    y scikit-learn no se importa al inicio. Los lotes de más de
+    LARGE_BATCH_ROWS filas se evalúan con el pickle de scikit-learn, que es
+    más rápido en lotes grandes.
     """
+    model_path, scaler_path, compiled_path = artifact_paths(variant, version)
     try:
-        model = joblib.load("modelo_rf.joblib")
-        scaler = joblib.load("scaler.joblib")
+        model = load_predictor(compiled_path, model_path)
+        scaler = load_scaler(compiled_path, scaler_path)
         return model, scaler
     except FileNotFoundError:
         st.error(
@@ -36,32 +73,175 @@ def load_artifacts():
         st.error(f"Error al cargar artefactos: {e}")
         st.stop()
 
-def classify_risk(prob):
+@st.cache_resource(max_entries=ARTIFACT_CACHE_ENTRIES)
+def load_sklearn_model(variant="completo", version=None):
+    """Carga el RandomForest de scikit-learn (solo necesario para SHAP)."""
+    return joblib.load(artifact_paths(variant, version)[0])
+
+@st.cache_resource(max_entries=ARTIFACT_CACHE_ENTRIES)
+def load_explainer(variant="completo", version=None):
     """
-    Clasifica la probabilidad de licuefacción (0.0 a 1.0) en etiquetas de riesgo
-    basadas en la escala provista.
+    Construye el TreeExplainer de SHAP una sola vez por proceso y lo envuelve
+    en un cache LRU de explicaciones y gráficos (PNG) por vector de entrada.
+    shap y matplotlib se importan aquí, solo cuando se pide una explicación.
     """
-    # La probabilidad (prob) debe estar entre 0.0 y 1.0
-
-    if prob >= 0.80:
-        return "Riesgo Muy Alto" 
-    elif prob >= 0.50:
-        return "Riesgo Alto" 
-    elif prob >= 0.20:
-        return "Riesgo Moderado"
-    else: # Esto cubre el rango de 0.00 a 0.199... (0-20%)
-        return "Riesgo Bajo"
-
-def classify_fs(fs):
-    """Clasifica el Factor de Seguridad (FS) en etiquetas de riesgo."""
-    if fs is None:
-        return "Error"
-    if fs < 1.0:
-        return "Licuefactible"
-    elif fs < 1.3:
-        return "Licuefacción Marginal"
-    else:
-        return "No Licuefactible"
+    import shap
+    from explanation_cache import ExplanationCache
+
+    with metrics.stage("explainer_build"):
+        explainer = shap.TreeExplainer(load_sklearn_model(variant, version))
+    return ExplanationCache(explainer, FEATURE_ORDER_IA, maxsize=256)
+
+@st.cache_resource(max_entries=ARTIFACT_CACHE_ENTRIES)
+def load_global_explanations(variant="completo", version=None):
+    """
+    Valores SHAP precalculados de los casos de mmc2.csv para la variante del
+    modelo (generados con `python save_model.py --explicaciones`; en las
+    versiones incrementales incluyen los casos agregados). None si no existen.
+    """
+    try:
+        return GlobalExplanations.load(artifact_paths(variant, version)[2])
+    except FileNotFoundError:
+        return None
+
+@st.cache_resource(max_entries=ARTIFACT_CACHE_ENTRIES)
+def load_case_index(version=None):
+    """Índice KD-tree de los casos históricos (generado con los artefactos). None si no existe."""
+    try:
+        return CaseIndex.load(artifact_paths("completo", version)[2])
+    except FileNotFoundError:
+        return None
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def render_regional_map(grid_path, output_path, variable, run_id):
+    # run_id distingue ejecuciones sobre el mismo directorio de salida
+    return plot_regional_map_png(grid_path, output_path, variable)
+
+
+@st.cache_data
+def load_cases_for_monte_carlo():
+    """Casos de mmc2.csv con sus desviaciones estándar y el CoV mediano por variable."""
+    cases = load_case_histories()
+    return cases, default_cov(cases)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def compute_scenario_grid(soil, a_max_range, Mw_range, n1_range, variant="completo", version=None):
+    """
+    Grilla a_max × Mw × N1_60_cs memorizada por conjunto de parámetros del suelo,
+    rangos y versión del modelo; cambiar solo los ejes del gráfico reutiliza la grilla.
+    Cada rango es una tupla (mínimo, máximo, número de puntos).
+    """
+    model, scaler = load_artifacts(variant, version)
+    return evaluate_scenario_grid(
+        dict(soil), np.linspace(*a_max_range), np.linspace(*Mw_range), np.linspace(*n1_range), model, scaler
+    )
+
+def compact_model_help():
+    """
+    Ayuda del selector de modelo: solo afirma la concordancia del modelo
+    compacto si pasó la validación fuera de muestra de reporte_compactacion.json.
+    """
+    try:
+        with open(COMPACTION_REPORT_FILE, encoding="utf-8") as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return "El modelo compacto usa un subconjunto de los árboles del completo."
+    validation = report.get("validacion")
+    if validation is not None and validation["cumple_tolerancia"]:
+        return (
+            f"El modelo compacto usa {len(report['arboles_elegidos'])} árboles que concuerdan con el completo "
+            f"dentro de la tolerancia ({report['tolerancia']:.2f}) también en casos no usados para elegirlos "
+            "y en sus versiones perturbadas (ver reporte_compactacion.json)."
+        )
+    if validation is None:
+        return (
+            "El modelo compacto usa un subconjunto de los árboles del completo; su concordancia no se verificó "
+            "fuera de los casos de selección (regenérelo con `python save_model.py --compactar`)."
+        )
+    worst = max(validation["retenidos"]["max_abs_diff"], validation["perturbados"]["max_abs_diff"])
+    return (
+        f"El modelo compacto usa {len(report['arboles_elegidos'])} árboles elegidos sobre una parte de los casos. "
+        f"Fuera de ellos no cumple la tolerancia ({report['tolerancia']:.2f}): la probabilidad difiere hasta "
+        f"{worst:.2f} del modelo completo en casos retenidos o perturbados (ver reporte_compactacion.json)."
+    )
+
+def get_history():
+    """Historial de análisis individuales de la sesión actual (acotado)."""
+    if 'history' not in st.session_state:
+        st.session_state['history'] = AnalysisHistory(HISTORY_MAX_SIZE)
+    return st.session_state['history']
+
+# Los reportes PDF se generan en segundo plano para no bloquear la ejecución del
+# script; cada sesión guarda su Future y lo consulta en las ejecuciones siguientes
+REPORT_JOBS = 2
+REPORT_POLL_SECONDS = 1.0
+
+@st.cache_resource
+def get_report_executor():
+    """Ejecutor compartido por todas las sesiones para generar reportes PDF."""
+    return ThreadPoolExecutor(max_workers=REPORT_JOBS, thread_name_prefix="reportes_pdf")
+
+def submit_reports(df_out, zip_path, consolidated, variant, version):
+    """Lanza `generate_reports` en segundo plano y guarda el trabajo en la sesión."""
+    progress = {"hechos": 0, "total": 0}
+    future = get_report_executor().submit(
+        generate_reports, df_out, zip_path, consolidated=consolidated, variant=variant, version=version,
+        progress=lambda done, total: progress.update(hechos=done, total=total),
+    )
+    st.session_state['report_job'] = {"future": future, "zip": zip_path, "progress": progress}
+
+def render_report_job():
+    """
+    Avance del reporte en curso. Se ejecuta como fragmento cada
+    REPORT_POLL_SECONDS mientras el trabajo no termina; al terminar guarda el
+    resultado (o el error) en 'batch_reports' y vuelve a ejecutar la app.
+    """
+    job = st.session_state.get('report_job')
+    if job is None:
+        return
+    if not job["future"].done():
+        done, total = job["progress"]["hechos"], job["progress"]["total"]
+        st.progress(done / total if total else 0.0, text=f"Generando reportes... bloques de sitios: {done}/{total}")
+        return
+    st.session_state.pop('report_job')
+    try:
+        st.session_state['batch_reports'] = {"zip": job["zip"], "summary": job["future"].result()}
+    except Exception as e:
+        st.session_state['batch_reports'] = {"zip": job["zip"], "error": str(e)}
+    st.rerun()
+
+def get_work_dir(key, prefix):
+    """Directorio de trabajo de la sesión para `key` (uno por sesión; ver SessionWorkDir)."""
+    if key not in st.session_state:
+        st.session_state[key] = SessionWorkDir(prefix)
+    return st.session_state[key]
+
+def render_diagnostics():
+    """Panel con los tiempos por etapa y los aciertos de cache acumulados en este proceso."""
+    with st.expander("🔧 Diagnóstico de rendimiento", expanded=True):
+        stages, counters = metrics.snapshot()
+        if not stages and not counters:
+            st.info("Aún no hay métricas. Ejecute un análisis para registrar tiempos.")
+            return
+        if stages:
+            st.markdown("**Tiempos por etapa (proceso actual)**")
+            st.dataframe(
+                pd.DataFrame.from_dict(stages, orient="index")[["n", "last_ms", "mean_ms", "max_ms", "total_ms"]]
+                .rename(columns={"n": "llamadas", "last_ms": "última [ms]", "mean_ms": "media [ms]",
+                                 "max_ms": "máx. [ms]", "total_ms": "total [ms]"})
+                .round(2),
+                use_container_width=True,
+            )
+        if counters:
+            st.markdown("**Caches**")
+            df_counters = pd.DataFrame.from_dict(counters, orient="index")
+            df_counters["tasa de acierto [%]"] = (
+                100 * df_counters["hits"] / (df_counters["hits"] + df_counters["misses"])
+            ).round(1)
+            st.dataframe(df_counters.rename(columns={"hits": "aciertos", "misses": "fallos"}),
+                         use_container_width=True)
+        if st.button("Reiniciar métricas"):
+            metrics.reset()
 
 # --- 3. Función Principal de la App ---
 def main():
@@ -114,11 +294,6 @@ def main():
         unsafe_allow_html=True,
     )
 
-    # Cargar modelo y scaler
-    model, scaler = load_artifacts()
-    if model is None or scaler is None:
-        return
-
     # --- Barra Lateral (Sidebar) ---
     st.sidebar.header("Acerca de GeoLiquefAI")
     st.sidebar.info(
@@ -140,6 +315,28 @@ def main():
         "realizado por un ingeniero calificado. Los resultados son "
         "referenciales."
     )
+    # Variante del modelo: la compacta aparece si se generó con `python save_model.py --compactar`
+    # y no hay una versión incremental activa (se deriva del bosque base)
+    variants = servable_variants() or ["completo"]
+    model_variant = st.sidebar.selectbox(
+        "Modelo de IA", variants, format_func=VARIANT_LABELS.get,
+        help=compact_model_help(),
+    )
+    # Versión publicada del modelo (actualizaciones incrementales): se relee en cada
+    # ejecución, de modo que una versión nueva se usa sin reiniciar la app
+    model_version = active_version(model_variant)
+    if model_version is not None:
+        manifest = read_manifest(model_version)
+        st.sidebar.caption(
+            f"Versión del modelo: {model_version} ({manifest['arboles'][1]} árboles, "
+            f"{manifest['casos_agregados']} casos agregados)"
+        )
+    show_diagnostics = st.sidebar.checkbox("Mostrar diagnóstico de rendimiento", value=False)
+
+    # Cargar modelo y scaler
+    model, scaler = load_artifacts(model_variant, model_version)
+    if model is None or scaler is None:
+        return
 
     # --- Título Principal ---
     st.title("🌎 GeoLiquefAI: Evaluador de Riesgo de Licuefacción")
@@ -148,7 +345,10 @@ def main():
     )
 
     # --- CAMBIO: Diseño de Pestañas (v20) ---
-    tab1, tab2 = st.tabs(["📝 Ingreso de Datos", "📊 Resultados del Análisis"])
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(
+        ["📝 Ingreso de Datos", "📊 Resultados del Análisis", "📁 Análisis por Lotes", "🧱 Perfil de Sondeo",
+         "🎲 Análisis Probabilístico", "🗺️ Barrido de Escenarios", "🏙️ Mapa Regional"]
+    )
 
     # --- PESTAÑA 1: INGRESO DE DATOS ---
     with tab1:
@@ -220,22 +420,25 @@ def main():
         if submit_button:
             with st.spinner("Realizando cálculos... 🤖"):
                 # Conversión de kPa a PSF para el modelo de IA
-                KPA_TO_PSF = 20.8854
                 estres_v_ef_psf_para_ia = input_dict["estres_v_ef"] * KPA_TO_PSF
                 
                 # --- 1. Predicción del Modelo de IA ---
-                feature_order_ia = ["N1_60_cs", "FC", "D50", "a_max", "estres_v_ef", "Mw"]
+                feature_order_ia = FEATURE_ORDER_IA
                 input_dict_ia = input_dict.copy()
                 input_dict_ia["estres_v_ef"] = estres_v_ef_psf_para_ia
                 
                 proba_ia = None
                 risk_label_ia = "Error"
                 x_scaled = None
+                uncertainty = None
                 
                 try:
                     x_ia = np.array([[input_dict_ia[k] for k in feature_order_ia]])
                     x_scaled = scaler.transform(x_ia)
-                    proba_ia = float(model.predict_proba(x_scaled)[0][1])
+                    # Probabilidad y dispersión entre árboles en un solo recorrido del bosque
+                    with metrics.stage("predict_proba", rows=1):
+                        uncertainty = {key: float(values[0]) for key, values in predict_distribution(model, x_scaled).items()}
+                    proba_ia = uncertainty.pop("proba_ia")
                     risk_label_ia = classify_risk(proba_ia)
                 except Exception as e:
                     st.error(f"Error en la predicción de IA: {e}")
@@ -245,42 +448,35 @@ def main():
                 risk_label_trad = "Error"
                 trad_results = {}
                 try:
-                    trad_results = calculate_traditional_fs(input_dict)
+                    with metrics.stage("traditional_fs", rows=1):
+                        trad_results = calculate_traditional_fs(input_dict)
                     fs_trad = trad_results.get("FS_trad")
                     risk_label_trad = classify_fs(fs_trad)
                 except Exception as e:
                     st.error(f"Error en el cálculo tradicional: {e}")
 
-                # --- 3. Gráfico SHAP ---
-                shap_fig = None
+                # --- 3. Valores SHAP (cacheados por vector de entrada) ---
+                explanation = None
                 if x_scaled is not None:
                     try:
-                        explainer = shap.TreeExplainer(model)
-                        x_scaled_df = pd.DataFrame(x_scaled, columns=feature_order_ia)
-                        explanation = explainer(x_scaled_df)
-                        explanation_class_1 = explanation[0, :, 1]
-                        
-                        fig, ax = plt.subplots(figsize=(8, 6))
-                        shap.waterfall_plot(
-                            explanation_class_1,
-                            max_display=len(feature_order_ia),
-                            show=False
-                        )
-                        shap_fig = fig
+                        explanation = load_explainer(model_variant, model_version).explain(x_scaled[0])
                     except Exception as e:
-                        st.error(f"Error en la generación del gráfico SHAP: {e}")
+                        st.error(f"Error en el cálculo de los valores SHAP: {e}")
                 
-                # --- Guardar TODO en st.session_state ---
-                st.session_state['analysis_complete'] = True
-                st.session_state['results'] = {
-                    "input_dict": input_dict,
-                    "proba_ia": proba_ia,
-                    "risk_label_ia": risk_label_ia,
-                    "fs_trad": fs_trad,
-                    "risk_label_trad": risk_label_trad,
-                    "trad_results": trad_results,
-                    "shap_fig": shap_fig
-                }
+                # --- 4. Umbrales críticos (FS = 1 y p = 0.5) ---
+                thresholds = {}
+                try:
+                    with metrics.stage("thresholds", rows=1):
+                        thresholds = solve_thresholds(pd.DataFrame([input_dict]), model, scaler).iloc[0].to_dict()
+                except Exception as e:
+                    st.error(f"Error en el cálculo de umbrales críticos: {e}")
+
+                # --- Guardar en el historial de la sesión (forma compacta, sin figuras) ---
+                get_history().add(compact_result(
+                    input_dict, proba_ia, risk_label_ia, fs_trad, risk_label_trad,
+                    trad_results, thresholds, x_scaled=x_scaled, explanation=explanation,
+                    model_variant=model_variant, uncertainty=uncertainty, model_version=model_version,
+                ))
             
             st.success("¡Análisis completado! Revise la pestaña 'Resultados del Análisis'.")
 
@@ -289,18 +485,33 @@ def main():
     with tab2:
         st.markdown("---")
         # Verificar si hay resultados en la sesión
-        if not st.session_state.get('analysis_complete', False):
+        history = get_history()
+        if not len(history):
             st.info("Presione 'Analizar' en la pestaña 'Ingreso de Datos' para ver los resultados.")
         else:
-            # Si hay resultados, cargarlos desde la sesión
-            results = st.session_state['results']
+            # Si hay resultados, cargarlos desde el historial (por defecto el más reciente)
+            history_ids = history.ids()
+            col_hist, col_clear = st.columns([4, 1])
+            with col_hist:
+                selected_id = st.selectbox(
+                    f"Análisis de esta sesión (se conservan los últimos {history.maxsize})",
+                    history_ids,
+                    format_func=lambda i: (
+                        f"#{i} - {history.get(i)['timestamp']} - "
+                        f"{history.get(i)['risk_label_ia']} / {history.get(i)['risk_label_trad']}"
+                    ),
+                )
+            with col_clear:
+                if st.button("Borrar historial", use_container_width=True):
+                    history.clear()
+                    st.rerun()
+            results = history.get(selected_id)
             input_dict = results["input_dict"]
             proba_ia = results["proba_ia"]
             risk_label_ia = results["risk_label_ia"]
             fs_trad = results["fs_trad"]
             risk_label_trad = results["risk_label_trad"]
             trad_results = results["trad_results"]
-            shap_fig = results["shap_fig"]
 
             st.markdown("<h4>Resultados del Análisis</h4>", unsafe_allow_html=True) # CAMBIO: Tamaño de fuente
 
@@ -334,6 +545,25 @@ def main():
                         delta=risk_label_ia,
                     )
                     st.progress(proba_ia)
+                    uncertainty = results.get("uncertainty")
+                    if uncertainty:
+                        agreement = uncertainty["acuerdo_votos"]
+                        st.metric(
+                            label="Acuerdo entre árboles",
+                            value=f"{agreement * 100:.1f} %",
+                            delta=classify_confidence(agreement),
+                            delta_color="off",
+                            help="Fracción de los árboles del bosque que votan la misma clase (p ≥ 0.5) que el promedio.",
+                        )
+                        st.caption(
+                            f"Desviación estándar entre árboles: {uncertainty['proba_ia_std'] * 100:.1f} %; "
+                            f"P5 - P50 - P95 por árbol: {uncertainty['proba_ia_p05'] * 100:.0f} - "
+                            f"{uncertainty['proba_ia_p50'] * 100:.0f} - {uncertainty['proba_ia_p95'] * 100:.0f} %"
+                        )
+                    st.caption(
+                        f"Modelo: {VARIANT_LABELS.get(results['modelo'], results['modelo'])}"
+                        + (f" · versión {results['version']}" if results.get("version") else "")
+                    )
                 else:
                     st.error("No se pudo calcular la predicción de IA.")
             
@@ -350,6 +580,33 @@ def main():
                 else:
                     st.error("No se pudo calcular el FS tradicional.")
 
+            # --- Comparación entre métodos de disparo (una sola pasada vectorizada) ---
+            with st.expander("Comparación entre métodos tradicionales de disparo"):
+                evaluated = evaluate_methods({key: [value] for key, value in input_dict.items()})
+                st.dataframe(
+                    pd.DataFrame([
+                        {
+                            "Método": TRIGGERING_METHODS[name][0],
+                            "FS": method["FS"][0],
+                            "CSR": method["CSR"][0],
+                            "CRR": method["CRR_adj"][0],
+                            "rd": method["rd"][0],
+                            "MSF": method["MSF"][0],
+                            "K_sigma": method["K_sigma"][0],
+                            "P_L [%]": method["P_L"][0] * 100 if "P_L" in method else None,
+                            "Clasificación": classify_fs(None if np.isnan(method["FS"][0]) else method["FS"][0]),
+                        }
+                        for name, method in evaluated.items()
+                    ]).round(3),
+                    use_container_width=True,
+                    hide_index=True,
+                )
+                st.caption(
+                    "Los métodos con corrección por finos toman (N1)60cs como (N1)60, igual que la base de "
+                    "Cetin et al. (2018) con la que se entrenó la IA, y aplican su propia corrección con FC. "
+                    "En Cetin et al. (2018) el FS corresponde a P_L = 50 %."
+                )
+
             # --- Sección de Interpretación ---
             st.markdown("---")
             st.markdown("<h4>Interpretación y Recomendaciones</h4>", unsafe_allow_html=True) # CAMBIO: Tamaño de fuente
@@ -383,18 +640,507 @@ def main():
                 else:
                     st.error("No se pudo calcular la predicción de IA.")
 
+            # --- Umbrales Críticos ---
+            thresholds = results.get("thresholds", {})
+            if thresholds:
+                st.markdown("---")
+                st.markdown("<h4>Umbrales Críticos</h4>", unsafe_allow_html=True)
+                st.write("Valor de cada parámetro (con el resto fijo) en el que el caso cruza la frontera de cada método. "
+                         "'Sin cruce' indica que la frontera no se alcanza dentro del rango de búsqueda.")
+                threshold_labels = {
+                    "a_max": "Aceleración crítica a_max [g]",
+                    "Mw": "Magnitud crítica Mw",
+                    "N1_60_cs": "(N1)60cs requerido",
+                }
+                st.table(pd.DataFrame(
+                    {
+                        "Método Tradicional (FS = 1)": [
+                            "Sin cruce" if pd.isna(thresholds[f"{v}_crit_FS"]) else f"{thresholds[f'{v}_crit_FS']:.3f}"
+                            for v in THRESHOLD_VARIABLES
+                        ],
+                        "IA (p = 0.5)": [
+                            "Sin cruce" if pd.isna(thresholds[f"{v}_crit_IA"]) else f"{thresholds[f'{v}_crit_IA']:.3f}"
+                            for v in THRESHOLD_VARIABLES
+                        ],
+                    },
+                    index=[threshold_labels[v] for v in THRESHOLD_VARIABLES],
+                ))
+
             # --- Mostrar Gráfico SHAP ---
             st.markdown("---")
             st.markdown("<h4>Explicación de la Predicción de IA (Análisis SHAP)</h4>", unsafe_allow_html=True) # CAMBIO: Tamaño de fuente
             st.write("Este gráfico de 'cascada' (waterfall) muestra cómo cada factor 'empujó' la predicción de la IA, "
                      "desde el valor base (riesgo promedio) hasta la predicción final para este caso.")
             
-            if shap_fig is not None:
-                st.pyplot(shap_fig, use_container_width=True)
-                plt.close(shap_fig) # Cerrar la figura después de mostrarla
+            if results["shap_values"] is not None:
+                # Se dibuja al mostrar; el PNG queda en el cache LRU del proceso, no en la sesión
+                shap_png = load_explainer(results["modelo"], results.get("version")).waterfall_png(
+                    results["x_scaled"], explanation=(np.array(results["shap_values"]), results["shap_base"])
+                )
+                st.image(shap_png, use_container_width=True)
             else:
                 st.warning("No se pudo generar el gráfico SHAP (posiblemente debido a un error en la predicción de IA).")
 
+            # --- Contexto Histórico (SHAP precalculado de mmc2.csv) ---
+            global_shap = load_global_explanations(results["modelo"], results.get("version"))
+            if global_shap is not None and results["shap_values"] is not None:
+                st.markdown("---")
+                st.markdown("<h4>Comparación con los Casos Históricos</h4>", unsafe_allow_html=True)
+                st.write(f"Explicaciones precalculadas de los {len(global_shap)} casos de entrenamiento (Cetin et al., 2018).")
+
+                col_g1, col_g2 = st.columns(2)
+                with col_g1:
+                    st.markdown("<h5>Importancia global de cada factor</h5>", unsafe_allow_html=True)
+                    st.bar_chart(global_shap.importance().set_index("característica"), horizontal=True)
+                with col_g2:
+                    st.markdown("<h5>Gráfico de dependencia</h5>", unsafe_allow_html=True)
+                    dep_feature = st.selectbox("Factor", global_shap.feature_names, key="dependence_feature")
+                    j = global_shap.feature_names.index(dep_feature)
+                    df_dep = global_shap.dependence(dep_feature)
+                    df_dep.loc[len(df_dep)] = [input_dict[dep_feature], results["shap_values"][j], "Caso actual"]
+                    st.scatter_chart(df_dep, x=dep_feature, y="SHAP", color="Licuó")
+
+            # --- Casos históricos más cercanos (índice KD-tree) ---
+            case_index = load_case_index(results.get("version"))
+            if case_index is not None and results["x_scaled"] is not None:
+                st.markdown("<h5>Casos históricos más cercanos</h5>", unsafe_allow_html=True)
+                n_nearest = st.slider("Número de casos", 1, 20, 5, key="n_nearest")
+                df_near = case_index.query(results["x_scaled"], k=n_nearest)
+                if global_shap is not None and len(global_shap) == len(case_index):
+                    df_near["prob. IA"] = global_shap.proba[df_near["indice_caso"]]
+                st.dataframe(
+                    df_near.drop(columns=["fila", "indice_caso"]).round(3),
+                    use_container_width=True, hide_index=True,
+                )
+                st.caption("Distancia euclidiana en el espacio escalado de las 6 características del modelo.")
+
+    # --- PESTAÑA 3: ANÁLISIS POR LOTES ---
+    with tab3:
+        st.markdown("---")
+        st.markdown("<h4>Análisis de múltiples sitios o estratos</h4>", unsafe_allow_html=True)
+        st.info(
+            "Suba un archivo CSV o Excel con una fila por estrato y las columnas: "
+            "`N1_60_cs`, `FC`, `D50`, `a_max`, `Mw`, `estres_v_ef` [kPa], `z_m` [m] y `estres_v_total` [kPa]. "
+            "Las columnas adicionales (por ejemplo, un identificador de sitio) se conservan en los resultados."
+        )
+        st.download_button(
+            label="Descargar plantilla CSV",
+            data=batch_template().to_csv(index=False).encode("utf-8"),
+            file_name="plantilla_geoliquefai.csv",
+            mime="text/csv",
+        )
+
+        uploaded_file = st.file_uploader("Archivo de datos", type=["csv", "xlsx", "xls"])
+        if uploaded_file is not None:
+            try:
+                df_batch = read_batch_file(uploaded_file)
+            except Exception as e:
+                st.error(f"Error al leer el archivo: {e}")
+                df_batch = None
+
+            if df_batch is not None:
+                st.write(f"Filas leídas: {len(df_batch)}")
+                include_thresholds = st.checkbox("Incluir umbrales críticos (a_max, Mw y (N1)60cs para FS = 1 y p = 0.5)")
+                include_uncertainty = st.checkbox(
+                    "Incluir la dispersión entre árboles (desviación estándar, P5/P50/P95 y acuerdo de votos)",
+                    key="include_uncertainty",
+                )
+                compare_methods = st.multiselect(
+                    "Métodos tradicionales adicionales (columnas FS_<método>)",
+                    [name for name in TRIGGERING_METHODS if name != "simplificado"],
+                    format_func=lambda name: TRIGGERING_METHODS[name][0],
+                    key="compare_methods",
+                )
+                case_index = load_case_index(model_version)
+                include_neighbors = case_index is not None and st.checkbox(
+                    "Incluir los 3 casos históricos más cercanos a cada fila (sismo, sitio y resultado)"
+                )
+                if st.button("Analizar Lote", use_container_width=True):
+                    with st.spinner("Analizando lote... 🤖"):
+                        try:
+                            with metrics.stage("batch_analysis", rows=len(df_batch)):
+                                df_out = analyze_batch(df_batch, model, scaler, uncertainty=include_uncertainty,
+                                                       methods=compare_methods)
+                            if include_thresholds:
+                                with metrics.stage("thresholds", rows=len(df_batch)):
+                                    df_out = df_out.join(solve_thresholds(df_batch, model, scaler))
+                            if include_neighbors:
+                                with metrics.stage("nearest_cases", rows=len(df_batch)):
+                                    X_batch, valid_batch = build_ia_features(df_batch)
+                                    df_out = df_out.join(case_index.neighbor_columns(
+                                        scaler.transform(X_batch), valid_batch, k=3
+                                    ).set_index(df_out.index))
+                        except ValueError as e:
+                            st.error(str(e))
+                            df_out = None
+
+                    if df_out is not None:
+                        # Etiquetas de riesgo (las filas inválidas se marcan como "Error")
+                        df_out["risk_label_ia"] = [
+                            "Error" if pd.isna(p) else classify_risk(p) for p in df_out["proba_ia"]
+                        ]
+                        df_out["risk_label_trad"] = [
+                            classify_fs(None if pd.isna(fs) else fs) for fs in df_out["FS_trad"]
+                        ]
+                        if include_uncertainty:
+                            df_out["confianza_ia"] = [
+                                classify_confidence(None if pd.isna(a) else a) for a in df_out["acuerdo_votos"]
+                            ]
+                        st.session_state['batch_results'] = df_out
+                        st.session_state.pop('batch_reports', None)
+                        # Un reporte en curso de un lote anterior ya no se muestra
+                        job = st.session_state.pop('report_job', None)
+                        if job is not None:
+                            job["future"].cancel()
+                        get_work_dir('reports_dir', "reportes_geoliquefai_").cleanup()
+
+        df_out = st.session_state.get('batch_results')
+        if df_out is not None:
+            n_invalid = int(df_out["proba_ia"].isna().sum() + df_out["FS_trad"].isna().sum())
+            if n_invalid:
+                st.warning(f"{n_invalid} resultados no se pudieron calcular por datos faltantes o inválidos.")
+            if "confianza_ia" in df_out:
+                n_low = int((df_out["confianza_ia"] == "Confianza Baja").sum())
+                if n_low:
+                    st.info(f"{n_low} filas con confianza baja: los árboles del bosque están divididos sobre su clase.")
+            st.dataframe(df_out, use_container_width=True)
+            st.download_button(
+                label="Descargar Resultados (CSV)",
+                data=df_out.to_csv(index=False).encode("utf-8"),
+                file_name=f"resultados_geoliquefai_{datetime.now():%Y%m%d_%H%M%S}.csv",
+                mime="text/csv",
+                use_container_width=True,
+            )
+
+            st.markdown("<h5>Reportes PDF</h5>", unsafe_allow_html=True)
+            report_mode = st.radio("Formato", ["Un PDF por sitio", "Reporte consolidado"], horizontal=True,
+                                   key="report_mode")
+            report_running = 'report_job' in st.session_state
+            if st.button("📄 Generar reportes PDF", key="report_run", use_container_width=True,
+                         disabled=report_running):
+                # El zip anterior de la sesión se borra antes de generar el nuevo
+                st.session_state.pop('batch_reports', None)
+                zip_path = os.path.join(get_work_dir('reports_dir', "reportes_geoliquefai_").renew(), "reportes.zip")
+                submit_reports(df_out, zip_path, report_mode == "Reporte consolidado", model_variant, model_version)
+                report_running = True
+
+            st.fragment(run_every=REPORT_POLL_SECONDS if report_running else None)(render_report_job)()
+
+            reports = st.session_state.get('batch_reports')
+            if reports is not None and "error" in reports:
+                st.error(f"No se pudieron generar los reportes: {reports['error']}")
+            elif reports is not None and os.path.exists(reports["zip"]):
+                summary = reports["summary"]
+                st.caption(f"{summary['sitios']} sitios en {summary['archivos']} PDF ({summary['tiempo_s']:.1f} s).")
+                with open(reports["zip"], "rb") as f:
+                    st.download_button(
+                        label="Descargar Reportes (ZIP)",
+                        data=f,
+                        file_name=f"reportes_geoliquefai_{datetime.now():%Y%m%d_%H%M%S}.zip",
+                        mime="application/zip",
+                        use_container_width=True,
+                    )
+
+
+    # --- PESTAÑA 4: PERFIL DE SONDEO ---
+    with tab4:
+        st.markdown("---")
+        st.markdown("<h4>Análisis de un sondeo SPT completo</h4>", unsafe_allow_html=True)
+        st.info(
+            "Suba el registro SPT con una fila por muestra y las columnas `z_m` [m], `N1_60_cs`, `FC` y `D50` "
+            "(opcional: `gamma` [kN/m³] por tramo). Los esfuerzos σv y σ'v se calculan a lo largo de la columna "
+            "con el nivel freático y los pesos unitarios indicados."
+        )
+        st.download_button(
+            label="Descargar plantilla de sondeo",
+            data=profile_template().to_csv(index=False).encode("utf-8"),
+            file_name="plantilla_sondeo_geoliquefai.csv",
+            mime="text/csv",
+        )
+
+        with st.form(key="profile_form"):
+            col_p1, col_p2, col_p3 = st.columns(3)
+            with col_p1:
+                water_table = st.number_input("Nivel Freático [m]", min_value=0.0, max_value=50.0, value=2.0, step=0.1)
+                profile_a_max = st.number_input("Aceleración Máxima (a_max) [g]", min_value=0.01, max_value=2.0,
+                                                value=0.3, step=0.01, key="profile_a_max")
+            with col_p2:
+                gamma_dry = st.number_input("Peso Unitario sobre N.F. [kN/m³]", min_value=10.0, max_value=25.0,
+                                            value=18.0, step=0.5)
+                profile_Mw = st.number_input("Magnitud del Sismo (Mw)", min_value=4.0, max_value=10.0,
+                                             value=7.5, step=0.1, key="profile_Mw")
+            with col_p3:
+                gamma_sat = st.number_input("Peso Unitario bajo N.F. [kN/m³]", min_value=10.0, max_value=25.0,
+                                            value=20.0, step=0.5)
+            profile_file = st.file_uploader("Registro SPT", type=["csv", "xlsx", "xls"], key="profile_file")
+            profile_submit = st.form_submit_button("Analizar Perfil", use_container_width=True)
+
+        if profile_submit:
+            if profile_file is None:
+                st.warning("Suba un registro SPT para analizar el perfil.")
+            else:
+                try:
+                    layers = read_batch_file(profile_file)
+                    df_profile, indices = analyze_profile(
+                        layers, model, scaler, water_table, profile_a_max, profile_Mw, gamma_dry, gamma_sat
+                    )
+                    st.session_state['profile_results'] = {
+                        "df": df_profile,
+                        "indices": indices,
+                        "plot_png": plot_profile_png(df_profile, water_table),
+                    }
+                except Exception as e:
+                    st.error(f"Error en el análisis del perfil: {e}")
+
+        profile_results = st.session_state.get('profile_results')
+        if profile_results is not None:
+            indices = profile_results["indices"]
+            col_i1, col_i2, col_i3, col_i4 = st.columns(4)
+            col_i1.metric("LPI (FS)", f"{indices['LPI']:.1f}")
+            col_i2.metric("LPI (IA)", f"{indices['LPI_IA']:.1f}")
+            col_i3.metric("LSN", f"{indices['LSN']:.1f}")
+            col_i4.metric("Asentamiento estimado", f"{indices['asentamiento_cm']:.1f} cm")
+            st.caption(
+                "LPI según Iwasaki et al. (1978): < 5 bajo, 5-15 alto, > 15 muy alto. "
+                "LSN según van Ballegooy et al. (2014). El asentamiento es una estimación por reconsolidación."
+            )
+            st.image(profile_results["plot_png"], use_container_width=True)
+            st.dataframe(profile_results["df"], use_container_width=True)
+            st.download_button(
+                label="Descargar Perfil (CSV)",
+                data=profile_results["df"].to_csv(index=False).encode("utf-8"),
+                file_name=f"perfil_geoliquefai_{datetime.now():%Y%m%d_%H%M%S}.csv",
+                mime="text/csv",
+                use_container_width=True,
+            )
+
+
+    # --- PESTAÑA 5: ANÁLISIS PROBABILÍSTICO (MONTE CARLO) ---
+    with tab5:
+        st.markdown("---")
+        st.markdown("<h4>Factor de Seguridad y Probabilidad con Incertidumbre (Monte Carlo)</h4>", unsafe_allow_html=True)
+        st.info(
+            "Cada variable se muestrea con una distribución normal (media y desviación estándar). "
+            "rd y MSF se tratan como factores de incertidumbre de modelo con media 1 (su desviación es un CoV). "
+            "Las desviaciones por defecto provienen de las columnas de incertidumbre de mmc2.csv."
+        )
+        cases, cov = load_cases_for_monte_carlo()
+
+        sources = ["Caso histórico (mmc2.csv)"]
+        if len(get_history()):
+            sources.insert(0, "Último análisis (CoV típico de mmc2.csv)")
+        source = st.radio("Origen de los parámetros", sources, horizontal=True)
+
+        if source.startswith("Último"):
+            base = dict(get_history().latest()["input_dict"])
+            mc_std = {key: abs(base[key]) * cov[key] for key in UNCERTAINTY_COLUMNS}
+            mc_std.update({key: cov[key] for key in FACTOR_KEYS})
+        else:
+            case_labels = [
+                f"{int(row['Case Number'])} - {row['Earthquake']} - {row['Site']} (Licuó: {row['Liquefied?']})"
+                for _, row in cases.iterrows()
+            ]
+            case_idx = st.selectbox("Caso histórico", range(len(cases)), format_func=lambda i: case_labels[i])
+            row = cases.iloc[case_idx]
+            base = {key: float(row[key]) for key in list(UNCERTAINTY_COLUMNS) + ["Mw"]}
+            mc_std = {key: float(row[f"s_{key}"]) for key in list(UNCERTAINTY_COLUMNS) + FACTOR_KEYS}
+
+        params_df = pd.DataFrame(
+            {
+                "Parámetro": list(UNCERTAINTY_COLUMNS) + FACTOR_KEYS,
+                "Media": [base[key] for key in UNCERTAINTY_COLUMNS] + [1.0] * len(FACTOR_KEYS),
+                "Desv. Estándar": [mc_std[key] for key in list(UNCERTAINTY_COLUMNS) + FACTOR_KEYS],
+            }
+        )
+        edited = st.data_editor(params_df, disabled=["Parámetro"], hide_index=True, use_container_width=True)
+
+        col_mc1, col_mc2, col_mc3 = st.columns(3)
+        with col_mc1:
+            mc_Mw = st.number_input("Magnitud del Sismo (Mw)", min_value=4.0, max_value=10.0,
+                                    value=float(base["Mw"]), step=0.1, key="mc_Mw")
+        with col_mc2:
+            n_samples = st.selectbox(
+                "Número de muestras", [10_000, 100_000, 1_000_000], index=1,
+                help="El modelo de IA se evalúa en todas las muestras (unos 12 s por millón de muestras en un núcleo).",
+            )
+        with col_mc3:
+            mc_seed = st.number_input("Semilla", min_value=0, value=42, step=1)
+
+        if st.button("Ejecutar Monte Carlo", use_container_width=True):
+            mc_mean = {row["Parámetro"]: float(row["Media"]) for _, row in edited.iterrows()}
+            mc_mean["Mw"] = mc_Mw
+            mc_std = {row["Parámetro"]: float(row["Desv. Estándar"]) for _, row in edited.iterrows()}
+            with st.spinner("Muestreando... 🎲"):
+                try:
+                    mc_result = run_monte_carlo(mc_mean, mc_std, model, scaler,
+                                                n_samples=n_samples, seed=int(mc_seed))
+                    st.session_state['mc_results'] = {
+                        "result": mc_result,
+                        "plot_png": plot_monte_carlo_png(mc_result),
+                    }
+                except Exception as e:
+                    st.error(f"Error en el análisis probabilístico: {e}")
+
+        mc_results = st.session_state.get('mc_results')
+        if mc_results is not None:
+            mc_result = mc_results["result"]
+            fs_p = mc_result["FS_percentiles"]
+            proba_p = mc_result["proba_ia_percentiles"]
+            col_r1, col_r2, col_r3, col_r4 = st.columns(4)
+            col_r1.metric("P(FS < 1)", f"{mc_result['P_FS_lt_1'] * 100:.2f} %")
+            col_r2.metric("FS mediano (P5 - P95)", f"{fs_p[50]:.3f}", f"{fs_p[5]:.3f} - {fs_p[95]:.3f}", delta_color="off")
+            col_r3.metric("Prob. IA media", f"{mc_result['proba_ia_mean'] * 100:.1f} %",
+                          f"P5-P95: {proba_p[5] * 100:.1f} - {proba_p[95] * 100:.1f} %", delta_color="off")
+            col_r4.metric("P(Prob. IA ≥ 50 %)", f"{mc_result['P_IA_ge_05'] * 100:.2f} %")
+            if mc_result['n_samples_ia'] == mc_result['n_samples']:
+                st.caption(f"FS y modelo de IA evaluados en las mismas {mc_result['n_samples']:,} muestras.")
+            else:
+                st.caption(
+                    f"FS evaluado en {mc_result['n_samples']:,} muestras; modelo de IA en "
+                    f"{mc_result['n_samples_ia']:,} muestras."
+                )
+            st.image(mc_results["plot_png"], use_container_width=True)
+
+
+    # --- PESTAÑA 6: BARRIDO DE ESCENARIOS SÍSMICOS ---
+    with tab6:
+        st.markdown("---")
+        st.markdown("<h4>Sensibilidad a escenarios sísmicos (a_max × Mw × N1_60_cs)</h4>", unsafe_allow_html=True)
+        st.info(
+            "Se evalúa una grilla completa de escenarios para un suelo fijo. La grilla se calcula una vez por "
+            "conjunto de parámetros del suelo; cambiar los ejes del gráfico o el corte no la recalcula."
+        )
+
+        st.markdown("<h5>Parámetros fijos del suelo</h5>", unsafe_allow_html=True)
+        col_s1, col_s2, col_s3, col_s4, col_s5 = st.columns(5)
+        soil = (
+            ("FC", col_s1.number_input("FC [%]", 0.0, 100.0, 10.0, 0.5, key="sweep_FC")),
+            ("D50", col_s2.number_input("D50 [mm]", 0.01, 5.0, 0.25, 0.01, key="sweep_D50")),
+            ("estres_v_ef", col_s3.number_input("σ'v [kPa]", 1.0, 1000.0, 100.0, 1.0, key="sweep_sv_ef")),
+            ("estres_v_total", col_s4.number_input("σv [kPa]", 1.0, 2000.0, 180.0, 1.0, key="sweep_sv")),
+            ("z_m", col_s5.number_input("z [m]", 0.5, 50.0, 10.0, 0.5, key="sweep_z")),
+        )
+
+        st.markdown("<h5>Rangos de la grilla</h5>", unsafe_allow_html=True)
+        col_g1, col_g2, col_g3 = st.columns(3)
+        with col_g1:
+            a_max_range = st.slider("a_max [g]", 0.01, 2.0, (0.05, 0.8), 0.01)
+            n_a_max = st.number_input("Puntos en a_max", 5, 200, 100, 5)
+        with col_g2:
+            Mw_range = st.slider("Mw", 4.0, 10.0, (5.0, 9.0), 0.1)
+            n_Mw = st.number_input("Puntos en Mw", 5, 200, 60, 5)
+        with col_g3:
+            n1_range = st.slider("(N1)60cs", 1.0, 60.0, (5.0, 35.0), 0.5)
+            n_n1 = st.number_input("Puntos en (N1)60cs", 1, 60, 7, 1)
+
+        if not st.toggle("Calcular barrido de escenarios", value=False):
+            st.info("Active el barrido para evaluar la grilla.")
+        else:
+            with st.spinner("Evaluando grilla de escenarios..."):
+                grid = compute_scenario_grid(
+                    soil,
+                    (a_max_range[0], a_max_range[1], int(n_a_max)),
+                    (Mw_range[0], Mw_range[1], int(n_Mw)),
+                    (n1_range[0], n1_range[1], int(n_n1)),
+                    model_variant,
+                    model_version,
+                )
+
+            st.markdown("<h5>Ejes del gráfico</h5>", unsafe_allow_html=True)
+            col_x, col_y, col_f = st.columns(3)
+            x_key = col_x.selectbox("Eje X", SWEEP_AXES, index=0, format_func=AXIS_LABELS.get)
+            y_key = col_y.selectbox("Eje Y", [k for k in SWEEP_AXES if k != x_key], format_func=AXIS_LABELS.get)
+            (fixed_key,) = [k for k in SWEEP_AXES if k not in (x_key, y_key)]
+            fixed_values = grid[fixed_key]
+            fixed_value = col_f.select_slider(
+                f"Corte en {AXIS_LABELS[fixed_key]}", options=[round(float(v), 3) for v in fixed_values],
+            )
+
+            x, y, fs_2d, proba_2d, fixed_used = grid_slice(grid, x_key, y_key, fixed_value)
+            st.image(
+                plot_sweep_png(x, y, fs_2d, proba_2d, x_key, y_key, title=f"{AXIS_LABELS[fixed_key]} = {fixed_used:.3g}"),
+                use_container_width=True,
+            )
+            st.caption(
+                f"Grilla de {grid['FS'].size:,} escenarios. Zona con FS < 1: {np.mean(fs_2d < 1.0) * 100:.1f} % del corte; "
+                f"zona con p ≥ 0.5: {np.mean(proba_2d >= 0.5) * 100:.1f} % del corte."
+            )
+
+
+    # --- PESTAÑA 7: MAPA REGIONAL ---
+    with tab7:
+        st.markdown("---")
+        st.markdown("<h4>Mapa regional para un sismo de escenario</h4>", unsafe_allow_html=True)
+        st.info(
+            "La a_max de cada celda se estima con la atenuación de Campbell (1981) según su distancia al "
+            "epicentro. La grilla se evalúa por teselas en procesos paralelos y los resultados se guardan en "
+            "disco; el mapa se dibuja desde esos archivos."
+        )
+
+        col_e1, col_e2, col_e3, col_e4 = st.columns(4)
+        map_Mw = col_e1.number_input("Mw del escenario", 4.0, 9.5, 7.5, 0.1, key="map_Mw")
+        epi_x = col_e2.number_input("Epicentro x [km]", -500.0, 500.0, 5.0, 0.5, key="map_epi_x")
+        epi_y = col_e3.number_input("Epicentro y [km]", -500.0, 500.0, 10.0, 0.5, key="map_epi_y")
+        depth = col_e4.number_input("Profundidad focal [km]", 1.0, 100.0, 10.0, 1.0, key="map_depth")
+
+        grid_source = st.radio("Grilla de sitios", ["Sintética de prueba", "Subir CSV"], horizontal=True,
+                               key="map_source")
+        uploaded_grid = None
+        if grid_source == "Sintética de prueba":
+            grid_side = st.slider("Celdas por lado", 50, 1000, 300, 50, key="map_side")
+        else:
+            uploaded_grid = st.file_uploader(
+                "CSV con columnas x_km, y_km, N1_60_cs, FC, D50, z_m, estres_v_ef, estres_v_total",
+                type=["csv"], key="map_upload",
+            )
+
+        if st.button("🏙️ Calcular mapa", key="map_run", disabled=grid_source == "Subir CSV" and uploaded_grid is None):
+            # La grilla y los resultados anteriores de la sesión se borran antes del nuevo cálculo
+            st.session_state.pop("regional_map", None)
+            output_path = get_work_dir("regional_dir", "mapa_regional_").renew()
+            grid_path = os.path.join(output_path, "grilla")
+            with st.spinner("Preparando la grilla..."):
+                try:
+                    if uploaded_grid is None:
+                        synthetic_grid(grid_path, grid_side, grid_side)
+                    else:
+                        grid_from_csv(uploaded_grid, grid_path)
+                except ValueError as e:
+                    st.error(f"No se pudo leer la grilla: {e}")
+                    st.stop()
+            bar = st.progress(0.0, text="Evaluando teselas...")
+            summary = run_regional(
+                grid_path, output_path, map_Mw, (epi_x, epi_y), depth, model_variant, model_version,
+                progress=lambda done, total: bar.progress(done / total, text=f"Teselas: {done}/{total}"),
+            )
+            st.session_state["regional_map"] = {"grid": grid_path, "output": output_path, "summary": summary}
+
+        regional = st.session_state.get("regional_map")
+        if regional is None:
+            st.info("Defina el escenario y presione 'Calcular mapa'.")
+        else:
+            summary = regional["summary"]
+            col_m1, col_m2, col_m3, col_m4 = st.columns(4)
+            col_m1.metric("Celdas", f"{summary['celdas']:,}")
+            col_m2.metric("FS < 1", f"{summary['fs_lt_1'] / summary['celdas'] * 100:.1f} %")
+            col_m3.metric("Prob. IA ≥ 50 %", f"{summary['p_ge_05'] / summary['celdas'] * 100:.1f} %")
+            col_m4.metric("Tiempo", f"{summary['tiempo_s']:.1f} s")
+            variable = st.selectbox("Variable del mapa", list(MAP_VARIABLES),
+                                    format_func=lambda v: MAP_VARIABLES[v][0], key="map_variable")
+            st.image(
+                render_regional_map(regional["grid"], regional["output"], variable, summary["tiempo_s"]),
+                use_container_width=True,
+            )
+            st.caption(
+                f"Escenario Mw {summary['Mw']:.1f}, modelo {VARIANT_LABELS.get(summary['modelo'], summary['modelo'])}. "
+                f"Resultados en '{regional['output']}'."
+            )
+
+
+    # --- Panel de Diagnóstico (opcional) ---
+    if show_diagnostics:
+        render_diagnostics()
+
 
 if __name__ == "__main__":
     main()
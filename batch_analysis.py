@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+from traditional_method import METHOD_COLUMNS, evaluate_methods, method_columns
+from compiled_forest import UNCERTAINTY_QUANTILES, predict_distribution, summarize_tree_probabilities
+
+# Orden de las características con el que se entrenó el modelo de IA
+FEATURE_ORDER_IA = ["N1_60_cs", "FC", "D50", "a_max", "estres_v_ef", "Mw"]
+
+# Conversión de kPa a PSF (el modelo se entrenó con σ'v en psf)
+KPA_TO_PSF = 20.8854
+
+# Columnas esperadas en el archivo de lotes (esfuerzos en kPa, como en el formulario)
+BATCH_COLUMNS = ["N1_60_cs", "FC", "D50", "a_max", "Mw", "estres_v_ef", "z_m", "estres_v_total"]
+
+# Tamaño de bloque para el escalado y la predicción (una llamada a predict_proba por bloque)
+DEFAULT_CHUNK_SIZE = 10_000
+
+
+def read_batch_file(file, filename=None):
+    """
+    Lee un archivo CSV o Excel (xlsx/xls) con un estrato o sitio por fila.
+    Los CSV pueden venir separados por coma o por punto y coma.
+    """
+    name = (filename or getattr(file, "name", "")).lower()
+    if name.endswith((".xlsx", ".xls")):
+        df = pd.read_excel(file)
+    else:
+        df = pd.read_csv(file, sep=None, engine="python")
+    df.columns = df.columns.astype(str).str.strip()
+    return df
+
+
+def batch_template():
+    """DataFrame de ejemplo con las columnas que espera el análisis por lotes."""
+    return pd.DataFrame(
+        [
+            [15.0, 10.0, 0.25, 0.40, 7.5, 100.0, 10.0, 180.0],
+            [8.0, 25.0, 0.15, 0.25, 6.8, 60.0, 5.0, 95.0],
+        ],
+        columns=BATCH_COLUMNS,
+    )
+
+
+def build_ia_features(df):
+    """
+    Construye la matriz de entrada del modelo de IA (n x 6) en el orden de
+    entrenamiento, convirtiendo toda la columna de σ'v de kPa a psf.
+    Devuelve la matriz y la máscara de filas completas.
+    """
+    X = df[FEATURE_ORDER_IA].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float, copy=True)
+    X[:, FEATURE_ORDER_IA.index("estres_v_ef")] *= KPA_TO_PSF
+    valid = np.isfinite(X).all(axis=1)
+    return X, valid
+
+
+def predict_proba_batch(model, scaler, X, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Probabilidad de licuefacción (clase 1) para cada fila de X (sin escalar).
+    Escala y predice por bloques con una sola llamada a `predict_proba` por bloque.
+    """
+    X = np.asarray(X, dtype=float)
+    # El scaler se ajustó con nombres de columnas; se le pasan igual para evitar advertencias
+    columns = getattr(scaler, "feature_names_in_", None)
+    proba = np.empty(X.shape[0], dtype=float)
+    for start in range(0, X.shape[0], chunk_size):
+        block = X[start:start + chunk_size]
+        if columns is not None:
+            block = pd.DataFrame(block, columns=columns)
+        block = scaler.transform(block)
+        proba[start:start + chunk_size] = model.predict_proba(block)[:, 1]
+    return proba
+
+
+def predict_distribution_batch(model, scaler, X, chunk_size=DEFAULT_CHUNK_SIZE, quantiles=UNCERTAINTY_QUANTILES):
+    """
+    Como `predict_proba_batch`, pero devuelve además la dispersión de la
+    probabilidad entre árboles (desviación estándar, cuantiles y acuerdo de
+    votos), calculada en el mismo recorrido del bosque. Dict de arrays.
+    """
+    X = np.asarray(X, dtype=float)
+    columns = getattr(scaler, "feature_names_in_", None)
+    parts = []
+    for start in range(0, X.shape[0], chunk_size):
+        block = X[start:start + chunk_size]
+        if columns is not None:
+            block = pd.DataFrame(block, columns=columns)
+        parts.append(predict_distribution(model, scaler.transform(block), quantiles))
+    if not parts:
+        parts.append(summarize_tree_probabilities(np.empty((1, 0)), quantiles))
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+def analyze_batch(df, model, scaler, chunk_size=DEFAULT_CHUNK_SIZE, uncertainty=False, methods=None):
+    """
+    Ejecuta ambos métodos sobre todas las filas de `df` a la vez.
+
+    Devuelve una copia de `df` con las columnas de resultados añadidas
+    (proba_ia, FS_trad, CSR, CRR_adj, rd, MSF, K_sigma). Con `uncertainty`
+    se agregan la dispersión entre árboles (proba_ia_std, cuantiles
+    proba_ia_pXX y acuerdo_votos). `methods` agrega el FS de otros métodos de
+    disparo (nombres de TRIGGERING_METHODS) en columnas FS_<método>. Las filas
+    con datos faltantes o inválidos quedan en NaN sin afectar al resto del lote.
+    """
+    missing = [col for col in BATCH_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas en el archivo: {missing}")
+
+    out = df.copy()
+
+    # --- 1. Predicción de IA (solo filas completas) ---
+    X, valid_ia = build_ia_features(df)
+    if uncertainty:
+        distribution = predict_distribution_batch(model, scaler, X[valid_ia], chunk_size)
+        for key, values in distribution.items():
+            column = np.full(len(df), np.nan)
+            column[valid_ia] = values
+            out[key] = column
+    else:
+        proba = np.full(len(df), np.nan)
+        if valid_ia.any():
+            proba[valid_ia] = predict_proba_batch(model, scaler, X[valid_ia], chunk_size)
+        out["proba_ia"] = proba
+
+    # --- 2. Método tradicional vectorizado (y los métodos de comparación en la misma pasada) ---
+    trad_input = df[[col for col in METHOD_COLUMNS if col in df.columns]].apply(pd.to_numeric, errors="coerce")
+    evaluated = evaluate_methods(trad_input, ["simplificado", *(methods or [])])
+    trad = evaluated.pop("simplificado")
+    out["FS_trad"] = trad["FS"]
+    for key in ["CSR", "CRR_adj", "rd", "MSF", "K_sigma"]:
+        out[key] = trad[key]
+    for key, values in method_columns(evaluated).items():
+        out[key] = values
+
+    return out
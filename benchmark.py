@@ -0,0 +1,225 @@
+"""
+Suite de benchmarks reproducible (sin red) sobre mmc2.csv y los artefactos que genera save_model.py.
+
+Mide:
+    - carga de artefactos en frío (proceso nuevo) y en caliente, compilados y pickle
+    - latencia de predict_proba por lote (1 a 10^5 filas), predictor de la app
+      (bosque compilado, con los lotes grandes en scikit-learn) y scikit-learn
+    - construcción del TreeExplainer y costo SHAP por fila
+    - FS tradicional escalar versus vectorizado (tiempo por fila)
+
+Todas las métricas son tiempos (menor es mejor). Los resultados se guardan en
+JSON y se comparan con una línea base: si alguna métrica supera la base en
+más de la tolerancia, el proceso termina con código 1. También termina con
+código 1 si el predictor de la app es más lento que scikit-learn en algún lote.
+
+Uso:
+    python benchmark.py                      # corre y compara con benchmark_baseline.json
+    python benchmark.py --rapido             # lotes hasta 10^4 filas
+    python benchmark.py --actualizar-base    # guarda la corrida como nueva línea base
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+from batch_analysis import FEATURE_ORDER_IA
+from compiled_forest import load_predictor, load_scaler
+from save_model import DATA_FILE, load_and_prepare_data
+from traditional_method import calculate_traditional_fs, calculate_traditional_fs_batch, evaluate_methods
+
+BASELINE_FILE = "benchmark_baseline.json"
+RESULTS_FILE = "benchmark_results.json"
+DEFAULT_TOLERANCE = 0.5  # 50 % más lento que la base se considera regresión
+PREDICTOR_MARGIN = 0.2  # ruido de medición admitido frente a scikit-learn en el mismo lote
+SEED = 42
+
+BATCH_SIZES = [1, 10, 100, 1_000, 10_000, 100_000]
+
+
+def _best_time(func, repeats):
+    """
+    Mejor tiempo de `repeats` ejecuciones de `func` (segundos). Como en timeit,
+    el mínimo es más estable que la media frente a ruido de otros procesos.
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return float(np.min(times))
+
+
+def _repeats_for(batch_size):
+    return max(3, min(200, 20_000 // max(batch_size, 1)))
+
+
+def _cold_load_seconds(code):
+    """Tiempo de carga de artefactos en un intérprete nuevo (incluye importaciones)."""
+    script = f"import time\nt0 = time.perf_counter()\n{code}\nprint(time.perf_counter() - t0)"
+    out = subprocess.run([sys.executable, "-W", "ignore", "-c", script],
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def bench_load(results):
+    compiled_code = "from compiled_forest import load_predictor, load_scaler\nload_predictor(); load_scaler()"
+    pickle_code = "import joblib\njoblib.load('modelo_rf.joblib'); joblib.load('scaler.joblib')"
+    results["load.compiled.cold_s"] = min(_cold_load_seconds(compiled_code) for _ in range(3))
+    results["load.pickle.cold_s"] = min(_cold_load_seconds(pickle_code) for _ in range(3))
+    results["load.compiled.warm_s"] = _best_time(lambda: (load_predictor(), load_scaler()), 5)
+    results["load.pickle.warm_s"] = _best_time(
+        lambda: (joblib.load("modelo_rf.joblib"), joblib.load("scaler.joblib")), 3
+    )
+
+
+def bench_predict(results, X_scaled, compiled, sklearn_model, batch_sizes):
+    rng = np.random.default_rng(SEED)
+    for size in batch_sizes:
+        X = X_scaled[rng.integers(0, len(X_scaled), size)]
+        repeats = _repeats_for(size)
+        results[f"predict.compiled.b{size}_s"] = _best_time(lambda: compiled.predict_proba(X), repeats)
+        results[f"predict.sklearn.b{size}_s"] = _best_time(
+            lambda: sklearn_model.predict_proba(X), min(repeats, 20)
+        )
+
+
+def bench_shap(results, X_scaled, sklearn_model, n_rows=50):
+    import shap
+
+    results["shap.explainer_build_s"] = _best_time(lambda: shap.TreeExplainer(sklearn_model), 3)
+    explainer = shap.TreeExplainer(sklearn_model)
+    X = X_scaled[:n_rows]
+    results["shap.per_row_s"] = _best_time(lambda: explainer(X), 3) / n_rows
+
+
+def bench_traditional(results, n_scalar=10_000, n_batch=1_000_000):
+    rng = np.random.default_rng(SEED)
+
+    def inputs(n):
+        return {
+            "z_m": rng.uniform(0.5, 30, n), "a_max": rng.uniform(0.05, 0.8, n),
+            "estres_v_total": rng.uniform(50, 400, n), "estres_v_ef": rng.uniform(20, 300, n),
+            "Mw": rng.uniform(5, 9, n), "N1_60_cs": rng.uniform(1, 50, n), "FC": rng.uniform(0, 60, n),
+        }
+
+    scalar = inputs(n_scalar)
+    rows = [{key: float(values[i]) for key, values in scalar.items()} for i in range(n_scalar)]
+    results["traditional.scalar.per_row_s"] = _best_time(
+        lambda: [calculate_traditional_fs(row) for row in rows], 3
+    ) / n_scalar
+
+    batch = inputs(n_batch)
+    results["traditional.batch.per_row_s"] = _best_time(
+        lambda: calculate_traditional_fs_batch(batch), 3
+    ) / n_batch
+    # Todos los métodos de TRIGGERING_METHODS en una pasada con términos compartidos
+    results["traditional.all_methods.per_row_s"] = _best_time(
+        lambda: evaluate_methods(batch), 3
+    ) / n_batch
+
+
+def slower_than_sklearn(results, margin=PREDICTOR_MARGIN):
+    """Lotes en los que el predictor de la app tarda más que scikit-learn (más el margen)."""
+    slower = []
+    for key, value in results.items():
+        if key.startswith("predict.compiled."):
+            sklearn_value = results.get(key.replace(".compiled.", ".sklearn."))
+            if sklearn_value and value > sklearn_value * (1 + margin):
+                slower.append((key, sklearn_value, value))
+    return slower
+
+
+def compare(results, baseline, tolerance):
+    """Lista de regresiones: métricas con tiempo > base * (1 + tolerancia)."""
+    regressions = []
+    for key, base in baseline.items():
+        if key in results and base > 0 and results[key] > base * (1 + tolerance):
+            regressions.append((key, base, results[key]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de GeoLiquefAI.")
+    parser.add_argument("--rapido", action="store_true", help="Lotes de predicción solo hasta 10^4 filas.")
+    parser.add_argument("--salida", default=RESULTS_FILE, help="Archivo JSON de resultados.")
+    parser.add_argument("--base", default=BASELINE_FILE, help="Archivo JSON de línea base.")
+    parser.add_argument("--tolerancia", type=float, default=DEFAULT_TOLERANCE,
+                        help="Fracción de empeoramiento permitida antes de fallar (0.5 = 50 %%).")
+    parser.add_argument("--actualizar-base", action="store_true", help="Guarda esta corrida como línea base.")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    X, _ = load_and_prepare_data(DATA_FILE)
+    if X is None:
+        raise SystemExit("No se pudo leer el dataset.")
+    scaler = load_scaler()
+    X_scaled = scaler.transform(X[FEATURE_ORDER_IA].to_numpy())
+    compiled = load_predictor()
+    sklearn_model = joblib.load("modelo_rf.joblib")
+
+    batch_sizes = [s for s in BATCH_SIZES if not args.rapido or s <= 10_000]
+    results = {}
+    steps = [
+        ("carga de artefactos", lambda: bench_load(results)),
+        ("predict_proba", lambda: bench_predict(results, X_scaled, compiled, sklearn_model, batch_sizes)),
+        ("SHAP", lambda: bench_shap(results, X_scaled, sklearn_model)),
+        ("método tradicional", lambda: bench_traditional(results)),
+    ]
+    for name, step in steps:
+        print(f"Midiendo {name}...", flush=True)
+        step()
+
+    report = {
+        "meta": {
+            "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'Métrica':<40}{'Tiempo':>14}")
+    for key, value in results.items():
+        print(f"{key:<40}{value * 1000:>11.4f} ms")
+    print(f"\nResultados guardados en '{args.salida}'")
+
+    slower = slower_than_sklearn(results)
+    if slower:
+        print(f"\nEl predictor de la app es más lento que scikit-learn (margen {PREDICTOR_MARGIN * 100:.0f} %):")
+        for key, sklearn_value, value in slower:
+            print(f"  {key}: {value * 1000:.4f} ms frente a {sklearn_value * 1000:.4f} ms")
+        raise SystemExit(1)
+
+    if args.actualizar_base:
+        with open(args.base, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Línea base actualizada en '{args.base}'")
+        return
+
+    if not os.path.exists(args.base):
+        print(f"No existe la línea base '{args.base}'; use --actualizar-base para crearla.")
+        return
+    with open(args.base, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.tolerancia)
+    if regressions:
+        print(f"\nRegresiones (tolerancia {args.tolerancia * 100:.0f} %):")
+        for key, base, value in regressions:
+            print(f"  {key}: {base * 1000:.4f} ms -> {value * 1000:.4f} ms ({value / base:.2f}x)")
+        raise SystemExit(1)
+    print(f"\nSin regresiones respecto a la línea base (tolerancia {args.tolerancia * 100:.0f} %).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Ingesta de la base de casos históricos (mmc2.csv y bases combinadas más grandes).
+
+El CSV original tiene ~60 columnas de texto separadas por ';'. La ingesta valida
+el esquema una sola vez, lee solo las columnas usadas, las convierte a tipos
+fijos (float64 o texto) y guarda un cache columnar .npz junto con la huella del
+archivo fuente (tamaño, fecha de modificación y SHA-256). Las lecturas
+siguientes (entrenamiento, benchmarks, explicaciones globales, Monte Carlo)
+cargan el .npz; si el CSV cambia, el cache se regenera.
+
+El CSV se procesa por bloques de filas y cada columna tipada se escribe a
+disco a medida que se lee (binarios crudos que luego se envuelven como .npy
+con open_memmap y se empaquetan en el .npz sin volver a cargarlos), de modo que
+la memoria de la ingesta depende del tamaño del bloque y no del archivo.
+
+Uso:
+    python case_dataset.py [mmc2.csv] [--chunksize 100000]
+"""
+import argparse
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+DATA_FILE = "mmc2.csv"
+CSV_SEPARATOR = ";"
+DEFAULT_CHUNKSIZE = 100_000
+
+# Se incrementa si cambia el esquema o el formato del cache (invalida caches viejos)
+CACHE_FORMAT_VERSION = 1
+
+# Columnas (nombres sin espacios extremos) que se conservan en el cache
+TEXT_COLUMNS = ["Earthquake", "Site", "Liquefied?"]
+NUMERIC_COLUMNS = [
+    "Case Number",
+    "(N1) 60", "s (N1)60",
+    "FC %", "s FC %",
+    "D50 (mm)", "s D50",
+    "a max (g)", "s a max",
+    "sv (psf)", "s sv (psf)",
+    "sv' (psf)", "s sv' (psf)",
+    "Critical Depth (ft)", "s critical depth (ft)", "Critical Depth (m)",
+    "Water Depth (ft)",
+    "Magnitude for KMw", "s MSF",
+    "rd", "s rd",
+]
+SCHEMA_COLUMNS = TEXT_COLUMNS + NUMERIC_COLUMNS
+
+
+def cache_path_for(source):
+    """Ruta del cache columnar de un CSV (p. ej. mmc2.csv -> mmc2_cache.npz)."""
+    return f"{os.path.splitext(source)[0]}_cache.npz"
+
+
+def source_fingerprint(source, block_size=1 << 20):
+    """Huella del archivo fuente: tamaño, fecha de modificación (ns) y SHA-256."""
+    stat = os.stat(source)
+    digest = hashlib.sha256()
+    with open(source, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+
+
+def validate_schema(source):
+    """
+    Lee solo el encabezado y verifica que estén todas las columnas del esquema.
+    Devuelve el mapeo nombre limpio -> nombre original (con espacios).
+    """
+    header = pd.read_csv(source, sep=CSV_SEPARATOR, nrows=0).columns
+    original = {str(col).strip(): col for col in header}
+    missing = [col for col in SCHEMA_COLUMNS if col not in original]
+    if missing:
+        raise ValueError(f"Faltan columnas en '{source}': {missing}")
+    return {col: original[col] for col in SCHEMA_COLUMNS}
+
+
+def ingest(source=DATA_FILE, cache_path=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Valida el esquema de `source`, lo lee por bloques y escribe el cache .npz
+    tipado sin acumular las columnas en memoria. Devuelve la ruta del cache.
+    """
+    cache_path = cache_path or cache_path_for(source)
+    columns = validate_schema(source)
+    fingerprint = source_fingerprint(source)
+
+    work_dir = tempfile.mkdtemp(prefix=".ingesta_", dir=os.path.dirname(os.path.abspath(cache_path)))
+    try:
+        # Cada bloque de cada columna se agrega a su binario crudo; en las de texto
+        # se anota además (filas, ancho) del bloque, porque el ancho varía
+        raw = {col: open(os.path.join(work_dir, f"col{i}.bin"), "wb") for i, col in enumerate(SCHEMA_COLUMNS)}
+        text_blocks = {col: [] for col in TEXT_COLUMNS}
+        n = 0
+        try:
+            reader = pd.read_csv(
+                source, sep=CSV_SEPARATOR, usecols=list(columns.values()), dtype=str, chunksize=chunksize,
+            )
+            for chunk in reader:
+                chunk.columns = chunk.columns.str.strip()
+                for col in TEXT_COLUMNS:
+                    values = chunk[col].fillna("").to_numpy(dtype=str)
+                    text_blocks[col].append((len(values), values.dtype.itemsize // 4))
+                    values.tofile(raw[col])
+                for col in NUMERIC_COLUMNS:
+                    pd.to_numeric(chunk[col], errors="coerce").to_numpy(dtype=np.float64).tofile(raw[col])
+                n += len(chunk)
+        finally:
+            for f in raw.values():
+                f.close()
+
+        # Escritura atómica: otro proceso nunca ve un cache a medio escribir
+        tmp_path = f"{cache_path}.tmp.npz"
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for i, col in enumerate(SCHEMA_COLUMNS):
+                npy_path = _raw_to_npy(work_dir, f"col{i}", n, text_blocks.get(col), chunksize)
+                archive.write(npy_path, arcname=f"col{i}.npy")
+                os.remove(npy_path)
+            _write_npz_member(archive, "__columns__", np.asarray(SCHEMA_COLUMNS, dtype=str))
+            _write_npz_member(archive, "__fingerprint__", _fingerprint_array(fingerprint))
+        os.replace(tmp_path, cache_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return cache_path
+
+
+def _raw_to_npy(work_dir, name, n, text_blocks, chunksize):
+    """
+    Envuelve el binario crudo `name`.bin como .npy (open_memmap), copiando por
+    bloques. Las columnas de texto se ensanchan al ancho máximo de sus bloques.
+    """
+    raw_path = os.path.join(work_dir, f"{name}.bin")
+    npy_path = os.path.join(work_dir, f"{name}.npy")
+    if text_blocks is None:
+        out = np.lib.format.open_memmap(npy_path, mode="w+", dtype=np.float64, shape=(n,))
+        if n:
+            data = np.memmap(raw_path, dtype=np.float64, mode="r", shape=(n,))
+            for start in range(0, n, chunksize):
+                out[start:start + chunksize] = data[start:start + chunksize]
+            del data
+    else:
+        width = max((w for _, w in text_blocks), default=1)
+        out = np.lib.format.open_memmap(npy_path, mode="w+", dtype=f"<U{width}", shape=(n,))
+        start = offset = 0
+        for rows, w in text_blocks:
+            if rows:
+                out[start:start + rows] = np.memmap(raw_path, dtype=f"<U{w}", mode="r", offset=offset, shape=(rows,))
+            start += rows
+            offset += rows * w * 4
+    out.flush()
+    del out
+    os.remove(raw_path)
+    return npy_path
+
+
+def _write_npz_member(archive, name, array):
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    archive.writestr(f"{name}.npy", buffer.getvalue())
+
+
+def _fingerprint_array(fingerprint):
+    return np.asarray([str(CACHE_FORMAT_VERSION), str(fingerprint["size"]), str(fingerprint["mtime_ns"]),
+                       fingerprint["sha256"]])
+
+
+def _refresh_fingerprint(cache_path, fingerprint):
+    """
+    Reescribe la huella del cache con la fecha actual de la fuente (mismo
+    contenido), copiando las columnas tal cual, para no volver a calcular el
+    SHA-256 en las cargas siguientes.
+    """
+    tmp_path = f"{cache_path}.tmp.npz"
+    with zipfile.ZipFile(cache_path) as src, \
+            zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as dst:
+        for info in src.infolist():
+            if info.filename == "__fingerprint__.npy":
+                continue
+            with src.open(info) as f_in, dst.open(info.filename, "w", force_zip64=True) as f_out:
+                shutil.copyfileobj(f_in, f_out, 1 << 20)
+        _write_npz_member(dst, "__fingerprint__", _fingerprint_array(fingerprint))
+    os.replace(tmp_path, cache_path)
+
+
+def _cache_is_current(cache_path, source):
+    """
+    True si el cache existe, tiene el formato actual y corresponde al archivo
+    fuente. Si solo cambió la fecha de la fuente, actualiza la huella del cache.
+    """
+    if not os.path.exists(cache_path):
+        return False
+    with np.load(cache_path) as data:
+        if "__fingerprint__" not in data.files:
+            return False
+        version, size, mtime_ns, sha256 = data["__fingerprint__"].tolist()
+    if version != str(CACHE_FORMAT_VERSION):
+        return False
+    stat = os.stat(source)
+    if str(stat.st_size) != size:
+        return False
+    if str(stat.st_mtime_ns) == mtime_ns:
+        return True
+    # Misma longitud pero otra fecha (p. ej. una copia): se compara el contenido
+    fingerprint = source_fingerprint(source)
+    if fingerprint["sha256"] != sha256:
+        return False
+    _refresh_fingerprint(cache_path, fingerprint)
+    return True
+
+
+def load_cases(source=DATA_FILE, cache_path=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Casos históricos como DataFrame tipado (columnas del esquema, nombres sin
+    espacios extremos). Usa el cache columnar si corresponde al archivo fuente;
+    si no, lo (re)genera primero.
+    """
+    cache_path = cache_path or cache_path_for(source)
+    if not os.path.exists(source):
+        if not os.path.exists(cache_path):
+            raise FileNotFoundError(source)
+        # Sin la fuente, el cache es la única copia disponible
+    elif not _cache_is_current(cache_path, source):
+        ingest(source, cache_path, chunksize)
+
+    with np.load(cache_path) as data:
+        names = data["__columns__"].tolist()
+        return pd.DataFrame({name: data[f"col{i}"] for i, name in enumerate(names)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valida la base de casos y genera su cache columnar.")
+    parser.add_argument("source", nargs="?", default=DATA_FILE, help="CSV de casos históricos (separado por ';').")
+    parser.add_argument("--cache", default=None, help="Ruta del cache .npz (por defecto <fuente>_cache.npz).")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Filas por bloque de lectura.")
+    args = parser.parse_args()
+
+    cache_path = ingest(args.source, args.cache, args.chunksize)
+    cases = load_cases(args.source, cache_path)
+    print(f"{len(cases)} casos, {len(SCHEMA_COLUMNS)} columnas -> '{cache_path}' "
+          f"({os.path.getsize(cache_path) / 1e3:.1f} kB)")
+    missing = cases[NUMERIC_COLUMNS].isna().sum()
+    missing = missing[missing > 0]
+    if len(missing):
+        print("Valores faltantes o no numéricos por columna:")
+        print(missing.to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Índice de vecinos más cercanos sobre los casos históricos (Cetin et al., 2018).
+
+El índice es un KD-tree de scikit-learn sobre las características escaladas
+con el mismo scaler del modelo, de modo que la distancia es comparable con la
+que "ve" el bosque. Se construye al generar los artefactos
+(`python save_model.py --explicaciones`) y se guarda con joblib en el
+directorio compilado; sus arrays se abren con mmap_mode al cargarlo.
+
+Cada consulta cuesta O(k log n) en lugar de recorrer toda la base de casos,
+lo que importa cuando se combinan bases más grandes que mmc2.csv.
+"""
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from batch_analysis import FEATURE_ORDER_IA
+
+CASE_INDEX_FILE = "case_index.joblib"
+
+# Puntos por hoja del KD-tree (valor por defecto de scikit-learn)
+DEFAULT_LEAF_SIZE = 40
+
+DEFAULT_NEIGHBORS = 5
+
+
+class CaseIndex:
+    """KD-tree de los casos históricos con su descripción (sismo, sitio y resultado)."""
+
+    def __init__(self, tree, cases, features):
+        self.tree = tree
+        self.cases = cases
+        self.features = features
+
+    @classmethod
+    def build(cls, X_scaled, cases, features, leaf_size=DEFAULT_LEAF_SIZE):
+        """
+        `X_scaled`: características escaladas (n x 6); `cases`: DataFrame con
+        las columnas descriptivas de cada caso; `features`: características en
+        unidades de la app (para mostrar).
+        """
+        from sklearn.neighbors import KDTree
+
+        tree = KDTree(np.asarray(X_scaled, dtype=np.float64), leaf_size=leaf_size)
+        columns = {col: np.asarray(cases[col].astype(str), dtype=str) for col in cases.columns}
+        return cls(tree, columns, np.asarray(features, dtype=np.float64))
+
+    def save(self, compiled_path):
+        path = os.path.join(compiled_path, CASE_INDEX_FILE)
+        joblib.dump(self, path)
+        return path
+
+    @classmethod
+    def load(cls, compiled_path, mmap_mode="r"):
+        return joblib.load(os.path.join(compiled_path, CASE_INDEX_FILE), mmap_mode=mmap_mode)
+
+    def __len__(self):
+        return len(self.features)
+
+    def query(self, X_scaled, k=DEFAULT_NEIGHBORS):
+        """
+        Los `k` casos más cercanos a cada fila de `X_scaled`, en formato largo:
+        una fila por (fila consultada, vecino), ordenados por distancia.
+        """
+        X_scaled = np.atleast_2d(np.asarray(X_scaled, dtype=np.float64))
+        k = min(k, len(self))
+        distances, indices = self.tree.query(X_scaled, k=k)
+        flat = indices.ravel()
+        table = pd.DataFrame({
+            "fila": np.repeat(np.arange(len(X_scaled)), k),
+            "vecino": np.tile(np.arange(1, k + 1), len(X_scaled)),
+            "distancia": distances.ravel(),
+            "indice_caso": flat,
+        })
+        for col, values in self.cases.items():
+            table[col] = values[flat]
+        for j, name in enumerate(FEATURE_ORDER_IA):
+            table[name] = self.features[flat, j]
+        return table
+
+    def neighbor_columns(self, X_scaled, valid=None, k=3):
+        """
+        Vecinos de un lote en formato ancho (una fila por fila de `X_scaled`):
+        columnas vecino<r>_<dato> con el sismo, sitio, resultado y distancia
+        de los `k` casos más cercanos. Las filas no válidas quedan vacías.
+        """
+        X_scaled = np.atleast_2d(np.asarray(X_scaled, dtype=np.float64))
+        valid = np.ones(len(X_scaled), dtype=bool) if valid is None else np.asarray(valid, dtype=bool)
+        k = min(k, len(self))
+        out = pd.DataFrame(index=range(len(X_scaled)))
+        if not valid.any():
+            return out
+        distances, indices = self.tree.query(X_scaled[valid], k=k)
+        rows = np.flatnonzero(valid)
+        labels = {"Case Number": "caso", "Earthquake": "sismo", "Site": "sitio", "Liquefied?": "licuo"}
+        for r in range(k):
+            for col, label in labels.items():
+                values = pd.Series(pd.NA, index=out.index, dtype=object)
+                values.iloc[rows] = self.cases[col][indices[:, r]]
+                out[f"vecino{r + 1}_{label}"] = values
+            dist = np.full(len(X_scaled), np.nan)
+            dist[rows] = distances[:, r]
+            out[f"vecino{r + 1}_distancia"] = dist
+        return out
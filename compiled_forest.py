@@ -0,0 +1,362 @@
+import json
+import os
+
+import numpy as np
+
+# Directorio con el bosque aplanado en arrays .npy (generado por save_model.py).
+# Los .npy se abren con mmap_mode, de modo que varios procesos de la app o del
+# servicio en el mismo equipo comparten las mismas páginas de memoria.
+COMPILED_MODEL_DIR = "modelo_rf_arrays"
+
+# Variantes del modelo disponibles para la app: (pickle de scikit-learn, directorio compilado).
+# La compacta se genera con `python save_model.py --compactar`.
+MODEL_VARIANTS = {
+    "completo": ("modelo_rf.joblib", COMPILED_MODEL_DIR),
+    "compacto": ("modelo_rf_compacto.joblib", "modelo_rf_compacto_arrays"),
+}
+
+# Filas evaluadas por bloque: bloques pequeños mantienen los índices de nodo
+# (árboles x filas) dentro de la cache del procesador
+DEFAULT_CHUNK_SIZE = 256
+
+# Cada cuántos niveles se descartan las filas que ya llegaron a una hoja
+COMPACT_EVERY = 3
+
+# Por encima de estas filas el recorrido en NumPy es más lento que el de
+# scikit-learn (Cython, árbol por árbol; unas 2.5 veces a partir de 10^4 filas),
+# así que los lotes grandes se delegan al RandomForest guardado
+LARGE_BATCH_ROWS = 500
+
+# Filas por bloque al obtener la probabilidad de cada árbol con scikit-learn
+SKLEARN_CHUNK_SIZE = 4096
+
+# Cuantiles de la probabilidad por árbol que se reportan como banda de incertidumbre
+UNCERTAINTY_QUANTILES = (0.05, 0.5, 0.95)
+
+# Arrays del bosque guardados como archivos .npy individuales
+FOREST_ARRAYS = [
+    "feature", "threshold", "children_left", "children_right", "value", "roots", "classes",
+    "traversal_children", "traversal_feature", "traversal_threshold", "is_leaf",
+]
+
+
+def _traversal_arrays(feature, threshold, children_left, children_right):
+    """
+    Disposición intercalada para el recorrido: con k = 2 * nodo, el hijo
+    siguiente es children[k + (x > umbral)] y no hace falta np.where.
+    """
+    return {
+        "traversal_children": (2 * np.stack([children_left, children_right], axis=1).ravel()).astype(np.int32),
+        "traversal_feature": np.repeat(feature, 2).astype(np.int32),
+        "traversal_threshold": np.repeat(threshold, 2).astype(np.float64),
+        "is_leaf": children_left == np.arange(len(feature)),
+    }
+
+
+def forest_arrays(model):
+    """
+    Aplana un RandomForestClassifier entrenado en arrays contiguos de nodos
+    (feature, threshold, hijos y probabilidades por hoja).
+
+    Los índices de hijos son globales (todos los árboles concatenados). En las
+    hojas los hijos apuntan al propio nodo, de modo que el recorrido puede
+    avanzar un número fijo de pasos sin ramas especiales. Devuelve los arrays
+    (incluidos los derivados del recorrido) y los metadatos.
+    """
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        own = np.arange(offset, offset + n)
+
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        lefts.append(np.where(is_leaf, own, tree.children_left + offset))
+        rights.append(np.where(is_leaf, own, tree.children_right + offset))
+
+        # Probabilidad por clase en cada nodo (normalizada como en predict_proba)
+        value = tree.value[:, 0, :]
+        values.append(value / value.sum(axis=1, keepdims=True))
+
+        roots.append(offset)
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+
+    arrays = {
+        "feature": np.concatenate(features).astype(np.int32),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "children_left": np.concatenate(lefts).astype(np.int32),
+        "children_right": np.concatenate(rights).astype(np.int32),
+        "value": np.concatenate(values).astype(np.float64),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "classes": np.asarray(model.classes_),
+    }
+    arrays.update(_traversal_arrays(
+        arrays["feature"], arrays["threshold"], arrays["children_left"], arrays["children_right"]
+    ))
+    return arrays, {"max_depth": int(max_depth), "n_features": int(model.n_features_in_)}
+
+
+def export_forest(model, path=COMPILED_MODEL_DIR):
+    """
+    Guarda el bosque aplanado (ver `forest_arrays`) como archivos .npy en el
+    directorio `path`. Los arrays derivados del recorrido también se guardan
+    para que la carga no cree copias privadas por proceso.
+    """
+    arrays, meta = forest_arrays(model)
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(array))
+    _update_metadata(path, meta)
+
+
+def export_scaler(scaler, path=COMPILED_MODEL_DIR):
+    """Guarda la media y la escala del StandardScaler como .npy junto al bosque."""
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "scaler_mean.npy"), np.asarray(scaler.mean_, dtype=np.float64))
+    np.save(os.path.join(path, "scaler_scale.npy"), np.asarray(scaler.scale_, dtype=np.float64))
+    names = getattr(scaler, "feature_names_in_", None)
+    _update_metadata(path, {"scaler_features": None if names is None else [str(n) for n in names]})
+
+
+def _update_metadata(path, values):
+    meta_path = os.path.join(path, "meta.json")
+    meta = {}
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+    meta.update(values)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+
+def _read_metadata(path):
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class CompiledScaler:
+    """
+    Equivalente de StandardScaler.transform con la media y la escala en arrays
+    (sin importar scikit-learn al inicio).
+    """
+
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+        self.n_features_in_ = len(mean)
+
+    @classmethod
+    def load(cls, path=COMPILED_MODEL_DIR, mmap_mode="r"):
+        return cls(
+            np.load(os.path.join(path, "scaler_mean.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, "scaler_scale.npy"), mmap_mode=mmap_mode),
+        )
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        X -= self.mean_
+        X /= self.scale_
+        return X
+
+
+class CompiledForest:
+    """
+    Predictor del bosque aleatorio basado en arrays de nodos.
+
+    Evalúa todos los árboles para un lote de filas a la vez mediante un
+    recorrido vectorizado, sin la validación de entrada ni el despacho por
+    estimador de scikit-learn. Expone `predict_proba` y `predict` con la
+    misma semántica que el RandomForestClassifier original.
+
+    Si se indica `model_path` (el pickle del mismo bosque), los lotes de más
+    de LARGE_BATCH_ROWS filas se evalúan con scikit-learn, que se carga la
+    primera vez que llega un lote grande.
+    """
+
+    def __init__(self, feature, threshold, children_left, children_right, value,
+                 roots, max_depth, n_features, classes, model_path=None, **traversal):
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.classes_ = classes
+        self.n_estimators = len(roots)
+        self.model_path = model_path
+        self._sklearn_model = None
+
+        if not traversal:
+            traversal = _traversal_arrays(feature, threshold, children_left, children_right)
+        self._children = traversal["traversal_children"]
+        self._feature = traversal["traversal_feature"]
+        self._threshold = traversal["traversal_threshold"]
+        self._is_leaf = traversal["is_leaf"]
+
+    @classmethod
+    def load(cls, path=COMPILED_MODEL_DIR, mmap_mode="r", model_path=None):
+        """
+        Carga el bosque desde el directorio de .npy con `mmap_mode` (por defecto
+        solo lectura y compartido entre procesos). Acepta también el formato
+        .npz anterior, que se carga completo en memoria. `model_path` habilita
+        los lotes grandes con scikit-learn (ver la clase).
+        """
+        if str(path).endswith(".npz"):
+            with np.load(path) as data:
+                arrays = {key: data[key] for key in data.files}
+            return cls(**arrays, model_path=model_path)
+
+        meta = _read_metadata(path)
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in FOREST_ARRAYS
+        }
+        return cls(max_depth=meta["max_depth"], n_features=meta["n_features"], model_path=model_path, **arrays)
+
+    @classmethod
+    def from_model(cls, model):
+        """Compila en memoria un RandomForestClassifier entrenado (sin escribir a disco)."""
+        arrays, meta = forest_arrays(model)
+        return cls(**arrays, **meta)
+
+    def _large_batch_model(self, n_rows):
+        """RandomForest de scikit-learn para un lote de `n_rows` filas, o None si va por el recorrido compilado."""
+        if n_rows <= LARGE_BATCH_ROWS or self.model_path is None:
+            return None
+        if self._sklearn_model is None:
+            import joblib
+            self._sklearn_model = joblib.load(self.model_path)
+        return self._sklearn_model
+
+    def apply(self, X):
+        """Índice global de la hoja alcanzada en cada árbol: array (n_árboles, n_filas)."""
+        # scikit-learn compara en float32; se replica para obtener las mismas hojas
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"Se esperaban {self.n_features_in_} características, se recibió la forma {X.shape}."
+            )
+        n_rows = X.shape[0]
+        X_flat = X.ravel()
+
+        # Estado aplanado: una entrada por (árbol, fila)
+        k = np.repeat(2 * self.roots.astype(np.int32), n_rows)
+        row_offset = np.tile(np.arange(n_rows, dtype=np.int32) * self.n_features_in_, self.n_estimators)
+
+        # Solo se avanzan las entradas que aún no llegaron a una hoja
+        active = np.arange(k.size)
+        k_active, offset_active = k, row_offset
+        for depth in range(self.max_depth):
+            x_value = np.take(X_flat, np.take(self._feature, k_active) + offset_active)
+            k_active = np.take(self._children, k_active + (x_value > np.take(self._threshold, k_active)))
+            if depth % COMPACT_EVERY == COMPACT_EVERY - 1:
+                k[active] = k_active
+                alive = ~self._is_leaf[k_active // 2]
+                active, k_active, offset_active = active[alive], k_active[alive], offset_active[alive]
+                if not active.size:
+                    break
+        k[active] = k_active
+        return (k // 2).reshape(self.n_estimators, n_rows)
+
+    def predict_proba(self, X, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Promedio de las probabilidades por hoja de todos los árboles: (n_filas, n_clases)."""
+        X = np.asarray(X)
+        model = self._large_batch_model(X.shape[0])
+        if model is not None:
+            return model.predict_proba(X)
+        proba = np.empty((X.shape[0], self.value.shape[1]), dtype=np.float64)
+        for start in range(0, X.shape[0], chunk_size):
+            leaves = self.apply(X[start:start + chunk_size])
+            proba[start:start + chunk_size] = self.value[leaves].mean(axis=0)
+        return proba
+
+    def predict_distribution(self, X, quantiles=UNCERTAINTY_QUANTILES, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Probabilidad de la clase 1 y su dispersión entre árboles, en el mismo
+        recorrido del bosque: dict de arrays (ver `summarize_tree_probabilities`).
+        """
+        X = np.asarray(X)
+        model = self._large_batch_model(X.shape[0])
+        if model is not None:
+            return predict_distribution(model, X, quantiles)
+        parts = [summarize_tree_probabilities(np.empty((self.n_estimators, 0)), quantiles)]
+        for start in range(0, X.shape[0], chunk_size):
+            leaves = self.apply(X[start:start + chunk_size])
+            parts.append(summarize_tree_probabilities(self.value[leaves, 1], quantiles))
+        return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def summarize_tree_probabilities(P, quantiles=UNCERTAINTY_QUANTILES):
+    """
+    Resume la probabilidad de la clase 1 de cada árbol, P (n_árboles, n_filas):
+    media (la probabilidad del bosque), desviación estándar, cuantiles y
+    acuerdo de votos (fracción de árboles que votan la misma clase, p >= 0.5,
+    que el bosque).
+    """
+    proba = P.mean(axis=0)
+    summary = {"proba_ia": proba, "proba_ia_std": P.std(axis=0)}
+    for q, values in zip(quantiles, np.quantile(P, quantiles, axis=0)):
+        summary[f"proba_ia_p{round(q * 100):02d}"] = values
+    summary["acuerdo_votos"] = ((P >= 0.5) == (proba >= 0.5)).mean(axis=0)
+    return summary
+
+
+def predict_distribution(model, X_scaled, quantiles=UNCERTAINTY_QUANTILES):
+    """
+    `predict_distribution` para el bosque compilado o para un
+    RandomForestClassifier de scikit-learn (la probabilidad de cada árbol sale
+    de sus estimadores, que es lo mismo que promedia su predict_proba).
+    """
+    if hasattr(model, "predict_distribution"):
+        return model.predict_distribution(X_scaled, quantiles)
+    X_scaled = np.asarray(X_scaled, dtype=np.float64)
+    parts = [summarize_tree_probabilities(np.empty((len(model.estimators_), 0)), quantiles)]
+    for start in range(0, X_scaled.shape[0], SKLEARN_CHUNK_SIZE):
+        X_chunk = X_scaled[start:start + SKLEARN_CHUNK_SIZE]
+        P = np.stack([tree.predict_proba(X_chunk)[:, 1] for tree in model.estimators_])
+        parts.append(summarize_tree_probabilities(P, quantiles))
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+def load_predictor(compiled_path=COMPILED_MODEL_DIR, model_path="modelo_rf.joblib"):
+    """
+    Predictor para inferencia: el bosque compilado si existe (con los lotes
+    grandes delegados a `model_path`); si no, el RandomForest de scikit-learn
+    (en ese caso se importa joblib).
+    """
+    try:
+        return CompiledForest.load(compiled_path, model_path=model_path)
+    except FileNotFoundError:
+        import joblib
+        return joblib.load(model_path)
+
+
+def load_scaler(compiled_path=COMPILED_MODEL_DIR, scaler_path="scaler.joblib"):
+    """Scaler para inferencia: los arrays compilados si existen; si no, el de scikit-learn."""
+    try:
+        return CompiledScaler.load(compiled_path)
+    except FileNotFoundError:
+        import joblib
+        return joblib.load(scaler_path)
+
+
+def available_variants():
+    """Variantes de MODEL_VARIANTS cuyos artefactos existen en disco."""
+    return [
+        name for name, (model_path, compiled_path) in MODEL_VARIANTS.items()
+        if os.path.exists(model_path) or os.path.isdir(compiled_path)
+    ]
+
+
+def max_abs_difference(compiled, model, X):
+    """Máxima diferencia absoluta entre el predictor compilado y `model.predict_proba`."""
+    return float(np.max(np.abs(compiled.predict_proba(X) - model.predict_proba(X))))
@@ -0,0 +1,113 @@
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import shap
+import matplotlib.pyplot as plt
+from instrumentation import metrics
+
+# Decimales con los que se redondea el vector escalado para formar la clave de cache.
+# Entradas casi idénticas (diferencias por debajo de este nivel) comparten la explicación.
+KEY_DECIMALS = 4
+
+
+class LRUCache:
+    """Cache LRU acotado y seguro entre hilos (varias sesiones de Streamlit)."""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+def make_key(x_scaled):
+    """Clave de cache a partir del vector de entrada escalado (1 fila)."""
+    x = np.round(np.asarray(x_scaled, dtype=float).ravel(), KEY_DECIMALS)
+    return (x + 0.0).tobytes()  # +0.0 unifica -0.0 y 0.0
+
+
+class ExplanationCache:
+    """
+    Memoriza los valores SHAP (clase 1) y el PNG del gráfico de cascada por
+    vector de entrada escalado, para no repetir el recorrido de árboles ni el
+    renderizado de matplotlib en análisis repetidos.
+    """
+
+    def __init__(self, explainer, feature_names, maxsize=128):
+        self.explainer = explainer
+        self.feature_names = list(feature_names)
+        self.explanations = LRUCache(maxsize)
+        self.images = LRUCache(maxsize)
+
+    def explain(self, x_scaled):
+        """Devuelve (shap_values, base_value) de la clase 1 para una fila escalada."""
+        key = make_key(x_scaled)
+        cached = self.explanations.get(key)
+        metrics.count("shap_values", hit=cached is not None)
+        if cached is not None:
+            return cached
+
+        x = np.asarray(x_scaled, dtype=float).reshape(1, -1)
+        with metrics.stage("shap_values"):
+            explanation = self.explainer(x)
+        values = np.asarray(explanation.values[0, :, 1], dtype=float)
+        base_value = float(np.ravel(explanation.base_values[0])[1])
+        result = (values, base_value)
+        self.explanations.put(key, result)
+        return result
+
+    def waterfall_png(self, x_scaled, explanation=None):
+        """
+        PNG (bytes) del gráfico de cascada SHAP para una fila escalada. Si se
+        pasa `explanation` = (shap_values, base_value) ya calculada (p. ej.
+        guardada en el historial de la sesión), no se vuelve a ejecutar SHAP.
+        """
+        key = make_key(x_scaled)
+        cached = self.images.get(key)
+        metrics.count("shap_render", hit=cached is not None)
+        if cached is not None:
+            return cached
+
+        values, base_value = self.explain(x_scaled) if explanation is None else explanation
+        with metrics.stage("shap_render"):
+            png = render_waterfall_png(values, base_value, np.ravel(x_scaled), self.feature_names)
+        self.images.put(key, png)
+        return png
+
+
+def render_waterfall_png(values, base_value, data, feature_names):
+    """Dibuja el gráfico de cascada SHAP y lo devuelve como bytes PNG."""
+    explanation = shap.Explanation(
+        values=np.asarray(values),
+        base_values=base_value,
+        data=np.asarray(data),
+        feature_names=list(feature_names),
+    )
+    fig, ax = plt.subplots(figsize=(8, 6))
+    try:
+        shap.waterfall_plot(explanation, max_display=len(feature_names), show=False)
+        buffer = io.BytesIO()
+        plt.gcf().savefig(buffer, format="png", bbox_inches="tight", dpi=120)
+    finally:
+        # Cerrar siempre la figura para no acumular memoria en el servidor
+        plt.close(plt.gcf())
+        plt.close(fig)
+    return buffer.getvalue()
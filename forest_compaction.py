@@ -0,0 +1,208 @@
+"""
+Compactación del bosque: subconjunto de árboles que reproduce al modelo completo.
+
+Los árboles se ordenan por selección voraz (en cada paso se agrega el árbol que
+deja el promedio del subconjunto más cerca de la probabilidad del bosque
+completo sobre los casos de selección) y se toma el prefijo más corto que
+cumple la tolerancia: diferencia máxima de probabilidad <= `tolerance` y la
+misma clase (p >= 0.5) en todos esos casos.
+
+La selección usa una parte fija de los casos de mmc2.csv; la tolerancia se
+verifica después fuera de la muestra, en los casos retenidos y en copias de
+ellos con las entradas perturbadas (~10 %). El reporte indica si el subconjunto
+la cumple también allí.
+
+La probabilidad de cada árbol sale de un solo recorrido del bosque compilado,
+por lo que evaluar todos los prefijos no requiere predecir de nuevo.
+"""
+import copy
+import io
+import json
+import time
+
+import joblib
+import numpy as np
+from compiled_forest import MODEL_VARIANTS, CompiledForest, export_forest, export_scaler
+from risk_classification import classify_risk
+
+# Diferencia máxima de probabilidad aceptada frente al modelo completo
+DEFAULT_TOLERANCE = 0.05
+
+# Fracción mínima de casos con la misma clase (p >= 0.5) que el modelo completo
+DEFAULT_LABEL_AGREEMENT = 1.0
+
+# Fracción de los casos que no se usa para elegir los árboles (validación)
+VALIDATION_FRACTION = 0.3
+
+# Perturbación relativa (desviación estándar) de cada entrada, en unidades
+# originales, y copias perturbadas por caso retenido
+PERTURBATION = 0.10
+PERTURBED_COPIES = 10
+
+SEED = 0
+
+COMPACTION_REPORT_FILE = "reporte_compactacion.json"
+
+
+def tree_probabilities(compiled, X):
+    """Probabilidad de la clase 1 de cada árbol para cada fila: array (n_árboles, n_filas)."""
+    return compiled.value[compiled.apply(X), 1]
+
+
+def greedy_tree_order(P, target):
+    """
+    Orden de los árboles por selección voraz: cada paso agrega el árbol que
+    minimiza el error cuadrático entre el promedio acumulado y `target`.
+    """
+    n_trees = P.shape[0]
+    remaining = np.ones(n_trees, dtype=bool)
+    total = np.zeros(P.shape[1])
+    order = []
+    for k in range(1, n_trees + 1):
+        error = (((total + P) / k - target) ** 2).sum(axis=1)
+        error[~remaining] = np.inf
+        best = int(np.argmin(error))
+        order.append(best)
+        remaining[best] = False
+        total += P[best]
+    return np.asarray(order)
+
+
+def agreement(proba, reference):
+    """Métricas de concordancia de probabilidades y etiquetas frente a `reference`."""
+    diff = np.abs(proba - reference)
+    return {
+        "max_abs_diff": float(diff.max()),
+        "mean_abs_diff": float(diff.mean()),
+        "label_agreement": float(np.mean((proba >= 0.5) == (reference >= 0.5))),
+        "risk_agreement": float(np.mean([classify_risk(a) == classify_risk(b) for a, b in zip(proba, reference)])),
+    }
+
+
+def select_trees(P, target, tolerance=DEFAULT_TOLERANCE, min_label_agreement=DEFAULT_LABEL_AGREEMENT):
+    """
+    Índices (ordenados) del subconjunto más pequeño de árboles que cumple la
+    tolerancia. Si ninguno la cumple se devuelven todos los árboles.
+    """
+    order = greedy_tree_order(P, target)
+    prefix_means = np.cumsum(P[order], axis=0) / np.arange(1, len(order) + 1)[:, None]
+    max_diff = np.abs(prefix_means - target).max(axis=1)
+    labels_ok = ((prefix_means >= 0.5) == (target >= 0.5)).mean(axis=1) >= min_label_agreement
+    valid = np.flatnonzero((max_diff <= tolerance) & labels_ok)
+    k = int(valid[0]) + 1 if valid.size else len(order)
+    return np.sort(order[:k])
+
+
+def split_cases(n_cases, validation_fraction=VALIDATION_FRACTION, seed=SEED):
+    """Índices (selección, validación) de una partición aleatoria fija de los casos."""
+    order = np.random.default_rng(seed).permutation(n_cases)
+    n_validation = int(round(n_cases * validation_fraction))
+    return np.sort(order[n_validation:]), np.sort(order[:n_validation])
+
+
+def perturb_cases(X_scaled, scaler, relative=PERTURBATION, copies=PERTURBED_COPIES, seed=SEED):
+    """
+    `copies` copias de cada caso con sus entradas multiplicadas por
+    (1 + N(0, relative)) en unidades originales, devueltas ya escaladas.
+    """
+    rng = np.random.default_rng(seed)
+    X = np.repeat(X_scaled * scaler.scale_ + scaler.mean_, copies, axis=0)
+    X *= 1.0 + rng.normal(0.0, relative, X.shape)
+    return (X - scaler.mean_) / scaler.scale_
+
+
+def check_subset(compiled, indices, X_scaled, tolerance=DEFAULT_TOLERANCE,
+                 min_label_agreement=DEFAULT_LABEL_AGREEMENT):
+    """Concordancia del subconjunto `indices` con el bosque en `X_scaled` y si cumple la tolerancia."""
+    P = tree_probabilities(compiled, X_scaled)
+    result = agreement(P[indices].mean(axis=0), P.mean(axis=0))
+    result["cumple_tolerancia"] = bool(
+        result["max_abs_diff"] <= tolerance and result["label_agreement"] >= min_label_agreement
+    )
+    return result
+
+
+def subset_forest(model, indices):
+    """Copia del RandomForestClassifier con solo los árboles `indices` (comparte los árboles)."""
+    compact = copy.copy(model)
+    compact.estimators_ = [model.estimators_[i] for i in indices]
+    compact.n_estimators = len(compact.estimators_)
+    return compact
+
+
+def _best_time(func, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def model_profile(model, X):
+    """Tamaño, nodos y latencias (predicción compilada y SHAP) de un modelo, en ms y MB."""
+    import shap
+
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    compiled = CompiledForest.from_model(model)
+    explainer = shap.TreeExplainer(model)
+    return {
+        "arboles": len(model.estimators_),
+        "nodos": int(sum(e.tree_.node_count for e in model.estimators_)),
+        "tamano_mb": buffer.tell() / 1e6,
+        "predict_1_ms": _best_time(lambda: compiled.predict_proba(X[:1]), 50) * 1000,
+        "predict_lote_ms": _best_time(lambda: compiled.predict_proba(X), 10) * 1000,
+        "shap_explainer_ms": _best_time(lambda: shap.TreeExplainer(model), 3) * 1000,
+        "shap_1_ms": _best_time(lambda: explainer(X[:1]), 5) * 1000,
+    }
+
+
+def compact_model(model, scaler, X_scaled, tolerance=DEFAULT_TOLERANCE,
+                  min_label_agreement=DEFAULT_LABEL_AGREEMENT, report_path=COMPACTION_REPORT_FILE):
+    """
+    Compacta `model` eligiendo los árboles sobre una parte de `X_scaled` y
+    validando en el resto (y en sus copias perturbadas), guarda el modelo
+    compacto (joblib y arrays compilados, con el mismo scaler) y un reporte
+    JSON comparativo. Devuelve el reporte.
+    """
+    X_scaled = np.asarray(X_scaled, dtype=np.float64)
+    compiled = CompiledForest.from_model(model)
+    selection, validation = split_cases(X_scaled.shape[0])
+    P = tree_probabilities(compiled, X_scaled[selection])
+    target = P.mean(axis=0)
+
+    indices = select_trees(P, target, tolerance, min_label_agreement)
+    compact = subset_forest(model, indices)
+
+    held_out = check_subset(compiled, indices, X_scaled[validation], tolerance, min_label_agreement)
+    perturbed = check_subset(
+        compiled, indices, perturb_cases(X_scaled[validation], scaler), tolerance, min_label_agreement
+    )
+
+    model_path, compiled_path = MODEL_VARIANTS["compacto"]
+    joblib.dump(compact, model_path)
+    export_forest(compact, compiled_path)
+    export_scaler(scaler, compiled_path)
+
+    report = {
+        "tolerancia": tolerance,
+        "concordancia_etiquetas_minima": min_label_agreement,
+        "casos": int(X_scaled.shape[0]),
+        "casos_seleccion": int(selection.size),
+        "arboles_elegidos": indices.tolist(),
+        "concordancia": agreement(P[indices].mean(axis=0), target),
+        "validacion": {
+            "casos_retenidos": int(validation.size),
+            "perturbacion_relativa": PERTURBATION,
+            "copias_perturbadas": PERTURBED_COPIES,
+            "retenidos": held_out,
+            "perturbados": perturbed,
+            "cumple_tolerancia": held_out["cumple_tolerancia"] and perturbed["cumple_tolerancia"],
+        },
+        "completo": model_profile(model, X_scaled),
+        "compacto": model_profile(compact, X_scaled),
+    }
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
@@ -0,0 +1,95 @@
+"""
+Explicaciones SHAP precalculadas para todos los casos de entrenamiento.
+
+`python save_model.py --explicaciones` calcula una sola vez los valores SHAP
+(clase 1) de cada caso de mmc2.csv y los guarda en 'shap_global.npz', dentro
+del directorio compilado de cada variante del modelo. La app lee ese archivo
+para mostrar la importancia global y los gráficos de dependencia sin
+recorrer el bosque en cada solicitud (los casos más cercanos se buscan con el
+índice de case_index.py).
+"""
+import os
+
+import numpy as np
+import pandas as pd
+from batch_analysis import FEATURE_ORDER_IA, KPA_TO_PSF
+
+GLOBAL_SHAP_FILE = "shap_global.npz"
+
+# Columnas descriptivas de cada caso que se guardan junto a los valores SHAP
+CASE_COLUMNS = ["Case Number", "Earthquake", "Site", "Liquefied?"]
+
+
+def app_units(X):
+    """Copia de la matriz de características (orden del modelo) con σ'v de psf a kPa, como en la app."""
+    features = np.asarray(X, dtype=np.float64).copy()
+    features[:, FEATURE_ORDER_IA.index("estres_v_ef")] /= KPA_TO_PSF
+    return features
+
+
+def compute_global_shap(model, X, X_scaled, y, cases):
+    """
+    Valores SHAP de la clase 1 para todas las filas de `X_scaled`.
+
+    `X` contiene las características sin escalar (σ'v en psf, como en el
+    entrenamiento) y `cases` las columnas de CASE_COLUMNS alineadas con X.
+    Devuelve un dict de arrays listo para `save_global_shap`.
+    """
+    import shap
+
+    explanation = shap.TreeExplainer(model)(np.asarray(X_scaled, dtype=float))
+    return {
+        "shap_values": np.asarray(explanation.values[:, :, 1], dtype=np.float32),
+        "base_value": np.asarray(float(np.ravel(explanation.base_values[0])[1])),
+        "features": app_units(X),
+        "proba": np.asarray(model.predict_proba(X_scaled)[:, 1], dtype=np.float64),
+        "liquefied": np.asarray(y, dtype=np.int8),
+        "feature_names": np.asarray(FEATURE_ORDER_IA, dtype=str),
+        **{f"case_{i}": np.asarray(cases[col].astype(str), dtype=str) for i, col in enumerate(CASE_COLUMNS)},
+    }
+
+
+def save_global_shap(arrays, compiled_path):
+    os.makedirs(compiled_path, exist_ok=True)
+    path = os.path.join(compiled_path, GLOBAL_SHAP_FILE)
+    np.savez_compressed(path, **arrays)
+    return path
+
+
+class GlobalExplanations:
+    """Consultas de solo lectura sobre el artefacto de SHAP global."""
+
+    def __init__(self, arrays):
+        self.shap_values = arrays["shap_values"].astype(np.float64)
+        self.base_value = float(arrays["base_value"])
+        self.features = arrays["features"]
+        self.proba = arrays["proba"]
+        self.liquefied = arrays["liquefied"].astype(bool)
+        self.feature_names = arrays["feature_names"].tolist()
+        self.cases = pd.DataFrame({col: arrays[f"case_{i}"] for i, col in enumerate(CASE_COLUMNS)})
+
+    @classmethod
+    def load(cls, compiled_path):
+        with np.load(os.path.join(compiled_path, GLOBAL_SHAP_FILE)) as data:
+            return cls({key: data[key] for key in data.files})
+
+    def __len__(self):
+        return len(self.proba)
+
+    def importance(self):
+        """Importancia global: media de |SHAP| por característica (mayor primero)."""
+        values = np.abs(self.shap_values).mean(axis=0)
+        return (
+            pd.DataFrame({"característica": self.feature_names, "media |SHAP|": values})
+            .sort_values("media |SHAP|", ascending=False)
+            .reset_index(drop=True)
+        )
+
+    def dependence(self, feature):
+        """Valor de `feature` y su contribución SHAP en cada caso histórico."""
+        j = self.feature_names.index(feature)
+        return pd.DataFrame({
+            feature: self.features[:, j],
+            "SHAP": self.shap_values[:, j],
+            "Licuó": np.where(self.liquefied, "Sí", "No"),
+        })
@@ -0,0 +1,167 @@
+"""
+Actualización incremental del modelo con casos históricos nuevos.
+
+Los casos nuevos (mismo formato que mmc2.csv) se validan y se agregan a los
+de la versión actual; el bosque crece con `warm_start`: se conservan todos los
+árboles existentes y se entrenan solo `n_new_trees` árboles nuevos sobre el
+conjunto acumulado. El scaler no se reajusta (los umbrales de los árboles
+existentes dependen de él).
+
+El resultado se publica como una versión nueva (ver model_versions.py) con el
+modelo, el scaler, el bosque compilado, el SHAP global y el índice de casos
+recalculados para el conjunto acumulado, más los casos agregados hasta el
+momento (casos_agregados.npz).
+"""
+import os
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+from batch_analysis import FEATURE_ORDER_IA
+from case_index import CaseIndex
+from compiled_forest import COMPILED_MODEL_DIR, CompiledForest, export_forest, export_scaler
+from global_explanations import CASE_COLUMNS, app_units, compute_global_shap, save_global_shap
+from model_versions import (
+    MODEL_FILE, SCALER_FILE, VERSIONS_DIR, artifact_paths, discard_staging, publish_version, staging_dir,
+)
+
+ADDED_CASES_FILE = "casos_agregados.npz"
+
+DEFAULT_NEW_TREES = 50
+
+# Rangos físicamente plausibles de cada característica (unidades de entrenamiento, σ'v en psf)
+FEATURE_RANGES = {
+    "N1_60_cs": (0.0, 100.0),
+    "FC": (0.0, 100.0),
+    "D50": (0.0, 50.0),
+    "a_max": (1e-3, 3.0),
+    "estres_v_ef": (1.0, 50_000.0),
+    "Mw": (4.0, 10.0),
+}
+
+
+def load_added_cases(version, root=VERSIONS_DIR):
+    """Casos agregados hasta `version`: (X, y, casos). Vacíos para los artefactos base."""
+    empty = (np.empty((0, len(FEATURE_ORDER_IA))), np.empty(0, dtype=np.int8),
+             pd.DataFrame({col: pd.Series(dtype=str) for col in CASE_COLUMNS}))
+    if version is None:
+        return empty
+    path = os.path.join(root, version, ADDED_CASES_FILE)
+    if not os.path.exists(path):
+        return empty
+    with np.load(path) as data:
+        cases = pd.DataFrame({col: data[f"case_{i}"] for i, col in enumerate(CASE_COLUMNS)})
+        return data["X"], data["y"], cases
+
+
+def validate_new_cases(X_new, y_new, X_known, y_known):
+    """
+    Máscara de casos nuevos aceptados y conteo de rechazos por motivo:
+    valores fuera de rango y duplicados (de casos conocidos o dentro del lote).
+    """
+    X_new = np.asarray(X_new, dtype=float)
+    in_range = np.ones(len(X_new), dtype=bool)
+    for j, name in enumerate(FEATURE_ORDER_IA):
+        low, high = FEATURE_RANGES[name]
+        in_range &= (X_new[:, j] >= low) & (X_new[:, j] <= high)
+
+    def keys(X, y):
+        return [tuple(np.round(row, 6)) + (int(label),) for row, label in zip(X, y)]
+
+    known = set(keys(X_known, y_known))
+    duplicate = np.zeros(len(X_new), dtype=bool)
+    for i, key in enumerate(keys(X_new, y_new)):
+        duplicate[i] = key in known
+        known.add(key)
+
+    accepted = in_range & ~duplicate
+    return accepted, {"fuera_de_rango": int((~in_range).sum()), "duplicados": int((in_range & duplicate).sum())}
+
+
+def grow_forest(model, X_scaled, y, n_new_trees=DEFAULT_NEW_TREES):
+    """Agrega `n_new_trees` árboles entrenados sobre (X_scaled, y) conservando los existentes."""
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_new_trees)
+    with warnings.catch_warnings():
+        # class_weight="balanced" con warm_start: los árboles nuevos se ajustan sobre
+        # el conjunto completo acumulado, que es el caso que esa advertencia admite
+        warnings.filterwarnings("ignore", message=".*class_weight presets.*")
+        model.fit(X_scaled, y)
+    model.set_params(warm_start=False)
+    return model
+
+
+def update_model(X_base, y_base, cases_base, X_new, y_new, cases_new, parent_version=None,
+                 n_new_trees=DEFAULT_NEW_TREES, root=VERSIONS_DIR, activate=True):
+    """
+    Agrega los casos nuevos válidos a la versión `parent_version` (None = base),
+    hace crecer el bosque y publica la versión nueva. `X_*` en unidades de
+    entrenamiento (orden FEATURE_ORDER_IA, σ'v en psf); `cases_*` con las
+    columnas de CASE_COLUMNS. Devuelve el manifest (con el reporte).
+    """
+    model_path, scaler_path, _ = artifact_paths("completo", parent_version, root)
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+
+    X_added, y_added, cases_added = load_added_cases(parent_version, root)
+    X_known = np.vstack([X_base, X_added])
+    y_known = np.concatenate([y_base, y_added])
+    accepted, rejected = validate_new_cases(X_new, y_new, X_known, y_known)
+    if not accepted.any():
+        raise ValueError(f"No hay casos nuevos válidos para agregar (rechazados: {rejected}).")
+
+    X_new, y_new = np.asarray(X_new, dtype=float)[accepted], np.asarray(y_new)[accepted]
+    cases_new = cases_new[accepted].astype(str).reset_index(drop=True)
+    X_added = np.vstack([X_added, X_new])
+    y_added = np.concatenate([y_added, y_new]).astype(np.int8)
+    cases_added = pd.concat([cases_added, cases_new], ignore_index=True)
+
+    X_all = np.vstack([X_base, X_added])
+    y_all = np.concatenate([y_base, y_added])
+    cases_all = pd.concat([cases_base.astype(str).reset_index(drop=True), cases_added], ignore_index=True)
+
+    columns = getattr(scaler, "feature_names_in_", None)
+    def scale(X):
+        return scaler.transform(pd.DataFrame(X, columns=columns) if columns is not None else X)
+    X_all_scaled = scale(X_all)
+    X_new_scaled = scale(X_new)
+
+    parent = CompiledForest.from_model(model)
+    proba_before = parent.predict_proba(X_all_scaled)[:, 1]
+    new_before = parent.predict_proba(X_new_scaled)[:, 1]
+    n_trees_before = len(model.estimators_)
+
+    grow_forest(model, X_all_scaled, y_all, n_new_trees)
+    compiled = CompiledForest.from_model(model)
+    proba_after = compiled.predict_proba(X_all_scaled)[:, 1]
+    new_after = compiled.predict_proba(X_new_scaled)[:, 1]
+
+    staging = staging_dir(root)
+    try:
+        joblib.dump(model, os.path.join(staging, MODEL_FILE))
+        joblib.dump(scaler, os.path.join(staging, SCALER_FILE))
+        compiled_path = os.path.join(staging, COMPILED_MODEL_DIR)
+        export_forest(model, compiled_path)
+        export_scaler(scaler, compiled_path)
+        # Caches derivados de la versión: SHAP global e índice de casos del conjunto acumulado
+        save_global_shap(compute_global_shap(model, X_all, X_all_scaled, y_all, cases_all), compiled_path)
+        CaseIndex.build(X_all_scaled, cases_all, app_units(X_all)).save(compiled_path)
+        np.savez(
+            os.path.join(staging, ADDED_CASES_FILE), X=X_added, y=y_added,
+            **{f"case_{i}": cases_added[col].to_numpy(dtype=str) for i, col in enumerate(CASE_COLUMNS)},
+        )
+        report = {
+            "version_anterior": parent_version,
+            "arboles": [n_trees_before, len(model.estimators_)],
+            "casos_base": int(len(X_base)),
+            "casos_agregados": int(len(X_added)),
+            "casos_nuevos": int(accepted.sum()),
+            "rechazados": rejected,
+            "acierto_nuevos": [float(np.mean((new_before >= 0.5) == y_new)),
+                               float(np.mean((new_after >= 0.5) == y_new))],
+            "max_cambio_probabilidad": float(np.abs(proba_after - proba_before).max()),
+        }
+        return publish_version(staging, report, root, activate)
+    except BaseException:
+        discard_staging(staging)
+        raise
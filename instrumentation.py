@@ -0,0 +1,101 @@
+"""
+Instrumentación ligera de etapas y caches.
+
+Uso:
+    from instrumentation import metrics
+
+    with metrics.stage("predict_proba", rows=len(X)):
+        ...
+    metrics.count("shap_values", hit=True)
+
+Las métricas se agregan en memoria por proceso (para el panel de diagnóstico)
+y, si se define la variable de entorno GEOLIQUEFAI_METRICS_LOG con una ruta,
+cada evento se escribe además como una línea JSON en ese archivo. El costo por
+etapa es un par de lecturas de reloj y una actualización bajo lock, por lo que
+puede quedar activo en producción.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+LOG_ENV_VAR = "GEOLIQUEFAI_METRICS_LOG"
+
+logger = logging.getLogger("geoliquefai.metrics")
+logger.propagate = False
+
+
+class _JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(record.msg, ensure_ascii=False, default=str)
+
+
+def configure_json_log(path):
+    """Envía los eventos de métricas como líneas JSON al archivo `path` (una vez por ruta)."""
+    path = os.path.abspath(path)
+    for handler in logger.handlers:
+        if getattr(handler, "baseFilename", None) == path:
+            return
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(_JsonLinesFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+class Metrics:
+    """Agregador de tiempos por etapa y contadores de aciertos/fallos de cache, seguro entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+
+    @contextmanager
+    def stage(self, name, **context):
+        """Mide la duración del bloque y la acumula bajo `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            with self._lock:
+                stats = self._stages.setdefault(name, {"n": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0})
+                stats["n"] += 1
+                stats["total_ms"] += elapsed_ms
+                stats["last_ms"] = elapsed_ms
+                stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            if logger.handlers:
+                logger.info({"ts": time.time(), "event": "stage", "stage": name,
+                             "ms": round(elapsed_ms, 3), "pid": os.getpid(), **context})
+
+    def count(self, name, hit):
+        """Registra un acierto (`hit=True`) o un fallo de cache para `name`."""
+        key = "hits" if hit else "misses"
+        with self._lock:
+            counter = self._counters.setdefault(name, {"hits": 0, "misses": 0})
+            counter[key] += 1
+        if logger.handlers:
+            logger.info({"ts": time.time(), "event": "cache", "cache": name, "hit": hit, "pid": os.getpid()})
+
+    def snapshot(self):
+        """Copia de las métricas acumuladas: (etapas, contadores)."""
+        with self._lock:
+            stages = {name: dict(stats) for name, stats in self._stages.items()}
+            counters = {name: dict(c) for name, c in self._counters.items()}
+        for stats in stages.values():
+            stats["mean_ms"] = stats["total_ms"] / stats["n"]
+        return stages, counters
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+
+# Instancia única por proceso
+metrics = Metrics()
+
+if os.environ.get(LOG_ENV_VAR):
+    configure_json_log(os.environ[LOG_ENV_VAR])
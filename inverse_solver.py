@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+from batch_analysis import BATCH_COLUMNS, FEATURE_ORDER_IA, KPA_TO_PSF, predict_proba_batch
+from traditional_method import calculate_traditional_fs_batch
+
+# Variables que se pueden despejar y su intervalo de búsqueda
+THRESHOLD_VARIABLES = {
+    "a_max": (0.01, 2.0),
+    "Mw": (4.0, 10.0),
+    "N1_60_cs": (1.0, 60.0),
+}
+
+# Frontera de cada método: FS = 1 (tradicional) y p = 0.5 (IA)
+TARGETS = {"FS": 1.0, "IA": 0.5}
+
+DEFAULT_ITERATIONS = 30
+
+
+def _evaluate(metric, M, model, scaler):
+    """FS tradicional o probabilidad de IA para todas las filas de la matriz M (columnas BATCH_COLUMNS)."""
+    cols = {col: M[:, i] for i, col in enumerate(BATCH_COLUMNS)}
+    if metric == "FS":
+        return calculate_traditional_fs_batch(cols)["FS_trad"]
+    X = np.column_stack([cols[col] for col in FEATURE_ORDER_IA])
+    X[:, FEATURE_ORDER_IA.index("estres_v_ef")] *= KPA_TO_PSF
+    valid = np.isfinite(X).all(axis=1)
+    proba = np.full(X.shape[0], np.nan)
+    if valid.any():
+        proba[valid] = predict_proba_batch(model, scaler, X[valid])
+    return proba
+
+
+def bisect_thresholds(base, variables, metric, model, scaler, n_iter=DEFAULT_ITERATIONS):
+    """
+    Bisección vectorizada del valor de cada variable en que el método cruza su frontera.
+
+    `base` es una matriz (n, len(BATCH_COLUMNS)) con los casos. Todas las
+    combinaciones (caso, variable) avanzan juntas: en cada iteración se hace
+    una sola evaluación del método (una llamada a predict_proba para la IA)
+    sobre todas las filas. Las filas sin cambio de signo en el intervalo de
+    búsqueda quedan en NaN. Si la respuesta no es monótona (posible en el
+    bosque) se devuelve uno de los cruces.
+
+    Devuelve un dict variable -> array (n,) de umbrales.
+    """
+    base = np.asarray(base, dtype=float)
+    n = base.shape[0]
+    target = TARGETS[metric]
+
+    # Un problema por (variable, caso), apilados en una sola matriz
+    M = np.tile(base, (len(variables), 1))
+    rows = np.arange(M.shape[0])
+    col_idx = np.repeat([BATCH_COLUMNS.index(v) for v in variables], n)
+    lo = np.repeat([THRESHOLD_VARIABLES[v][0] for v in variables], n).astype(float)
+    hi = np.repeat([THRESHOLD_VARIABLES[v][1] for v in variables], n).astype(float)
+
+    def residual(values):
+        M[rows, col_idx] = values
+        return _evaluate(metric, M, model, scaler) - target
+
+    sign_lo = np.sign(residual(lo))
+    sign_hi = np.sign(residual(hi))
+    bracketed = np.isfinite(sign_lo) & np.isfinite(sign_hi) & (sign_lo * sign_hi <= 0)
+
+    for _ in range(n_iter):
+        mid = 0.5 * (lo + hi)
+        same_side = np.sign(residual(mid)) == sign_lo
+        lo = np.where(same_side, mid, lo)
+        hi = np.where(same_side, hi, mid)
+
+    solution = np.where(bracketed, 0.5 * (lo + hi), np.nan)
+    return {v: solution[i * n:(i + 1) * n] for i, v in enumerate(variables)}
+
+
+def solve_thresholds(df, model, scaler, variables=None, n_iter=DEFAULT_ITERATIONS):
+    """
+    Umbrales críticos para muchos casos a la vez: para cada variable (a_max, Mw,
+    N1_60_cs) el valor que lleva al FS = 1 y a p = 0.5, con el resto de
+    parámetros fijos. Columnas de salida: `<variable>_crit_FS` y `<variable>_crit_IA`.
+    """
+    variables = list(variables or THRESHOLD_VARIABLES)
+    missing = [col for col in BATCH_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas para el cálculo de umbrales: {missing}")
+
+    base = df[BATCH_COLUMNS].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float, copy=True)
+    out = pd.DataFrame(index=df.index)
+    for metric in TARGETS:
+        for variable, values in bisect_thresholds(base, variables, metric, model, scaler, n_iter).items():
+            out[f"{variable}_crit_{metric}"] = values
+    return out
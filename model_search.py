@@ -0,0 +1,160 @@
+"""
+Búsqueda de hiperparámetros del Random Forest con validación cruzada
+estratificada (k-fold) en paralelo.
+
+Cada candidato se evalúa en un proceso del pool. El dataset escalado se
+escribe una sola vez como .npy y cada proceso lo abre con mmap_mode, de modo
+que los procesos comparten las mismas páginas en lugar de recibir una copia
+serializada por tarea.
+
+Por candidato se reporta: accuracy y AUC medios en los k pliegues, tamaño del
+modelo (pickle) y número de nodos. Los finalistas (AUC dentro de una
+tolerancia respecto a la mejor) se cronometran después, uno por uno en el
+proceso principal con el pool ya cerrado, con el bosque compilado (el que usa
+la app) para una fila y para el dataset completo; así la latencia no depende
+de los entrenamientos que corrían en paralelo. Se elige el finalista más rápido.
+"""
+import io
+import itertools
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+from compiled_forest import CompiledForest
+
+# Grilla por defecto (combinaciones completas)
+PARAM_GRID = {
+    "n_estimators": [100, 200, 400],
+    "max_depth": [6, 10, 14],
+    "min_samples_leaf": [1, 2, 4],
+}
+
+# Parámetros fijos, iguales al entrenamiento de save_model.py
+BASE_PARAMS = {
+    "min_samples_split": 5,
+    "random_state": 42,
+    "class_weight": "balanced",
+}
+
+DEFAULT_FOLDS = 5
+
+# Pérdida de AUC aceptada a cambio de un modelo más rápido
+DEFAULT_AUC_TOLERANCE = 0.01
+
+# Dataset compartido por proceso (abierto con mmap en el inicializador)
+_X = None
+_y = None
+
+
+def param_candidates(grid=PARAM_GRID):
+    """Lista de diccionarios con todas las combinaciones de la grilla."""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def _init_worker(data_dir):
+    global _X, _y
+    _X = np.load(os.path.join(data_dir, "X.npy"), mmap_mode="r")
+    _y = np.load(os.path.join(data_dir, "y.npy"), mmap_mode="r")
+
+
+def _model_size_bytes(model):
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return buffer.tell()
+
+
+def _latency_ms(compiled, X, repeats):
+    """Mejor tiempo de predict_proba del bosque compilado sobre `X` (ms)."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        compiled.predict_proba(X)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0
+
+
+def evaluate_candidate(params, n_folds=DEFAULT_FOLDS, seed=42):
+    """
+    Validación cruzada estratificada de un candidato sobre el dataset compartido
+    del proceso. Ajusta además el modelo con todos los datos para medir su
+    tamaño y devuelve su bosque compilado (clave "compilado") para cronometrarlo
+    en el proceso principal.
+    """
+    X, y = _X, _y
+    folds = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+    accuracies, aucs = [], []
+    start = time.perf_counter()
+    for train_idx, test_idx in folds.split(X, y):
+        model = RandomForestClassifier(**BASE_PARAMS, **params, n_jobs=1)
+        model.fit(X[train_idx], y[train_idx])
+        proba = model.predict_proba(X[test_idx])[:, 1]
+        accuracies.append(accuracy_score(y[test_idx], proba >= 0.5))
+        aucs.append(roc_auc_score(y[test_idx], proba))
+    cv_seconds = time.perf_counter() - start
+
+    model = RandomForestClassifier(**BASE_PARAMS, **params, n_jobs=1).fit(X, y)
+    return {
+        **params,
+        "accuracy": float(np.mean(accuracies)),
+        "accuracy_std": float(np.std(accuracies)),
+        "auc": float(np.mean(aucs)),
+        "auc_std": float(np.std(aucs)),
+        "nodos": int(sum(e.tree_.node_count for e in model.estimators_)),
+        "tamano_mb": _model_size_bytes(model) / 1e6,
+        "tiempo_cv_s": cv_seconds,
+        "compilado": CompiledForest.from_model(model),
+    }
+
+
+def run_search(X_scaled, y, candidates=None, n_folds=DEFAULT_FOLDS, n_workers=None,
+               auc_tolerance=DEFAULT_AUC_TOLERANCE):
+    """
+    Evalúa todos los candidatos en un pool de procesos (por defecto uno por
+    núcleo) y luego cronometra en serie a los finalistas (AUC dentro de
+    `auc_tolerance` de la mejor). Devuelve un DataFrame con una fila por
+    candidato; la latencia queda vacía (NaN) para los no finalistas.
+    """
+    candidates = param_candidates() if candidates is None else candidates
+    n_workers = n_workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory(prefix="geoliquefai_cv_") as data_dir:
+        np.save(os.path.join(data_dir, "X.npy"), np.ascontiguousarray(X_scaled, dtype=np.float64))
+        np.save(os.path.join(data_dir, "y.npy"), np.asarray(y, dtype=np.int64))
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(data_dir,)) as pool:
+            futures = [pool.submit(evaluate_candidate, params, n_folds) for params in candidates]
+            rows, compiled = [], []
+            for i, future in enumerate(futures, start=1):
+                row = future.result()
+                compiled.append(row.pop("compilado"))
+                rows.append(row)
+                print(f"  Candidato {i}/{len(candidates)}: {candidates[i - 1]} -> AUC {row['auc']:.3f}")
+
+    results = pd.DataFrame(rows)
+    results["latencia_1_ms"] = np.nan
+    results["latencia_lote_ms"] = np.nan
+    X = np.ascontiguousarray(X_scaled, dtype=np.float64)
+    finalists = np.flatnonzero(results["auc"] >= results["auc"].max() - auc_tolerance)
+    print(f"  Cronometrando {len(finalists)} finalistas en serie...")
+    for i in finalists:
+        results.loc[i, "latencia_1_ms"] = _latency_ms(compiled[i], X[:1], repeats=50)
+        results.loc[i, "latencia_lote_ms"] = _latency_ms(compiled[i], X, repeats=10)
+    return results
+
+
+def select_best(results, auc_tolerance=DEFAULT_AUC_TOLERANCE):
+    """
+    Candidato elegido: entre los que tienen AUC >= mejor AUC - tolerancia, el de
+    menor latencia por lote (la de una fila está dominada por costos fijos);
+    a igual latencia, el de mayor accuracy. Usar la misma tolerancia que en
+    `run_search`, que solo cronometra a esos finalistas.
+    """
+    eligible = results[results["auc"] >= results["auc"].max() - auc_tolerance]
+    return eligible.sort_values(["latencia_lote_ms", "accuracy"], ascending=[True, False]).iloc[0]
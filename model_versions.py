@@ -0,0 +1,209 @@
+"""
+Versiones de los artefactos del modelo y recarga en caliente.
+
+Cada actualización incremental (`python save_model.py --actualizar ...`) se
+publica como un directorio inmutable versiones/<id>/ con el mismo esquema que
+los artefactos base (modelo_rf.joblib, scaler.joblib y modelo_rf_arrays/) y un
+manifest.json con el SHA-256 de cada archivo. El id incluye un número de
+secuencia y el hash del contenido, p. ej. v003-1a2b3c4d5e.
+
+La versión activa se indica en versiones/ACTUAL. La publicación es atómica:
+el directorio se arma aparte y se renombra, y luego el puntero se reemplaza
+con os.replace, de modo que un lector ve la versión anterior completa o la
+nueva completa. La app y el servicio leen el puntero y recargan el modelo sin
+reiniciar el proceso; los caches derivados (explicadores, grillas, SHAP
+global) usan el id de versión como parte de su clave.
+
+Sin versiones publicadas se usan los artefactos base (versión None). La
+variante compacta no se actualiza de forma incremental: se deriva del bosque
+base, por lo que no se ofrece mientras hay una versión incremental activa.
+Reentrenar el modelo base vuelve el puntero a los artefactos base.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from compiled_forest import COMPILED_MODEL_DIR, MODEL_VARIANTS, available_variants, load_predictor, load_scaler
+
+VERSIONS_DIR = "versiones"
+CURRENT_POINTER = "ACTUAL"
+MANIFEST_FILE = "manifest.json"
+
+# Nombres de los artefactos dentro de cada versión (mismos que los base)
+MODEL_FILE = "modelo_rf.joblib"
+SCALER_FILE = "scaler.joblib"
+
+# Segundos entre lecturas del puntero en procesos de larga duración (servicio)
+DEFAULT_CHECK_INTERVAL = 1.0
+
+
+def current_version(root=VERSIONS_DIR):
+    """Id de la versión activa, o None si no hay versiones publicadas."""
+    try:
+        with open(os.path.join(root, CURRENT_POINTER), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def active_version(variant="completo", root=VERSIONS_DIR):
+    """Versión que corresponde a `variant`: la activa para el modelo completo, None para el resto."""
+    return current_version(root) if variant == "completo" else None
+
+
+def servable_variants(root=VERSIONS_DIR):
+    """Variantes disponibles que corresponden al modelo activo (sin la compacta si hay una versión activa)."""
+    variants = available_variants()
+    if current_version(root) is not None:
+        variants = [variant for variant in variants if variant == "completo"]
+    return variants
+
+
+def artifact_paths(variant="completo", version=None, root=VERSIONS_DIR):
+    """(modelo joblib, scaler joblib, directorio compilado) de la variante en la versión dada."""
+    if version is None or variant != "completo":
+        model_path, compiled_path = MODEL_VARIANTS[variant]
+        return model_path, SCALER_FILE, compiled_path
+    path = os.path.join(root, version)
+    return os.path.join(path, MODEL_FILE), os.path.join(path, SCALER_FILE), os.path.join(path, COMPILED_MODEL_DIR)
+
+
+def load_version(variant="completo", version=None, root=VERSIONS_DIR):
+    """Predictor y scaler de inferencia (compilados si existen) de una versión."""
+    model_path, scaler_path, compiled_path = artifact_paths(variant, version, root)
+    return load_predictor(compiled_path, model_path), load_scaler(compiled_path, scaler_path)
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_hashes(path):
+    """SHA-256 de cada archivo bajo `path` (rutas relativas con '/') y el hash del conjunto."""
+    files = {}
+    for folder, _, names in os.walk(path):
+        for name in names:
+            full = os.path.join(folder, name)
+            rel = os.path.relpath(full, path).replace(os.sep, "/")
+            if rel != MANIFEST_FILE:
+                files[rel] = file_sha256(full)
+    digest = hashlib.sha256("".join(f"{rel}:{files[rel]}\n" for rel in sorted(files)).encode("utf-8"))
+    return files, digest.hexdigest()
+
+
+def read_manifest(version, root=VERSIONS_DIR):
+    with open(os.path.join(root, version, MANIFEST_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def list_versions(root=VERSIONS_DIR):
+    """Manifiestos de las versiones publicadas, de la más antigua a la más reciente."""
+    if not os.path.isdir(root):
+        return []
+    manifests = []
+    for name in os.listdir(root):
+        if os.path.exists(os.path.join(root, name, MANIFEST_FILE)):
+            manifests.append(read_manifest(name, root))
+    return sorted(manifests, key=lambda m: m["secuencia"])
+
+
+def verify_version(version, root=VERSIONS_DIR):
+    """True si los archivos de la versión coinciden con los hashes de su manifest."""
+    manifest = read_manifest(version, root)
+    files, content_hash = content_hashes(os.path.join(root, version))
+    return files == manifest["archivos"] and content_hash == manifest["hash_contenido"]
+
+
+def staging_dir(root=VERSIONS_DIR):
+    """Directorio temporal (en el mismo sistema de archivos) para armar una versión nueva."""
+    path = os.path.join(root, f".tmp-{uuid.uuid4().hex}")
+    os.makedirs(path)
+    return path
+
+
+def publish_version(staging, info, root=VERSIONS_DIR, activate=True):
+    """
+    Publica el directorio `staging` como versión nueva: calcula los hashes,
+    escribe el manifest con `info`, lo renombra a versiones/<id>/ y, si
+    `activate`, lo marca como activo. Devuelve el manifest.
+    """
+    sequence = max((m["secuencia"] for m in list_versions(root)), default=0) + 1
+    files, content_hash = content_hashes(staging)
+    version = f"v{sequence:03d}-{content_hash[:10]}"
+    manifest = {
+        "version": version,
+        "secuencia": sequence,
+        "creada": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "hash_contenido": content_hash,
+        "archivos": files,
+        **info,
+    }
+    with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(staging, os.path.join(root, version))
+    if activate:
+        activate_version(version, root)
+    return manifest
+
+
+def discard_staging(staging):
+    shutil.rmtree(staging, ignore_errors=True)
+
+
+def activate_version(version, root=VERSIONS_DIR):
+    """Cambia la versión activa de forma atómica (también sirve para volver a una anterior)."""
+    if version is not None and not os.path.exists(os.path.join(root, version, MANIFEST_FILE)):
+        raise ValueError(f"No existe la versión '{version}'.")
+    os.makedirs(root, exist_ok=True)
+    tmp_path = os.path.join(root, f"{CURRENT_POINTER}.tmp-{uuid.uuid4().hex}")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version or "")
+    os.replace(tmp_path, os.path.join(root, CURRENT_POINTER))
+
+
+class ArtifactWatcher:
+    """
+    Mantiene cargada la versión activa del modelo en un proceso de larga
+    duración. `get()` devuelve (versión, modelo, scaler); como mucho cada
+    `check_interval` segundos relee el puntero y, si cambió, carga la nueva
+    versión y la reemplaza de una sola vez (las llamadas en curso siguen con
+    la tupla anterior).
+    """
+
+    def __init__(self, variant="completo", root=VERSIONS_DIR, check_interval=DEFAULT_CHECK_INTERVAL):
+        self.variant = variant
+        self.root = root
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._lock = threading.Lock()
+        version = active_version(variant, root)
+        self._current = (version, *load_version(variant, version, root))
+        self._next_check = time.monotonic() + check_interval
+
+    def get(self):
+        if time.monotonic() >= self._next_check:
+            self._refresh()
+        return self._current
+
+    def _refresh(self):
+        with self._lock:
+            if time.monotonic() < self._next_check:
+                return
+            self._next_check = time.monotonic() + self.check_interval
+            version = active_version(self.variant, self.root)
+            if version == self._current[0]:
+                return
+            try:
+                self._current = (version, *load_version(self.variant, version, self.root))
+                self.reloads += 1
+            except (FileNotFoundError, OSError):
+                # Puntero a una versión incompleta o borrada: se sigue con la cargada
+                pass
@@ -0,0 +1,182 @@
+import io
+
+import numpy as np
+from batch_analysis import FEATURE_ORDER_IA, KPA_TO_PSF, predict_proba_batch
+from case_dataset import load_cases
+from traditional_method import calculate_traditional_fs_batch
+
+DATA_FILE = "mmc2.csv"
+
+PSF_TO_KPA = 1.0 / KPA_TO_PSF
+FT_TO_M = 0.3048
+
+# Variables inciertas: (columna de media, columna de desviación estándar, factor a unidades de la app)
+UNCERTAINTY_COLUMNS = {
+    "N1_60_cs": ("(N1) 60", "s (N1)60", 1.0),
+    "FC": ("FC %", "s FC %", 1.0),
+    "D50": ("D50 (mm)", "s D50", 1.0),
+    "a_max": ("a max (g)", "s a max", 1.0),
+    "estres_v_ef": ("sv' (psf)", "s sv' (psf)", PSF_TO_KPA),
+    "estres_v_total": ("sv (psf)", "s sv (psf)", PSF_TO_KPA),
+    "z_m": ("Critical Depth (ft)", "s critical depth (ft)", FT_TO_M),
+}
+
+# Incertidumbre de modelo como factores multiplicativos de media 1 (su "desviación" es un CoV)
+FACTOR_KEYS = ["rd", "MSF"]
+
+# Límites físicos para recortar las muestras normales
+BOUNDS = {
+    "N1_60_cs": (0.5, None),
+    "FC": (0.0, 100.0),
+    "D50": (0.01, None),
+    "a_max": (0.005, None),
+    "estres_v_ef": (1.0, None),
+    "estres_v_total": (1.0, None),
+    "z_m": (0.3, None),
+    "rd": (0.1, None),
+    "MSF": (0.1, None),
+}
+
+# Histogramas fijos para acumular percentiles sin guardar todas las muestras
+FS_BINS = np.concatenate([[0.0], np.logspace(-2, 1.5, 701), [np.inf]])
+PROBA_BINS = np.linspace(0.0, 1.0, 1001)
+
+
+def load_case_histories(path=DATA_FILE):
+    """
+    Casos históricos de mmc2.csv con la media y la desviación estándar de cada
+    variable incierta en unidades de la app (kPa, m). Las columnas de desviación
+    se llaman `s_<variable>`; rd y MSF se expresan como CoV.
+    """
+    df_raw = load_cases(path)
+
+    cases = df_raw[["Case Number", "Earthquake", "Site", "Liquefied?"]].copy()
+    cases["Mw"] = df_raw["Magnitude for KMw"]
+    for key, (mean_col, std_col, factor) in UNCERTAINTY_COLUMNS.items():
+        cases[key] = df_raw[mean_col] * factor
+        cases[f"s_{key}"] = df_raw[std_col] * factor
+
+    cases["s_rd"] = df_raw["s rd"] / df_raw["rd"]
+    msf = np.maximum(6.9 * np.exp(-cases["Mw"] / 4) - 0.058, 0.69)
+    cases["s_MSF"] = df_raw["s MSF"] / msf
+
+    return cases.dropna(subset=list(UNCERTAINTY_COLUMNS) + ["Mw"]).reset_index(drop=True)
+
+
+def default_cov(cases):
+    """Coeficiente de variación mediano de cada variable en la base de casos."""
+    cov = {}
+    for key in UNCERTAINTY_COLUMNS:
+        ratio = cases[f"s_{key}"] / cases[key].replace(0, np.nan)
+        cov[key] = float(np.nanmedian(ratio))
+    for key in FACTOR_KEYS:
+        cov[key] = float(np.nanmedian(cases[f"s_{key}"]))
+    return cov
+
+
+def sample_inputs(rng, mean, std, n):
+    """Muestras normales independientes recortadas a límites físicos: dict de arrays."""
+    samples = {}
+    for key in list(UNCERTAINTY_COLUMNS) + FACTOR_KEYS:
+        center = 1.0 if key in FACTOR_KEYS else mean[key]
+        values = rng.normal(center, std.get(key, 0.0), n)
+        low, high = BOUNDS[key]
+        samples[key] = np.clip(values, low, high)
+    # El esfuerzo total nunca es menor que el efectivo
+    samples["estres_v_total"] = np.maximum(samples["estres_v_total"], samples["estres_v_ef"])
+    samples["Mw"] = np.full(n, mean["Mw"], dtype=float)
+    return samples
+
+
+def _percentiles_from_hist(counts, edges, qs):
+    """Percentiles aproximados (resolución de un bin) a partir de un histograma."""
+    cdf = np.cumsum(counts) / max(counts.sum(), 1)
+    idx = np.searchsorted(cdf, np.asarray(qs) / 100.0)
+    idx = np.clip(idx, 0, len(edges) - 2)
+    upper = edges[idx + 1]
+    return {q: float(edges[i] if not np.isfinite(u) else u) for q, i, u in zip(qs, idx, upper)}
+
+
+def run_monte_carlo(mean, std, model, scaler, n_samples=100_000, n_samples_ia=None,
+                    chunk_size=50_000, seed=42, percentiles=(5, 50, 95)):
+    """
+    FS y probabilidad de IA probabilísticos por Monte Carlo.
+
+    Muestrea las variables de `mean`/`std` por bloques de `chunk_size` con una
+    semilla fija y acumula conteos e histogramas, de modo que la memoria no
+    depende de `n_samples`. El FS y el bosque se evalúan en todas las
+    muestras; el bosque recibe cada bloque en una sola llamada, así que los
+    bloques grandes van al predictor de scikit-learn (ver LARGE_BATCH_ROWS).
+    `n_samples_ia` limita el bosque a las primeras muestras si se necesita
+    una respuesta más rápida.
+    """
+    rng = np.random.default_rng(seed)
+    n_samples_ia = n_samples if n_samples_ia is None else min(n_samples_ia, n_samples)
+
+    fs_counts = np.zeros(len(FS_BINS) - 1, dtype=np.int64)
+    proba_counts = np.zeros(len(PROBA_BINS) - 1, dtype=np.int64)
+    n_fs_valid = n_fs_fail = 0
+    n_ia_done = n_ia_high = 0
+    proba_sum = 0.0
+
+    for start in range(0, n_samples, chunk_size):
+        n = min(chunk_size, n_samples - start)
+        samples = sample_inputs(rng, mean, std, n)
+
+        # --- Método tradicional (rd y MSF con su incertidumbre de modelo) ---
+        trad = calculate_traditional_fs_batch(samples)
+        fs = trad["FS_trad"] * samples["MSF"] / samples["rd"]
+        fs = fs[np.isfinite(fs)]
+        n_fs_valid += fs.size
+        n_fs_fail += int(np.count_nonzero(fs < 1.0))
+        fs_counts += np.histogram(fs, bins=FS_BINS)[0]
+
+        # --- Bosque aleatorio (en todas las muestras, salvo límite n_samples_ia) ---
+        n_ia = min(n, n_samples_ia - n_ia_done)
+        if n_ia > 0:
+            X = np.column_stack([samples[key][:n_ia] for key in FEATURE_ORDER_IA])
+            X[:, FEATURE_ORDER_IA.index("estres_v_ef")] *= KPA_TO_PSF
+            proba = predict_proba_batch(model, scaler, X, chunk_size=n_ia)
+            n_ia_done += n_ia
+            n_ia_high += int(np.count_nonzero(proba >= 0.5))
+            proba_sum += float(proba.sum())
+            proba_counts += np.histogram(proba, bins=PROBA_BINS)[0]
+
+    return {
+        "n_samples": n_samples,
+        "n_samples_ia": n_ia_done,
+        "P_FS_lt_1": n_fs_fail / max(n_fs_valid, 1),
+        "FS_percentiles": _percentiles_from_hist(fs_counts, FS_BINS, percentiles),
+        "P_IA_ge_05": n_ia_high / max(n_ia_done, 1),
+        "proba_ia_mean": proba_sum / max(n_ia_done, 1),
+        "proba_ia_percentiles": _percentiles_from_hist(proba_counts, PROBA_BINS, percentiles),
+        "fs_hist": fs_counts,
+        "proba_hist": proba_counts,
+    }
+
+
+def plot_monte_carlo_png(result):
+    """Histogramas de FS y probabilidad de IA con los umbrales FS = 1 y p = 0.5, como PNG."""
+    import matplotlib.pyplot as plt
+
+    fig, (ax_fs, ax_p) = plt.subplots(1, 2, figsize=(12, 4.5))
+    try:
+        edges = FS_BINS[1:-1]
+        ax_fs.stairs(result["fs_hist"][1:-1], edges, fill=True, color="tab:blue", alpha=0.7)
+        ax_fs.set_xscale("log")
+        ax_fs.axvline(1.0, color="tab:red", ls="--", label=f"P(FS<1) = {result['P_FS_lt_1'] * 100:.1f} %")
+        ax_fs.set_xlabel("Factor de Seguridad (FS)")
+        ax_fs.set_ylabel("Muestras")
+        ax_fs.legend()
+
+        ax_p.stairs(result["proba_hist"], PROBA_BINS * 100, fill=True, color="tab:purple", alpha=0.7)
+        ax_p.axvline(50.0, color="tab:red", ls="--", label=f"P(p≥0.5) = {result['P_IA_ge_05'] * 100:.1f} %")
+        ax_p.set_xlabel("Probabilidad IA [%]")
+        ax_p.legend()
+
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", dpi=120)
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
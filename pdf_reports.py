@@ -0,0 +1,335 @@
+"""
+Reportes PDF (fpdf2) de los resultados de un lote.
+
+Cada sitio del lote tiene una página con los datos de entrada, el FS del
+método tradicional (CSR, CRR y factores), la probabilidad del modelo de IA,
+las etiquetas de riesgo y el gráfico de cascada SHAP. Se puede generar un PDF
+por sitio o un solo reporte consolidado con una tabla resumen al inicio.
+
+Los valores SHAP y los gráficos se calculan en un pool de procesos, por
+bloques de sitios. Cada proceso dibuja un gráfico a la vez y lo escribe en
+disco (el PDF del sitio o el PNG para el consolidado), y el proceso principal
+agrega los archivos al zip a medida que terminan los bloques. Así ninguna
+etapa mantiene en memoria todas las figuras del lote.
+
+Uso:
+    python pdf_reports.py resultados.csv -o reportes.zip [--consolidado] [--modelo compacto]
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from batch_analysis import BATCH_COLUMNS, FEATURE_ORDER_IA, KPA_TO_PSF
+from compiled_forest import MODEL_VARIANTS
+from model_versions import active_version, artifact_paths
+from risk_classification import classify_fs, classify_risk
+from traditional_method import TRIGGERING_METHODS
+
+# Sitios por tarea del pool (una llamada a SHAP por bloque)
+DEFAULT_BLOCK_SIZE = 25
+
+INPUT_LABELS = {
+    "N1_60_cs": "Golpes (N1)60cs",
+    "FC": "Contenido de finos FC [%]",
+    "D50": "Diámetro medio D50 [mm]",
+    "a_max": "Aceleración máxima a_max [g]",
+    "Mw": "Magnitud Mw",
+    "estres_v_ef": "Esfuerzo efectivo sigma'v [kPa]",
+    "z_m": "Profundidad z [m]",
+    "estres_v_total": "Esfuerzo total sigma v [kPa]",
+}
+
+TRADITIONAL_LABELS = {
+    "FS_trad": "Factor de seguridad FS",
+    "CSR": "CSR",
+    "CRR_adj": "CRR ajustado",
+    "rd": "rd",
+    "MSF": "MSF",
+    "K_sigma": "K_sigma",
+}
+
+UNCERTAINTY_LABELS = {
+    "proba_ia_std": "Desviación estándar entre árboles",
+    "proba_ia_p05": "Probabilidad P5 por árbol",
+    "proba_ia_p95": "Probabilidad P95 por árbol",
+    "acuerdo_votos": "Acuerdo de votos entre árboles",
+}
+
+# Columnas de resultados que no se repiten como "datos adicionales" del sitio
+RESULT_COLUMNS = set(TRADITIONAL_LABELS) | set(UNCERTAINTY_LABELS) | {
+    "proba_ia", "proba_ia_p50", "risk_label_ia", "risk_label_trad", "confianza_ia",
+}
+
+# Columnas de otros métodos de disparo (analyze_batch con `methods`)
+METHOD_LABELS = {
+    **{f"FS_{name}": f"FS - {label}" for name, (label, _, _) in TRIGGERING_METHODS.items()},
+    **{f"P_L_{name}": f"P_L - {label}" for name, (label, _, _) in TRIGGERING_METHODS.items()},
+}
+RESULT_COLUMNS |= set(METHOD_LABELS)
+
+REPORT_TITLE = "GeoLiquefAI - Reporte de potencial de licuefacción"
+
+
+def _site_name(record, position):
+    """Nombre del sitio: primera columna adicional del lote (p. ej. un id) o el número de fila."""
+    for key, value in record.items():
+        if key not in BATCH_COLUMNS and key not in RESULT_COLUMNS and not pd.isna(value):
+            return f"{key} {value}"
+    return f"Fila {position + 1}"
+
+
+def _fmt(value, digits=3):
+    if value is None or pd.isna(value):
+        return "-"
+    if isinstance(value, (int, float, np.floating, np.integer)):
+        return f"{float(value):.{digits}f}"
+    return str(value)
+
+
+def _text(value):
+    # Las fuentes estándar de fpdf solo cubren latin-1
+    return str(value).encode("latin-1", "replace").decode("latin-1")
+
+
+def risk_labels(record):
+    """Etiquetas de riesgo de la IA y del método tradicional de una fila de resultados."""
+    proba, fs = record.get("proba_ia"), record.get("FS_trad")
+    label_ia = "Error" if proba is None or pd.isna(proba) else classify_risk(proba)
+    label_trad = classify_fs(None if fs is None or pd.isna(fs) else fs)
+    return label_ia, label_trad
+
+
+def _new_pdf():
+    from fpdf import FPDF
+
+    pdf = FPDF(format="A4")
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.set_title(REPORT_TITLE)
+    return pdf
+
+
+def _table(pdf, rows, widths=(95, 85)):
+    from fpdf.enums import XPos, YPos
+
+    pdf.set_font("Helvetica", size=10)
+    for label, value in rows:
+        pdf.cell(widths[0], 6, _text(label), border=1)
+        pdf.cell(widths[1], 6, _text(value), border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.ln(3)
+
+
+def _heading(pdf, text, size=12):
+    from fpdf.enums import XPos, YPos
+
+    pdf.set_font("Helvetica", "B", size)
+    pdf.cell(0, 8, _text(text), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+
+def add_site_page(pdf, record, position, shap_png=None):
+    """Agrega la página de un sitio. `shap_png`: ruta o bytes del gráfico SHAP (None si no aplica)."""
+    pdf.add_page()
+    _heading(pdf, REPORT_TITLE, size=14)
+    _heading(pdf, f"Sitio: {_site_name(record, position)}")
+
+    extra = [(key, _fmt(value)) for key, value in record.items()
+             if key not in BATCH_COLUMNS and key not in RESULT_COLUMNS]
+    _heading(pdf, "Datos de entrada", size=11)
+    _table(pdf, [(INPUT_LABELS[col], _fmt(record.get(col))) for col in BATCH_COLUMNS] + extra)
+
+    label_ia, label_trad = risk_labels(record)
+    proba = record.get("proba_ia")
+    _heading(pdf, "Resultados", size=11)
+    _table(pdf, [
+        ("Probabilidad de licuefacción (IA)", "-" if pd.isna(proba) else f"{proba * 100:.2f} %"),
+        ("Riesgo según IA", label_ia),
+        *[(label, _fmt(record[col])) for col, label in UNCERTAINTY_LABELS.items() if col in record],
+        *[(label, _fmt(record.get(col))) for col, label in TRADITIONAL_LABELS.items()],
+        ("Riesgo según método tradicional", label_trad),
+        *[(label, _fmt(record[col])) for col, label in METHOD_LABELS.items() if col in record],
+    ])
+
+    if shap_png is not None:
+        _heading(pdf, "Contribución de cada factor (SHAP, clase 1)", size=11)
+        pdf.image(shap_png, w=150)
+    else:
+        pdf.set_font("Helvetica", "I", 10)
+        pdf.multi_cell(0, 6, _text("Sin gráfico SHAP: la fila tiene datos faltantes o inválidos."))
+
+
+def add_summary_pages(pdf, records, created):
+    """Tabla resumen de todos los sitios (primeras páginas del reporte consolidado)."""
+    from fpdf.enums import XPos, YPos
+
+    pdf.add_page()
+    _heading(pdf, REPORT_TITLE, size=14)
+    pdf.set_font("Helvetica", size=10)
+    pdf.cell(0, 6, _text(f"Reporte consolidado de {len(records)} sitios - {created:%Y-%m-%d %H:%M}"),
+             new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.ln(2)
+    widths = (50, 25, 35, 25, 45)
+    header = ("Sitio", "Prob. IA", "Riesgo IA", "FS", "Riesgo tradicional")
+    pdf.set_font("Helvetica", "B", 9)
+    for width, text in zip(widths, header):
+        pdf.cell(width, 6, _text(text), border=1)
+    pdf.ln(6)
+    pdf.set_font("Helvetica", size=9)
+    for position, record in enumerate(records):
+        proba = record.get("proba_ia")
+        label_ia, label_trad = risk_labels(record)
+        row = (_site_name(record, position), "-" if pd.isna(proba) else f"{proba * 100:.1f} %",
+               label_ia, _fmt(record.get("FS_trad")), label_trad)
+        for width, text in zip(widths, row):
+            pdf.cell(width, 5, _text(text)[:30], border=1)
+        pdf.ln(5)
+
+
+# --- Pool de procesos ---
+
+# Estado por proceso del pool (se inicializa una vez por proceso)
+_worker = {}
+
+
+def _init_worker(variant, version):
+    import joblib
+    import shap
+    from compiled_forest import load_scaler
+
+    model_path, scaler_path, compiled_path = artifact_paths(variant, version)
+    _worker["explainer"] = shap.TreeExplainer(joblib.load(model_path))
+    _worker["scaler"] = load_scaler(compiled_path, scaler_path)
+
+
+def render_block(records, positions, work_dir, consolidated):
+    """
+    Calcula SHAP de un bloque de sitios y escribe en `work_dir` un archivo por
+    sitio: su PDF, o el PNG del gráfico si el reporte es consolidado.
+    Devuelve la lista de (posición, nombre de archivo o None).
+    """
+    from explanation_cache import render_waterfall_png
+
+    X = np.array([[record.get(key, np.nan) for key in FEATURE_ORDER_IA] for record in records], dtype=float)
+    X[:, FEATURE_ORDER_IA.index("estres_v_ef")] *= KPA_TO_PSF
+    valid = np.isfinite(X).all(axis=1)
+    values = np.empty((0, len(FEATURE_ORDER_IA)))
+    X_scaled = np.full_like(X, np.nan)
+    if valid.any():
+        scaler = _worker["scaler"]
+        columns = getattr(scaler, "feature_names_in_", None)
+        X_scaled[valid] = scaler.transform(pd.DataFrame(X[valid], columns=columns) if columns is not None else X[valid])
+        explanation = _worker["explainer"](X_scaled[valid])
+        values = np.asarray(explanation.values[:, :, 1], dtype=float)
+        base_value = float(np.ravel(explanation.base_values[0])[1])
+
+    files = []
+    rows = iter(range(len(values)))
+    for record, position, ok, x_scaled in zip(records, positions, valid, X_scaled):
+        png = render_waterfall_png(values[next(rows)], base_value, x_scaled, FEATURE_ORDER_IA) if ok else None
+        if consolidated:
+            name = None
+            if png is not None:
+                name = f"shap_{position:05d}.png"
+                with open(os.path.join(work_dir, name), "wb") as f:
+                    f.write(png)
+        else:
+            pdf = _new_pdf()
+            add_site_page(pdf, record, position, png)
+            name = f"sitio_{position + 1:05d}.pdf"
+            pdf.output(os.path.join(work_dir, name))
+        files.append((position, name))
+    return files
+
+
+def generate_reports(results, zip_path, consolidated=False, variant="completo", version=None,
+                     block_size=DEFAULT_BLOCK_SIZE, n_workers=None, progress=None):
+    """
+    Genera los reportes de `results` (salida de `analyze_batch`) en `zip_path`.
+    `version` es la versión del modelo para SHAP (None = la activa al iniciar).
+    `progress(hechos, total)` se llama al terminar cada bloque de sitios.
+    Devuelve un resumen (sitios, archivos y tiempo).
+    """
+    version = version or active_version(variant)
+    records = results.to_dict(orient="records")
+    blocks = [list(range(start, min(start + block_size, len(records))))
+              for start in range(0, len(records), block_size)]
+    n_workers = n_workers or os.cpu_count() or 1
+    created = datetime.now()
+    start_time = time.perf_counter()
+    work_dir = tempfile.mkdtemp(prefix="reportes_")
+    n_files = 0
+    try:
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            charts = {}
+            # "spawn": los procesos no heredan los hilos del servidor de Streamlit
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=n_workers, mp_context=context, initializer=_init_worker,
+                                     initargs=(variant, version)) as pool:
+                futures = [
+                    pool.submit(render_block, [records[i] for i in block], block, work_dir, consolidated)
+                    for block in blocks
+                ]
+                for done, future in enumerate(as_completed(futures), start=1):
+                    for position, name in future.result():
+                        if consolidated:
+                            charts[position] = name
+                        else:
+                            path = os.path.join(work_dir, name)
+                            archive.write(path, arcname=name)
+                            os.remove(path)
+                            n_files += 1
+                    if progress is not None:
+                        progress(done, len(blocks))
+
+            if consolidated:
+                # Los gráficos se leen de disco uno por página
+                pdf = _new_pdf()
+                add_summary_pages(pdf, records, created)
+                for position, record in enumerate(records):
+                    name = charts.get(position)
+                    add_site_page(pdf, record, position, os.path.join(work_dir, name) if name else None)
+                name = f"reporte_consolidado_{created:%Y%m%d_%H%M%S}.pdf"
+                pdf_path = os.path.join(work_dir, name)
+                pdf.output(pdf_path)
+                archive.write(pdf_path, arcname=name)
+                n_files = 1
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "sitios": len(records),
+        "archivos": n_files,
+        "consolidado": consolidated,
+        "tiempo_s": time.perf_counter() - start_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera reportes PDF de los resultados de un lote.")
+    parser.add_argument("resultados", help="CSV de resultados (descargado de la app o de service.py score).")
+    parser.add_argument("-o", "--salida", default="reportes_geoliquefai.zip", help="Archivo zip de salida.")
+    parser.add_argument("--consolidado", action="store_true", help="Un solo PDF con todos los sitios.")
+    parser.add_argument("--modelo", choices=list(MODEL_VARIANTS), default="completo")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del pool (por defecto, uno por núcleo).")
+    args = parser.parse_args()
+
+    results = pd.read_csv(args.resultados, sep=None, engine="python")
+    results.columns = results.columns.astype(str).str.strip()
+
+    def report(done, total):
+        print(f"\r  Bloques: {done}/{total}", end="", flush=True)
+
+    summary = generate_reports(results, args.salida, args.consolidado, args.modelo,
+                               n_workers=args.procesos, progress=report)
+    print(f"\n{summary['sitios']} sitios -> {summary['archivos']} PDF en '{args.salida}' "
+          f"({summary['tiempo_s']:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
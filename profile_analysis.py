@@ -0,0 +1,195 @@
+import io
+
+import numpy as np
+import pandas as pd
+from batch_analysis import analyze_batch
+
+# Peso unitario del agua (kN/m³)
+GAMMA_W = 9.81
+
+# Profundidad máxima considerada en el Índice de Potencial de Licuefacción (m)
+LPI_MAX_DEPTH = 20.0
+
+# Columnas mínimas del registro SPT por muestra
+PROFILE_COLUMNS = ["z_m", "N1_60_cs", "FC", "D50"]
+
+
+def profile_template():
+    """Registro SPT de ejemplo (una fila por muestra); `gamma` [kN/m³] es opcional."""
+    return pd.DataFrame(
+        {
+            "z_m": [1.5, 3.0, 4.5, 6.0, 7.5, 9.0, 10.5, 12.0],
+            "N1_60_cs": [12.0, 9.0, 11.0, 14.0, 18.0, 22.0, 28.0, 35.0],
+            "FC": [15.0, 8.0, 5.0, 6.0, 10.0, 12.0, 8.0, 5.0],
+            "D50": [0.15, 0.25, 0.30, 0.30, 0.25, 0.22, 0.35, 0.40],
+        }
+    )
+
+
+def compute_stresses(z, water_table, gamma_dry, gamma_sat, gamma=None):
+    """
+    Esfuerzos verticales total y efectivo (kPa) en cada profundidad `z` (m).
+
+    Cada muestra representa el tramo entre la muestra anterior (o la superficie)
+    y su propia profundidad. Si se da `gamma` por muestra se usa en su tramo;
+    si no, el tramo se reparte entre `gamma_dry` (sobre el nivel freático) y
+    `gamma_sat` (bajo el nivel freático).
+    """
+    z = np.asarray(z, dtype=float)
+    top = np.concatenate([[0.0], z[:-1]])
+    if gamma is not None:
+        increments = np.asarray(gamma, dtype=float) * (z - top)
+    else:
+        above = np.clip(np.minimum(z, water_table) - top, 0.0, None)
+        below = (z - top) - above
+        increments = gamma_dry * above + gamma_sat * below
+    sv = np.cumsum(increments)
+    u = GAMMA_W * np.clip(z - water_table, 0.0, None)
+    return sv, sv - u
+
+
+def layer_thickness(z):
+    """Espesor representado por cada muestra (desde la muestra anterior o la superficie)."""
+    z = np.asarray(z, dtype=float)
+    return np.diff(np.concatenate([[0.0], z]))
+
+
+def volumetric_strain(fs, n1_60_cs):
+    """
+    Deformación volumétrica de reconsolidación (decimal) según Idriss & Boulanger (2008),
+    a partir de la deformación cortante máxima de Yoshimine et al. (2006).
+    """
+    fs = np.asarray(fs, dtype=float)
+    n = np.clip(np.asarray(n1_60_cs, dtype=float), 7.0, 46.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gamma_lim = np.clip(1.859 * (1.1 - np.sqrt(n / 46.0)) ** 3, 0.0, 0.5)
+        f_alpha = 0.032 + 0.69 * np.sqrt(n) - 0.13 * n
+        gamma_max = np.where(
+            fs >= 2.0,
+            0.0,
+            np.where(
+                fs <= f_alpha,
+                gamma_lim,
+                np.minimum(gamma_lim, 0.035 * (1 - f_alpha) * (2 - fs) / (fs - f_alpha)),
+            ),
+        )
+    gamma_max = np.where(np.isfinite(fs), gamma_max, 0.0)
+    return 1.5 * np.exp(-0.369 * np.sqrt(n)) * np.minimum(0.08, gamma_max)
+
+
+def liquefaction_indices(z, dz, fs, proba, eps_v, saturated):
+    """
+    Integra el perfil en índices de severidad:
+
+    - LPI: Índice de Potencial de Licuefacción (Iwasaki et al., 1978) con el FS.
+      Cada tramo [z - dz, z] se recorta a 0-20 m y el peso w(z) = 10 - 0.5 z se
+      evalúa en el punto medio del tramo recortado (integral exacta de w).
+    - LPI_IA: misma integral usando la probabilidad de la IA como severidad.
+    - LSN: Liquefaction Severity Number (van Ballegooy et al., 2014).
+    - asentamiento_cm: asentamiento por reconsolidación (suma de ε_v · dz).
+    """
+    z = np.asarray(z, dtype=float)
+    dz = np.asarray(dz, dtype=float)
+    fs = np.asarray(fs, dtype=float)
+    saturated = np.asarray(saturated, dtype=bool)
+
+    top = z - dz
+    bottom = np.minimum(z, LPI_MAX_DEPTH)
+    dz_lpi = np.clip(bottom - top, 0.0, None)
+    weight = np.where(saturated & (dz_lpi > 0), 10.0 - 0.25 * (top + bottom), 0.0)
+    severity_fs = np.where(np.isfinite(fs) & (fs < 1.0), 1.0 - fs, 0.0)
+    severity_ia = np.where(saturated, np.nan_to_num(np.asarray(proba, dtype=float), nan=0.0), 0.0)
+    eps_v = np.where(saturated, eps_v, 0.0)
+
+    return {
+        "LPI": float(np.sum(severity_fs * weight * dz_lpi)),
+        "LPI_IA": float(np.sum(severity_ia * weight * dz_lpi)),
+        "LSN": float(1000.0 * np.sum(eps_v / z * dz)),
+        "asentamiento_cm": float(100.0 * np.sum(eps_v * dz)),
+    }
+
+
+def analyze_profile(layers, model, scaler, water_table, a_max, Mw,
+                    gamma_dry=18.0, gamma_sat=20.0):
+    """
+    Analiza un sondeo completo en una sola pasada vectorizada.
+
+    Calcula σv y σ'v a lo largo de la columna, evalúa el FS tradicional y la
+    probabilidad de la IA en todas las muestras a la vez y las integra en los
+    índices LPI, LPI_IA, LSN y asentamiento. Las muestras sobre el nivel
+    freático se reportan pero no contribuyen a los índices.
+
+    Devuelve (DataFrame por muestra, dict de índices).
+    """
+    missing = [col for col in PROFILE_COLUMNS if col not in layers.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas en el registro SPT: {missing}")
+
+    df = layers.copy()
+    for col in PROFILE_COLUMNS + (["gamma"] if "gamma" in df.columns else []):
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df = df.dropna(subset=["z_m"]).sort_values("z_m").reset_index(drop=True)
+    if df.empty or (df["z_m"] <= 0).any():
+        raise ValueError("Las profundidades z_m deben ser positivas.")
+
+    z = df["z_m"].to_numpy()
+    gamma = df["gamma"].to_numpy() if "gamma" in df.columns else None
+    sv, sv_eff = compute_stresses(z, water_table, gamma_dry, gamma_sat, gamma)
+
+    df["estres_v_total"] = sv
+    df["estres_v_ef"] = sv_eff
+    df["a_max"] = a_max
+    df["Mw"] = Mw
+    df = analyze_batch(df, model, scaler)
+
+    saturated = z > water_table
+    dz = layer_thickness(z)
+    eps_v = volumetric_strain(df["FS_trad"].to_numpy(), df["N1_60_cs"].to_numpy())
+    df["saturado"] = saturated
+    df["espesor_m"] = dz
+    df["eps_v_pct"] = np.where(saturated, 100.0 * eps_v, 0.0)
+
+    indices = liquefaction_indices(z, dz, df["FS_trad"].to_numpy(), df["proba_ia"].to_numpy(),
+                                   eps_v, saturated)
+    return df, indices
+
+
+def plot_profile_png(df, water_table):
+    """Gráficos de FS, probabilidad de IA y esfuerzos versus profundidad, como bytes PNG."""
+    import matplotlib.pyplot as plt
+
+    z = df["z_m"]
+    fig, axes = plt.subplots(1, 3, figsize=(12, 6), sharey=True)
+    try:
+        ax_fs, ax_p, ax_s = axes
+
+        ax_fs.plot(df["FS_trad"].clip(upper=3.0), z, "o-", color="tab:blue")
+        ax_fs.axvline(1.0, color="tab:red", ls="--", label="FS = 1.0")
+        ax_fs.axvline(1.3, color="tab:orange", ls=":", label="FS = 1.3")
+        ax_fs.set_xlabel("Factor de Seguridad (FS)")
+        ax_fs.set_ylabel("Profundidad z [m]")
+        ax_fs.legend(loc="lower right")
+
+        ax_p.plot(df["proba_ia"] * 100, z, "s-", color="tab:purple")
+        ax_p.axvline(50.0, color="tab:red", ls="--", label="p = 50 %")
+        ax_p.set_xlim(0, 100)
+        ax_p.set_xlabel("Probabilidad IA [%]")
+        ax_p.legend(loc="lower right")
+
+        ax_s.plot(df["estres_v_total"], z, "-", color="tab:brown", label="σv")
+        ax_s.plot(df["estres_v_ef"], z, "-", color="tab:green", label="σ'v")
+        ax_s.set_xlabel("Esfuerzo vertical [kPa]")
+        ax_s.legend(loc="lower left")
+
+        for ax in axes:
+            ax.axhline(water_table, color="tab:cyan", lw=1)
+            ax.grid(alpha=0.3)
+        ax_fs.invert_yaxis()
+
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", dpi=120)
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
@@ -0,0 +1,348 @@
+"""
+Mapa regional de licuefacción para un sismo de escenario.
+
+Cada celda de la grilla tiene sus parámetros del SPT (x_km, y_km, N1_60_cs,
+FC, D50, z_m, σ'v y σv en kPa). La a_max de cada celda sale de una relación de
+atenuación simple (Campbell, 1981) para la magnitud y el epicentro del
+escenario; luego se evalúan el modelo de IA y el FS tradicional.
+
+La grilla de entrada y los resultados se guardan como un directorio de
+columnas .npy. La grilla se divide en teselas que se procesan en un pool de
+procesos: cada proceso abre la entrada con mmap_mode y escribe su tramo de
+los .npy de salida (también mapeados), de modo que la grilla completa nunca
+se carga en memoria. El mapa se dibuja leyendo la salida por bloques y
+promediando las celdas en una imagen de resolución fija.
+
+Uso:
+    python regional_map.py --sintetica 700x700 --Mw 7.5 --epicentro 5 10 --salida mapa_regional
+    python regional_map.py --grilla grilla.csv --Mw 7.0 --epicentro 0 0 --png mapa.png
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from batch_analysis import FEATURE_ORDER_IA, KPA_TO_PSF, predict_proba_batch
+from compiled_forest import MODEL_VARIANTS
+from model_versions import active_version, load_version
+from profile_analysis import GAMMA_W
+from traditional_method import calculate_traditional_fs_batch
+
+# Columnas de cada celda en el directorio de la grilla (esfuerzos en kPa)
+GRID_COLUMNS = ["x_km", "y_km", "N1_60_cs", "FC", "D50", "z_m", "estres_v_ef", "estres_v_total"]
+
+# Columnas de resultados escritas por las teselas
+OUTPUT_COLUMNS = ["a_max", "proba_ia", "FS_trad"]
+
+DEFAULT_TILE_SIZE = 50_000
+DEFAULT_DEPTH_KM = 10.0
+A_MAX_BOUNDS = (0.005, 2.0)
+
+MAP_VARIABLES = {
+    "proba_ia": ("Probabilidad IA [%]", "RdYlGn_r", 0.0, 100.0, 100.0),
+    "FS_trad": ("FS tradicional (recortado a 3)", "RdYlGn", 0.0, 3.0, 1.0),
+    "a_max": ("a_max [g]", "viridis", None, None, 1.0),
+}
+
+
+def attenuation_a_max(Mw, distance_km):
+    """
+    Aceleración máxima media [g] según Campbell (1981):
+    ln(PGA) = -4.141 + 0.868 Mw - 1.09 ln(R + 0.0606 exp(0.7 Mw)).
+    """
+    ln_pga = -4.141 + 0.868 * Mw - 1.09 * np.log(distance_km + 0.0606 * np.exp(0.7 * Mw))
+    return np.clip(np.exp(ln_pga), *A_MAX_BOUNDS)
+
+
+# --- Grilla de entrada (directorio de columnas .npy) ---
+
+def _write_meta(path, meta):
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+
+def read_meta(path):
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def open_grid(path, mode="r"):
+    """Columnas de la grilla abiertas con mmap_mode (sin cargarlas en memoria)."""
+    return {col: np.load(os.path.join(path, f"{col}.npy"), mmap_mode=mode) for col in GRID_COLUMNS}
+
+
+def synthetic_grid(path, nx=700, ny=700, cell_km=0.05, water_table=1.5, seed=42):
+    """
+    Grilla regular de prueba (nx × ny celdas) con campos SPT suavemente
+    variables. Se escribe por filas de la grilla, sin armarla completa.
+    """
+    os.makedirs(path, exist_ok=True)
+    n = nx * ny
+    columns = {
+        col: np.lib.format.open_memmap(os.path.join(path, f"{col}.npy"), mode="w+", dtype=np.float64, shape=(n,))
+        for col in GRID_COLUMNS
+    }
+    rng = np.random.default_rng(seed)
+    x = np.arange(nx) * cell_km
+    for j in range(ny):
+        y = j * cell_km
+        sl = slice(j * nx, (j + 1) * nx)
+        # Campos suaves (rellenos blandos hacia un "cauce" diagonal) con ruido
+        channel = np.exp(-((x - y * 0.6 - 0.3 * nx * cell_km) / (0.15 * nx * cell_km)) ** 2)
+        z = 3.0 + 6.0 * (0.5 + 0.5 * np.sin(x / (0.3 * nx * cell_km) * np.pi)) + rng.normal(0, 0.3, nx)
+        z = np.clip(z, 1.0, 20.0)
+        sv = 19.0 * z
+        columns["x_km"][sl] = x
+        columns["y_km"][sl] = y
+        columns["N1_60_cs"][sl] = np.clip(28 - 20 * channel + rng.normal(0, 3, nx), 2, 50)
+        columns["FC"][sl] = np.clip(5 + 25 * channel + rng.normal(0, 4, nx), 0, 80)
+        columns["D50"][sl] = np.clip(0.35 - 0.2 * channel + rng.normal(0, 0.03, nx), 0.05, 2.0)
+        columns["z_m"][sl] = z
+        columns["estres_v_total"][sl] = sv
+        columns["estres_v_ef"][sl] = sv - GAMMA_W * np.maximum(z - water_table, 0.0)
+    for array in columns.values():
+        array.flush()
+    _write_meta(path, {"n_cells": n, "nx": nx, "ny": ny})
+    return path
+
+
+def grid_from_csv(csv_path, path, chunksize=200_000):
+    """Convierte un CSV de celdas (columnas GRID_COLUMNS) al directorio de la grilla, por bloques."""
+    os.makedirs(path, exist_ok=True)
+    parts = {col: open(os.path.join(path, f"{col}.bin"), "wb") for col in GRID_COLUMNS}
+    n = 0
+    try:
+        for chunk in pd.read_csv(csv_path, sep=None, engine="python", chunksize=chunksize):
+            chunk.columns = chunk.columns.astype(str).str.strip()
+            missing = [col for col in GRID_COLUMNS if col not in chunk.columns]
+            if missing:
+                raise ValueError(f"Faltan columnas en la grilla: {missing}")
+            for col in GRID_COLUMNS:
+                pd.to_numeric(chunk[col], errors="coerce").to_numpy(dtype=np.float64).tofile(parts[col])
+            n += len(chunk)
+    finally:
+        for f in parts.values():
+            f.close()
+    if n == 0:
+        raise ValueError("La grilla no tiene filas.")
+    # Los binarios crudos se envuelven como .npy sin volver a cargarlos completos
+    for col in GRID_COLUMNS:
+        raw = np.memmap(os.path.join(path, f"{col}.bin"), dtype=np.float64, mode="r", shape=(n,))
+        out = np.lib.format.open_memmap(os.path.join(path, f"{col}.npy"), mode="w+", dtype=np.float64, shape=(n,))
+        for start in range(0, n, chunksize):
+            out[start:start + chunksize] = raw[start:start + chunksize]
+        out.flush()
+        del raw, out
+        os.remove(os.path.join(path, f"{col}.bin"))
+    _write_meta(path, {"n_cells": n})
+    return path
+
+
+# --- Evaluación por teselas en paralelo ---
+
+# Estado por proceso del pool (se inicializa una vez por proceso)
+_worker = {}
+
+
+def _init_worker(grid_path, output_path, variant, version):
+    _worker["model"], _worker["scaler"] = load_version(variant, version)
+    _worker["grid"] = open_grid(grid_path)
+    _worker["output"] = {
+        col: np.load(os.path.join(output_path, f"{col}.npy"), mmap_mode="r+") for col in OUTPUT_COLUMNS
+    }
+
+
+def evaluate_tile(start, stop, Mw, epicenter, depth_km):
+    """Evalúa las celdas [start, stop) y escribe sus resultados en los .npy de salida."""
+    grid, output = _worker["grid"], _worker["output"]
+    cells = {col: np.asarray(grid[col][start:stop]) for col in GRID_COLUMNS}
+
+    epicentral = np.hypot(cells["x_km"] - epicenter[0], cells["y_km"] - epicenter[1])
+    a_max = attenuation_a_max(Mw, np.hypot(epicentral, depth_km))
+    cells["a_max"] = a_max
+    cells["Mw"] = np.full(stop - start, float(Mw))
+
+    X = np.column_stack([cells[key] for key in FEATURE_ORDER_IA])
+    X[:, FEATURE_ORDER_IA.index("estres_v_ef")] *= KPA_TO_PSF
+    valid = np.isfinite(X).all(axis=1)
+    proba = np.full(stop - start, np.nan)
+    if valid.any():
+        proba[valid] = predict_proba_batch(_worker["model"], _worker["scaler"], X[valid])
+    fs = calculate_traditional_fs_batch(cells)["FS_trad"]
+
+    output["a_max"][start:stop] = a_max
+    output["proba_ia"][start:stop] = proba
+    output["FS_trad"][start:stop] = fs
+    for array in output.values():
+        array.flush()
+    return {
+        "celdas": stop - start,
+        "fs_lt_1": int(np.sum(fs < 1.0)),
+        "p_ge_05": int(np.sum(proba >= 0.5)),
+        "validas": int(valid.sum()),
+    }
+
+
+def run_regional(grid_path, output_path, Mw, epicenter, depth_km=DEFAULT_DEPTH_KM, variant="completo",
+                 version=None, tile_size=DEFAULT_TILE_SIZE, n_workers=None, progress=None):
+    """
+    Ejecuta el escenario sobre toda la grilla por teselas en un pool de
+    procesos. `progress(hechas, total)` se llama al terminar cada tesela.
+    `version` es la versión del modelo (None = la activa al iniciar; todos los
+    procesos usan la misma aunque se publique otra durante la ejecución).
+    Devuelve el resumen del escenario (también guardado en meta.json de la salida).
+    """
+    version = version or active_version(variant)
+    meta = read_meta(grid_path)
+    n = meta["n_cells"]
+    if n == 0:
+        raise ValueError("La grilla no tiene celdas.")
+    os.makedirs(output_path, exist_ok=True)
+    for col in OUTPUT_COLUMNS:
+        np.lib.format.open_memmap(os.path.join(output_path, f"{col}.npy"), mode="w+", dtype=np.float64, shape=(n,))
+
+    tiles = [(start, min(start + tile_size, n)) for start in range(0, n, tile_size)]
+    n_workers = n_workers or os.cpu_count() or 1
+    start_time = time.perf_counter()
+    totals = {"celdas": 0, "fs_lt_1": 0, "p_ge_05": 0, "validas": 0}
+    # "spawn": los procesos no heredan los hilos del servidor de Streamlit
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=context, initializer=_init_worker,
+                             initargs=(grid_path, output_path, variant, version)) as pool:
+        futures = [pool.submit(evaluate_tile, a, b, Mw, tuple(epicenter), depth_km) for a, b in tiles]
+        for done, future in enumerate(as_completed(futures), start=1):
+            for key, value in future.result().items():
+                totals[key] += value
+            if progress is not None:
+                progress(done, len(tiles))
+
+    summary = {
+        "grilla": os.path.abspath(grid_path),
+        "Mw": float(Mw),
+        "epicentro_km": [float(epicenter[0]), float(epicenter[1])],
+        "profundidad_km": float(depth_km),
+        "modelo": variant,
+        "version": version,
+        "teselas": len(tiles),
+        "tiempo_s": time.perf_counter() - start_time,
+        **totals,
+    }
+    _write_meta(output_path, summary)
+    return summary
+
+
+# --- Vista de mapa ---
+
+def rasterize(grid_path, output_path, variable, resolution=400, chunk_size=DEFAULT_TILE_SIZE):
+    """
+    Promedio de `variable` en una imagen de `resolution` × `resolution` píxeles
+    como máximo, acumulado por bloques. Devuelve (imagen, extensión [x0, x1, y0, y1]).
+    """
+    grid = open_grid(grid_path)
+    values = np.load(os.path.join(output_path, f"{variable}.npy"), mmap_mode="r")
+    n = len(values)
+
+    x_min = y_min = np.inf
+    x_max = y_max = -np.inf
+    for start in range(0, n, chunk_size):
+        x = np.asarray(grid["x_km"][start:start + chunk_size])
+        y = np.asarray(grid["y_km"][start:start + chunk_size])
+        x_min, x_max = min(x_min, np.nanmin(x)), max(x_max, np.nanmax(x))
+        y_min, y_max = min(y_min, np.nanmin(y)), max(y_max, np.nanmax(y))
+    if not (np.isfinite(x_min) and np.isfinite(y_min)):
+        # Sin celdas con coordenadas: imagen vacía sobre una extensión nominal
+        return np.full((resolution, resolution), np.nan), [0.0, 1.0, 0.0, 1.0]
+    x_edges = np.linspace(x_min, x_max, resolution + 1)
+    y_edges = np.linspace(y_min, y_max, resolution + 1)
+
+    sums = np.zeros((resolution, resolution))
+    counts = np.zeros((resolution, resolution))
+    for start in range(0, n, chunk_size):
+        v = np.asarray(values[start:start + chunk_size])
+        ok = np.isfinite(v)
+        x = np.asarray(grid["x_km"][start:start + chunk_size])[ok]
+        y = np.asarray(grid["y_km"][start:start + chunk_size])[ok]
+        sums += np.histogram2d(y, x, bins=[y_edges, x_edges], weights=v[ok])[0]
+        counts += np.histogram2d(y, x, bins=[y_edges, x_edges])[0]
+    with np.errstate(invalid="ignore"):
+        image = sums / counts
+    return image, [x_min, x_max, y_min, y_max]
+
+
+def plot_regional_map_png(grid_path, output_path, variable="proba_ia", resolution=400):
+    """Mapa de `variable` desde la salida guardada, con el epicentro marcado, como PNG."""
+    import matplotlib.pyplot as plt
+
+    label, cmap, vmin, vmax, factor = MAP_VARIABLES[variable]
+    image, extent = rasterize(grid_path, output_path, variable, resolution)
+    summary = read_meta(output_path)
+
+    fig, ax = plt.subplots(figsize=(8, 7))
+    try:
+        shown = np.clip(image * factor, vmin, vmax) if vmin is not None else image * factor
+        mesh = ax.imshow(shown, origin="lower", extent=extent, cmap=cmap, vmin=vmin, vmax=vmax, aspect="equal")
+        fig.colorbar(mesh, ax=ax, label=label)
+        ax.plot(*summary["epicentro_km"], marker="*", color="black", markersize=16, linestyle="none",
+                label="Epicentro")
+        ax.set_xlim(extent[0], extent[1])
+        ax.set_ylim(extent[2], extent[3])
+        ax.set_xlabel("x [km]")
+        ax.set_ylabel("y [km]")
+        ax.set_title(f"Escenario Mw {summary['Mw']:.1f} - {summary['celdas']:,} celdas")
+        ax.legend(loc="upper right")
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", dpi=110)
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mapa regional de licuefacción para un sismo de escenario.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--grilla", help="Directorio de grilla (.npy) o CSV con las columnas de GRID_COLUMNS.")
+    source.add_argument("--sintetica", help="Grilla de prueba NXxNY, p. ej. 700x700.")
+    parser.add_argument("--Mw", type=float, required=True, help="Magnitud del escenario.")
+    parser.add_argument("--epicentro", type=float, nargs=2, default=(0.0, 0.0), metavar=("X_KM", "Y_KM"))
+    parser.add_argument("--profundidad", type=float, default=DEFAULT_DEPTH_KM, help="Profundidad focal [km].")
+    parser.add_argument("--modelo", choices=list(MODEL_VARIANTS), default="completo")
+    parser.add_argument("--salida", default="mapa_regional", help="Directorio de resultados.")
+    parser.add_argument("--tesela", type=int, default=DEFAULT_TILE_SIZE, help="Celdas por tesela.")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del pool (por defecto, uno por núcleo).")
+    parser.add_argument("--png", help="Ruta para guardar el mapa de probabilidad.")
+    args = parser.parse_args()
+
+    def report(done, total):
+        print(f"\r  Teselas: {done}/{total}", end="", flush=True)
+
+    grid_path = os.path.join(args.salida, "grilla")
+    try:
+        if args.sintetica:
+            nx, ny = (int(v) for v in args.sintetica.lower().split("x"))
+            synthetic_grid(grid_path, nx, ny)
+        elif os.path.isdir(args.grilla):
+            grid_path = args.grilla
+        else:
+            grid_from_csv(args.grilla, grid_path)
+        summary = run_regional(grid_path, args.salida, args.Mw, args.epicentro, args.profundidad, args.modelo,
+                               tile_size=args.tesela, n_workers=args.procesos, progress=report)
+    except ValueError as e:
+        raise SystemExit(f"Error en la grilla: {e}")
+    print(f"\n{summary['celdas']:,} celdas en {summary['tiempo_s']:.1f} s "
+          f"({summary['celdas'] / summary['tiempo_s']:,.0f} celdas/s)")
+    print(f"FS < 1: {summary['fs_lt_1'] / summary['celdas'] * 100:.1f} %   "
+          f"p >= 0.5: {summary['p_ge_05'] / summary['celdas'] * 100:.1f} %")
+    if args.png:
+        with open(args.png, "wb") as f:
+            f.write(plot_regional_map_png(grid_path, args.salida))
+        print(f"Mapa guardado en '{args.png}'")
+
+
+if __name__ == "__main__":
+    main()
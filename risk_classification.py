@@ -0,0 +1,40 @@
+def classify_risk(prob):
+    """
+    Clasifica la probabilidad de licuefacción (0.0 a 1.0) en etiquetas de riesgo
+    basadas en la escala provista.
+    """
+    # La probabilidad (prob) debe estar entre 0.0 y 1.0
+
+    if prob >= 0.80:
+        return "Riesgo Muy Alto" 
+    elif prob >= 0.50:
+        return "Riesgo Alto" 
+    elif prob >= 0.20:
+        return "Riesgo Moderado"
+    else: # Esto cubre el rango de 0.00 a 0.199... (0-20%)
+        return "Riesgo Bajo"
+
+def classify_fs(fs):
+    """Clasifica el Factor de Seguridad (FS) en etiquetas de riesgo."""
+    if fs is None:
+        return "Error"
+    if fs < 1.0:
+        return "Licuefactible"
+    elif fs < 1.3:
+        return "Licuefacción Marginal"
+    else:
+        return "No Licuefactible"
+
+def classify_confidence(agreement):
+    """
+    Clasifica el acuerdo de votos del bosque (fracción de árboles que votan
+    la misma clase que el promedio, 0.5 a 1.0) en etiquetas de confianza.
+    """
+    if agreement is None:
+        return "Error"
+    if agreement >= 0.80:
+        return "Confianza Alta"
+    elif agreement >= 0.65:
+        return "Confianza Media"
+    else:
+        return "Confianza Baja"
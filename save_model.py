@@ -1,18 +1,32 @@
-import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
 import joblib
+import argparse
+import os
+import shutil
+from compiled_forest import (
+    COMPILED_MODEL_DIR, MODEL_VARIANTS, CompiledForest, CompiledScaler, available_variants, export_forest,
+    export_scaler, max_abs_difference,
+)
+from case_dataset import load_cases
+from case_index import CaseIndex
+from global_explanations import CASE_COLUMNS, app_units, compute_global_shap, save_global_shap
+from forest_compaction import COMPACTION_REPORT_FILE, DEFAULT_TOLERANCE, compact_model
+from model_search import BASE_PARAMS, DEFAULT_AUC_TOLERANCE, DEFAULT_FOLDS, run_search, select_best
+from model_versions import activate_version, current_version, list_versions, verify_version
+from incremental_update import DEFAULT_NEW_TREES, update_model
 
 # --- CORRECCIÓN: Apuntar al archivo CSV y usar pd.read_csv ---
 DATA_FILE = "mmc2.csv"  # El nombre de tu archivo CSV
+SEARCH_REPORT_FILE = "busqueda_hiperparametros.csv"
 
 def load_and_prepare_data(path: str):
-    # --- CORRECCIÓN: Usar pd.read_csv ---
+    # Lectura desde el cache columnar tipado (se regenera si el CSV cambió)
     try:
-        df_raw = pd.read_csv(path, sep=';')
+        df_raw = load_cases(path)
     except FileNotFoundError:
         print(f"Error: No se encontró el archivo de datos en la ruta: {path}")
         print("Asegúrate de que 'mmc2.xlsx - CETIN_2018.csv' esté en el mismo directorio.")
@@ -20,8 +34,6 @@ def load_and_prepare_data(path: str):
     except Exception as e:
         print(f"Error al leer el archivo CSV: {e}")
         return None, None
-        
-    df_raw.columns = df_raw.columns.str.strip()
 
     column_mapping = {
         "(N1) 60": "N1_60_cs",
@@ -54,10 +66,7 @@ def load_and_prepare_data(path: str):
     # Eliminar filas donde falta alguna característica esencial
     df_clean = df[features + ["liquefaction"]].copy()
     
-    # Convertir a numérico, forzando errores a NaN
-    for col in features:
-        df_clean[col] = pd.to_numeric(df_clean[col], errors='coerce')
-    
+    # Las columnas ya vienen numéricas del cache (valores inválidos como NaN)
     # Contar filas antes y después de eliminar NaN
     rows_before = df_clean.shape[0]
     df_clean = df_clean.dropna()
@@ -74,7 +83,272 @@ def load_and_prepare_data(path: str):
     
     return X, y
 
+def export_compiled_model(model_path="modelo_rf.joblib", scaler_path="scaler.joblib",
+                          output_path=COMPILED_MODEL_DIR):
+    """Aplana el modelo y el scaler guardados en arrays .npy para la inferencia rápida de la app."""
+    model = joblib.load(model_path)
+    export_forest(model, output_path)
+    export_scaler(joblib.load(scaler_path), output_path)
+    print(f"Bosque compilado guardado en '{output_path}/' ({len(model.estimators_)} árboles).")
+
+def verify_compiled_model(model_path="modelo_rf.joblib", scaler_path="scaler.joblib",
+                          compiled_path=COMPILED_MODEL_DIR, tol=1e-12):
+    """
+    Prueba de equivalencia: compara el predictor compilado con `model.predict_proba`
+    sobre todos los casos de mmc2.csv. Devuelve True si coinciden dentro de `tol`.
+    """
+    X, y = load_and_prepare_data(DATA_FILE)
+    if X is None:
+        return False
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    compiled = CompiledForest.load(compiled_path)
+    compiled_scaler = CompiledScaler.load(compiled_path)
+
+    X_scaled = scaler.transform(X)
+    scaler_diff = float(np.max(np.abs(compiled_scaler.transform(X) - X_scaled)))
+    print(f"Diferencia máxima en el escalado: {scaler_diff:.3e}.")
+    diff = max_abs_difference(compiled, model, X_scaled)
+    same_labels = np.array_equal(compiled.predict(X_scaled), model.predict(X_scaled))
+    print(f"Diferencia máxima en probabilidades: {diff:.3e}. Etiquetas idénticas: {same_labels}.")
+    return diff <= tol and scaler_diff <= tol and same_labels
+
+def compact_existing_model(tolerance=DEFAULT_TOLERANCE, model_path="modelo_rf.joblib",
+                           scaler_path="scaler.joblib"):
+    """Genera el modelo compacto a partir del modelo guardado e imprime el reporte."""
+    X, y = load_and_prepare_data(DATA_FILE)
+    if X is None:
+        return
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    report = compact_model(model, scaler, scaler.transform(X), tolerance=tolerance)
+
+    full, compact, agree = report["completo"], report["compacto"], report["concordancia"]
+    print(f"\nÁrboles: {full['arboles']} -> {compact['arboles']} (tolerancia {tolerance:.3f} en probabilidad)")
+    print(f"{'':<26}{'Completo':>12}{'Compacto':>12}")
+    for key, label in [("tamano_mb", "Tamaño [MB]"), ("nodos", "Nodos"),
+                       ("predict_1_ms", "Predicción 1 fila [ms]"), ("predict_lote_ms", f"Predicción {len(X)} filas [ms]"),
+                       ("shap_explainer_ms", "Explicador SHAP [ms]"), ("shap_1_ms", "SHAP 1 fila [ms]")]:
+        print(f"{label:<26}{full[key]:>12.3f}{compact[key]:>12.3f}")
+    print(f"Casos de selección ({report['casos_seleccion']}):")
+    print(f"  Diferencia de probabilidad: máx. {agree['max_abs_diff']:.4f}, media {agree['mean_abs_diff']:.4f}")
+    print(f"  Concordancia de clase: {agree['label_agreement'] * 100:.1f}%  "
+          f"de etiqueta de riesgo: {agree['risk_agreement'] * 100:.1f}%")
+    validation = report["validacion"]
+    for key, label in [("retenidos", f"Casos retenidos ({validation['casos_retenidos']})"),
+                       ("perturbados", f"Retenidos perturbados (±{validation['perturbacion_relativa'] * 100:.0f} %)")]:
+        check = validation[key]
+        print(f"{label}: máx. {check['max_abs_diff']:.4f}, clase {check['label_agreement'] * 100:.1f}% "
+              f"-> {'cumple' if check['cumple_tolerancia'] else 'NO cumple'} la tolerancia")
+    print(f"Reporte guardado en '{COMPACTION_REPORT_FILE}'")
+    export_global_explanations(["compacto"])
+
+def case_columns(path, index):
+    """Columnas descriptivas (CASE_COLUMNS) de los casos de `path` usados en el entrenamiento."""
+    cases = load_cases(path).loc[index, CASE_COLUMNS]
+    cases["Case Number"] = cases["Case Number"].astype("Int64")
+    return cases
+
+def update_existing_model(new_cases_path, n_new_trees=DEFAULT_NEW_TREES):
+    """
+    Agrega los casos de `new_cases_path` (formato de mmc2.csv) a la versión
+    activa, hace crecer el bosque con warm_start y publica una versión nueva.
+    """
+    X_base, y_base = load_and_prepare_data(DATA_FILE)
+    X_new, y_new = load_and_prepare_data(new_cases_path)
+    if X_base is None or X_new is None:
+        print("Falló la carga de datos. Abortando.")
+        return
+    parent = current_version()
+    print(f"Actualizando desde la versión {parent or 'base'} con {n_new_trees} árboles nuevos...")
+    try:
+        manifest = update_model(
+            X_base.to_numpy(), y_base.to_numpy(), case_columns(DATA_FILE, X_base.index),
+            X_new.to_numpy(), y_new.to_numpy(), case_columns(new_cases_path, X_new.index),
+            parent_version=parent, n_new_trees=n_new_trees,
+        )
+    except ValueError as e:
+        print(f"{e} Abortando.")
+        return
+    before, after = manifest["acierto_nuevos"]
+    print(f"Casos nuevos aceptados: {manifest['casos_nuevos']} (rechazados: {manifest['rechazados']})")
+    print(f"Árboles: {manifest['arboles'][0]} -> {manifest['arboles'][1]}. "
+          f"Casos: {manifest['casos_base']} base + {manifest['casos_agregados']} agregados")
+    print(f"Acierto en los casos nuevos: {before * 100:.1f}% -> {after * 100:.1f}%. "
+          f"Cambio máximo de probabilidad en el conjunto: {manifest['max_cambio_probabilidad']:.3f}")
+    print(f"Versión '{manifest['version']}' publicada y activa (hash {manifest['hash_contenido'][:16]}...)")
+    print("El modelo compacto se deriva del bosque base y no se ofrece mientras esta versión esté activa.")
+
+def print_versions():
+    """Lista las versiones publicadas y verifica sus hashes."""
+    active = current_version()
+    print(f"{'':2}{'versión':<18}{'creada':<21}{'árboles':>8}{'casos agregados':>17}  hashes")
+    for manifest in list_versions():
+        version = manifest["version"]
+        mark = "*" if version == active else ""
+        status = "ok" if verify_version(version) else "NO COINCIDEN"
+        print(f"{mark:<2}{version:<18}{manifest['creada']:<21}{manifest['arboles'][1]:>8}"
+              f"{manifest['casos_agregados']:>17}  {status}")
+    if active is None:
+        print("* Activos: artefactos base (modelo_rf.joblib)")
+
+def export_global_explanations(variants=None, scaler_path="scaler.joblib"):
+    """
+    Precalcula los valores SHAP de todos los casos de mmc2.csv para cada
+    variante del modelo y los guarda junto a sus arrays compilados. Construye
+    además el índice de vecinos de los casos (uno por scaler, en el directorio
+    del modelo completo).
+    """
+    X, y = load_and_prepare_data(DATA_FILE)
+    if X is None:
+        return
+    cases = case_columns(DATA_FILE, X.index)
+    scaler = joblib.load(scaler_path)
+    X_scaled = scaler.transform(X)
+    for variant in variants or available_variants():
+        model_path, compiled_path = MODEL_VARIANTS[variant]
+        arrays = compute_global_shap(joblib.load(model_path), X.to_numpy(), X_scaled, y.to_numpy(), cases)
+        path = save_global_shap(arrays, compiled_path)
+        print(f"SHAP global del modelo {variant} ({len(X)} casos) guardado en '{path}'")
+
+    path = CaseIndex.build(X_scaled, cases, app_units(X.to_numpy())).save(COMPILED_MODEL_DIR)
+    print(f"Índice de casos históricos ({len(X)} casos) guardado en '{path}'")
+
+def save_artifacts(model, scaler):
+    """
+    Guarda el modelo y el scaler (joblib) y sus versiones compiladas para la app.
+    El modelo recién entrenado reemplaza a los artefactos derivados del anterior:
+    si había una versión incremental activa se vuelve a los artefactos base, y
+    el modelo compacto (subconjunto del bosque anterior) se elimina.
+    """
+    print("\nGuardando modelo en 'modelo_rf.joblib'")
+    joblib.dump(model, "modelo_rf.joblib")
+
+    print("Guardando scaler en 'scaler.joblib'")
+    joblib.dump(scaler, "scaler.joblib")
+
+    print(f"Compilando bosque y scaler en '{COMPILED_MODEL_DIR}/'")
+    export_forest(model, COMPILED_MODEL_DIR)
+    export_scaler(scaler, COMPILED_MODEL_DIR)
+
+    previous = current_version()
+    if previous is not None:
+        activate_version(None)
+        print(f"Versión incremental '{previous}' desactivada: se usan los artefactos recién entrenados "
+              "(sigue disponible con --activar)")
+    discard_compact_model()
+
+def discard_compact_model():
+    """Elimina el modelo compacto, que quedó derivado de un bosque que ya no está activo."""
+    model_path, compiled_path = MODEL_VARIANTS["compacto"]
+    if not (os.path.exists(model_path) or os.path.isdir(compiled_path)):
+        return
+    for path in (model_path, COMPACTION_REPORT_FILE):
+        if os.path.exists(path):
+            os.remove(path)
+    shutil.rmtree(compiled_path, ignore_errors=True)
+    print("Modelo compacto eliminado (derivado del bosque anterior); regenérelo con --compactar")
+
+def search_and_train(n_folds=DEFAULT_FOLDS, n_workers=None, auc_tolerance=DEFAULT_AUC_TOLERANCE):
+    """
+    Búsqueda de hiperparámetros con k-fold estratificado en paralelo; el
+    candidato elegido se reentrena con todos los datos y se guarda.
+    """
+    X, y = load_and_prepare_data(DATA_FILE)
+    if X is None or y is None:
+        print("Falló la carga de datos. Abortando.")
+        return
+
+    features = ["N1_60_cs", "FC", "D50", "a_max", "estres_v_ef", "Mw"]
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X[features])
+
+    print(f"Búsqueda con validación cruzada de {n_folds} pliegues sobre {X.shape[0]} muestras...")
+    results = run_search(X_scaled, y.to_numpy(), n_folds=n_folds, n_workers=n_workers, auc_tolerance=auc_tolerance)
+    results = results.sort_values("auc", ascending=False)
+    results.to_csv(SEARCH_REPORT_FILE, index=False)
+
+    columns = ["n_estimators", "max_depth", "min_samples_leaf", "accuracy", "auc", "nodos", "tamano_mb",
+               "latencia_1_ms", "latencia_lote_ms"]
+    print("\nResultados (ordenados por AUC):")
+    print(results[columns].to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    print(f"Reporte guardado en '{SEARCH_REPORT_FILE}'")
+
+    best = select_best(results, auc_tolerance)
+    params = {key: int(best[key]) for key in ["n_estimators", "max_depth", "min_samples_leaf"]}
+    print(f"\nElegido (AUC dentro de {auc_tolerance:.3f} de la mejor, menor latencia): {params}")
+    print(f"Accuracy CV: {best['accuracy'] * 100:.2f}%  AUC CV: {best['auc']:.3f}  "
+          f"Latencia: {best['latencia_1_ms']:.2f} ms (1 fila), {best['latencia_lote_ms']:.2f} ms ({X.shape[0]} filas)  Tamaño: {best['tamano_mb']:.2f} MB")
+
+    model = RandomForestClassifier(**BASE_PARAMS, **params, n_jobs=-1)
+    model.fit(X_scaled, y)
+    save_artifacts(model, scaler)
+    export_global_explanations(["completo"])
+    print("\n¡Búsqueda, entrenamiento y guardado completados!")
+
 def main():
+    parser = argparse.ArgumentParser(description="Entrena y guarda el modelo de GeoLiquefAI.")
+    parser.add_argument("--exportar", action="store_true",
+                        help="Solo compila el modelo existente a arrays de NumPy (sin reentrenar).")
+    parser.add_argument("--verificar", action="store_true",
+                        help="Verifica que el modelo compilado coincide con scikit-learn en mmc2.csv.")
+    parser.add_argument("--compactar", action="store_true",
+                        help="Genera un modelo compacto (subconjunto de árboles) a partir del modelo guardado.")
+    parser.add_argument("--tolerancia-compactacion", type=float, default=DEFAULT_TOLERANCE,
+                        help="Diferencia máxima de probabilidad del modelo compacto frente al completo.")
+    parser.add_argument("--explicaciones", action="store_true",
+                        help="Precalcula los valores SHAP de todos los casos y el índice de casos cercanos.")
+    parser.add_argument("--buscar", action="store_true",
+                        help="Busca hiperparámetros con validación cruzada en paralelo y guarda el mejor modelo.")
+    parser.add_argument("--folds", type=int, default=DEFAULT_FOLDS, help="Pliegues de la validación cruzada.")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del pool (por defecto, uno por núcleo).")
+    parser.add_argument("--tolerancia-auc", type=float, default=DEFAULT_AUC_TOLERANCE,
+                        help="Pérdida de AUC aceptada para elegir un modelo más rápido.")
+    parser.add_argument("--actualizar", metavar="CSV",
+                        help="Agrega casos nuevos (formato de mmc2.csv) y publica una versión con árboles nuevos.")
+    parser.add_argument("--arboles-nuevos", type=int, default=DEFAULT_NEW_TREES,
+                        help="Árboles que se agregan en la actualización incremental.")
+    parser.add_argument("--versiones", action="store_true", help="Lista las versiones publicadas del modelo.")
+    parser.add_argument("--activar", metavar="VERSION",
+                        help="Activa una versión publicada ('base' para volver a los artefactos base).")
+    args = parser.parse_args()
+
+    if args.actualizar:
+        update_existing_model(args.actualizar, args.arboles_nuevos)
+        return
+
+    if args.versiones:
+        print_versions()
+        return
+
+    if args.activar:
+        try:
+            activate_version(None if args.activar == "base" else args.activar)
+        except ValueError as e:
+            print(e)
+            return
+        print(f"Versión activa: {args.activar}")
+        return
+
+    if args.buscar:
+        search_and_train(args.folds, args.procesos, args.tolerancia_auc)
+        return
+
+    if args.compactar:
+        compact_existing_model(args.tolerancia_compactacion)
+        return
+
+    if args.explicaciones:
+        export_global_explanations()
+        return
+
+    if args.exportar or args.verificar:
+        if args.exportar:
+            export_compiled_model()
+        if args.verificar and not verify_compiled_model():
+            raise SystemExit("Error: el modelo compilado no coincide con el original.")
+        return
+
     X, y = load_and_prepare_data(DATA_FILE)
     if X is None or y is None:
         print("Falló la carga de datos. Abortando.")
@@ -113,11 +387,8 @@ def main():
     print("Matriz de confusión:")
     print(confusion_matrix(y_test, y_pred))
 
-    print("\nGuardando modelo en 'modelo_rf.joblib'")
-    joblib.dump(model, "modelo_rf.joblib")
-
-    print("Guardando scaler en 'scaler.joblib'")
-    joblib.dump(scaler, "scaler.joblib")
+    save_artifacts(model, scaler)
+    export_global_explanations(["completo"])
 
     print("\n¡Entrenamiento y guardado completados!")
 
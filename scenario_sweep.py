@@ -0,0 +1,106 @@
+import io
+
+import numpy as np
+from batch_analysis import FEATURE_ORDER_IA, KPA_TO_PSF, predict_proba_batch
+from traditional_method import calculate_traditional_fs_batch
+
+# Ejes del barrido de escenarios (el resto de parámetros del suelo queda fijo)
+SWEEP_AXES = ["a_max", "Mw", "N1_60_cs"]
+
+AXIS_LABELS = {
+    "a_max": "Aceleración Máxima a_max [g]",
+    "Mw": "Magnitud Mw",
+    "N1_60_cs": "Golpes (N1)60cs",
+}
+
+
+def evaluate_scenario_grid(soil, a_max_values, Mw_values, n1_values, model, scaler):
+    """
+    Evalúa ambos métodos sobre la grilla completa a_max × Mw × N1_60_cs.
+
+    `soil` contiene los parámetros fijos (FC, D50, estres_v_ef y estres_v_total
+    en kPa, z_m). La grilla se arma de una vez con meshgrid, el FS se calcula
+    vectorizado y el modelo se evalúa por bloques grandes. Devuelve un dict con
+    los valores de cada eje y los cubos `FS` y `proba` de forma
+    (n_a_max, n_Mw, n_N1).
+    """
+    axes = {
+        "a_max": np.asarray(a_max_values, dtype=float),
+        "Mw": np.asarray(Mw_values, dtype=float),
+        "N1_60_cs": np.asarray(n1_values, dtype=float),
+    }
+    mesh = np.meshgrid(axes["a_max"], axes["Mw"], axes["N1_60_cs"], indexing="ij")
+    shape = mesh[0].shape
+    points = {key: values.ravel() for key, values in zip(SWEEP_AXES, mesh)}
+    for key in ["FC", "D50", "estres_v_ef", "estres_v_total", "z_m"]:
+        points[key] = np.full(points["a_max"].size, float(soil[key]))
+
+    trad = calculate_traditional_fs_batch(points)
+
+    X = np.column_stack([points[key] for key in FEATURE_ORDER_IA])
+    X[:, FEATURE_ORDER_IA.index("estres_v_ef")] *= KPA_TO_PSF
+    proba = predict_proba_batch(model, scaler, X)
+
+    return {
+        **axes,
+        "FS": trad["FS_trad"].reshape(shape),
+        "proba": proba.reshape(shape),
+    }
+
+
+def grid_slice(grid, x_key, y_key, fixed_value):
+    """
+    Corte 2D de la grilla para los ejes `x_key` e `y_key`, con el tercer eje en
+    el valor más cercano a `fixed_value`. No recalcula nada.
+
+    Devuelve (x, y, FS, proba, valor_fijo) con FS y proba de forma (n_y, n_x).
+    """
+    (fixed_key,) = [key for key in SWEEP_AXES if key not in (x_key, y_key)]
+    fixed_idx = int(np.argmin(np.abs(grid[fixed_key] - fixed_value)))
+
+    order = [SWEEP_AXES.index(y_key), SWEEP_AXES.index(x_key)]
+    fixed_axis = SWEEP_AXES.index(fixed_key)
+    fs = np.take(grid["FS"], fixed_idx, axis=fixed_axis)
+    proba = np.take(grid["proba"], fixed_idx, axis=fixed_axis)
+    # Tras quitar el eje fijo, reordenar a (y, x)
+    remaining = [i for i in range(3) if i != fixed_axis]
+    perm = [remaining.index(i) for i in order]
+    return (
+        grid[x_key],
+        grid[y_key],
+        np.transpose(fs, perm),
+        np.transpose(proba, perm),
+        float(grid[fixed_key][fixed_idx]),
+    )
+
+
+def plot_sweep_png(x, y, fs, proba, x_key, y_key, title=""):
+    """Mapas de calor del FS y de la probabilidad con las fronteras FS = 1 y p = 0.5, como PNG."""
+    import matplotlib.pyplot as plt
+
+    fig, (ax_fs, ax_p) = plt.subplots(1, 2, figsize=(13, 5))
+    try:
+        mesh_fs = ax_fs.pcolormesh(x, y, np.clip(fs, 0, 3), cmap="RdYlGn", vmin=0, vmax=3, shading="auto")
+        fig.colorbar(mesh_fs, ax=ax_fs, label="FS (recortado a 3)")
+        if np.nanmin(fs) < 1.0 < np.nanmax(fs):
+            ax_fs.contour(x, y, fs, levels=[1.0], colors="black", linewidths=2)
+        ax_fs.set_title("Método Tradicional: FS (línea: FS = 1)")
+
+        mesh_p = ax_p.pcolormesh(x, y, proba * 100, cmap="RdYlGn_r", vmin=0, vmax=100, shading="auto")
+        fig.colorbar(mesh_p, ax=ax_p, label="Probabilidad IA [%]")
+        if np.nanmin(proba) < 0.5 < np.nanmax(proba):
+            ax_p.contour(x, y, proba, levels=[0.5], colors="black", linewidths=2)
+        ax_p.set_title("IA: Probabilidad (línea: p = 0.5)")
+
+        for ax in (ax_fs, ax_p):
+            ax.set_xlabel(AXIS_LABELS[x_key])
+            ax.set_ylabel(AXIS_LABELS[y_key])
+        if title:
+            fig.suptitle(title)
+
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", dpi=110)
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
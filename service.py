@@ -0,0 +1,329 @@
+"""
+Servicio local de inferencia de GeoLiquefAI (sin Streamlit).
+
+Carga el modelo y el scaler una sola vez y expone por HTTP (localhost):
+
+    GET  /health               Estado del servicio y del micro-batcher
+    POST /predict              Un punto -> probabilidad de IA y su dispersión entre árboles
+    POST /predict/batch        {"rows": [...]} -> probabilidades de IA
+    POST /traditional          Un punto -> FS tradicional
+    POST /traditional/batch    {"rows": [...]} -> FS tradicional
+    POST /analyze              Un punto -> ambos métodos
+    POST /analyze/batch        {"rows": [...]} -> ambos métodos
+
+Las entradas usan las mismas claves y unidades que el formulario de la app
+(esfuerzos en kPa). Las solicitudes concurrentes al bosque se agrupan en
+micro-lotes, de modo que el bosque se evalúa una vez por lote.
+
+Cuando se publica una versión nueva del modelo (`python save_model.py
+--actualizar ...`) el servicio la carga sin reiniciarse: cada micro-lote usa la
+versión activa en ese momento, y las respuestas de /predict indican cuál.
+
+Uso:
+    python service.py serve --port 8765
+    python service.py score lote.csv -o resultados.csv
+    python service.py loadtest --requests 2000 --concurrency 32
+"""
+import argparse
+import json
+import math
+import queue
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from batch_analysis import FEATURE_ORDER_IA, KPA_TO_PSF, analyze_batch, predict_distribution_batch, read_batch_file
+from model_versions import ArtifactWatcher
+from instrumentation import metrics
+from risk_classification import classify_confidence, classify_fs, classify_risk
+from traditional_method import TRADITIONAL_COLUMNS, calculate_traditional_fs_batch
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class MicroBatcher:
+    """
+    Agrupa filas de solicitudes concurrentes y evalúa el bosque una vez por lote.
+
+    Un hilo de trabajo espera la primera solicitud, junta las que lleguen en los
+    siguientes `max_wait_ms` (hasta `max_rows` filas), predice todas juntas y
+    reparte los resultados a cada solicitud mediante un Future. El modelo se
+    toma de `artifacts` (ArtifactWatcher) al inicio de cada lote, de modo que un
+    lote se evalúa completo con una sola versión.
+    """
+
+    def __init__(self, artifacts, max_rows=1024, max_wait_ms=2.0):
+        self.artifacts = artifacts
+        self.max_rows = max_rows
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self.batches = 0
+        self.rows = 0
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, X):
+        """
+        Encola filas sin escalar (n x 6, σ'v en psf); devuelve un Future con
+        la versión del modelo y las probabilidades y su dispersión entre árboles
+        (dict de arrays).
+        """
+        future = Future()
+        self._queue.put((np.asarray(X, dtype=float), future))
+        return future
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            n_rows = len(pending[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while n_rows < self.max_rows:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                n_rows += len(item[0])
+
+            try:
+                version, model, scaler = self.artifacts.get()
+                with metrics.stage("predict_proba", rows=n_rows, requests=len(pending)):
+                    distribution = predict_distribution_batch(model, scaler, np.vstack([X for X, _ in pending]))
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.rows += n_rows
+            start = 0
+            for X, future in pending:
+                future.set_result((version, {key: values[start:start + len(X)] for key, values in distribution.items()}))
+                start += len(X)
+
+
+class InferenceService:
+    """Lógica de los endpoints, independiente del transporte HTTP."""
+
+    def __init__(self, artifacts, max_rows=1024, max_wait_ms=2.0):
+        self.artifacts = artifacts
+        self.batcher = MicroBatcher(artifacts, max_rows=max_rows, max_wait_ms=max_wait_ms)
+        self.started = time.time()
+
+    @staticmethod
+    def _columns(rows, keys):
+        missing = sorted({key for row in rows for key in keys if key not in row})
+        if missing:
+            raise ValueError(f"Faltan campos: {missing}")
+        return {key: np.array([row[key] for row in rows], dtype=float) for key in keys}
+
+    def predict(self, rows):
+        cols = self._columns(rows, FEATURE_ORDER_IA)
+        X = np.column_stack([cols[key] for key in FEATURE_ORDER_IA])
+        X[:, FEATURE_ORDER_IA.index("estres_v_ef")] *= KPA_TO_PSF
+        valid = np.isfinite(X).all(axis=1)
+        distribution = {}
+        version = self.artifacts.get()[0]
+        if valid.any():
+            version, batch = self.batcher.submit(X[valid]).result()
+            for key, values in batch.items():
+                distribution[key] = np.full(len(rows), np.nan)
+                distribution[key][valid] = values
+        results = []
+        for i in range(len(rows)):
+            item = {key: _json_float(values[i]) for key, values in distribution.items()} or {"proba_ia": None}
+            p, agreement = item["proba_ia"], item.get("acuerdo_votos")
+            item["risk_label_ia"] = "Error" if p is None else classify_risk(p)
+            item["confianza_ia"] = classify_confidence(agreement)
+            item["version_modelo"] = version
+            results.append(item)
+        return results
+
+    def traditional(self, rows):
+        with metrics.stage("traditional_fs", rows=len(rows)):
+            trad = calculate_traditional_fs_batch(self._columns(rows, TRADITIONAL_COLUMNS))
+        keys = ["FS_trad", "CSR", "CRR_adj", "rd", "MSF", "K_sigma"]
+        results = []
+        for i in range(len(rows)):
+            item = {key: _json_float(trad[key][i]) for key in keys}
+            item["risk_label_trad"] = classify_fs(item["FS_trad"])
+            results.append(item)
+        return results
+
+    def analyze(self, rows):
+        return [{**ia, **trad} for ia, trad in zip(self.predict(rows), self.traditional(rows))]
+
+    def health(self):
+        stages, _ = metrics.snapshot()
+        return {
+            "status": "ok",
+            "uptime_s": round(time.time() - self.started, 1),
+            "version_modelo": self.artifacts.get()[0],
+            "recargas_modelo": self.artifacts.reloads,
+            "batches": self.batcher.batches,
+            "rows": self.batcher.rows,
+            "stages": stages,
+        }
+
+
+def _json_float(value):
+    """Convierte a float de Python; NaN e infinitos se devuelven como None (null en JSON)."""
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def parse_rows(payload, is_batch):
+    """Filas de una solicitud: un objeto JSON o, en /batch, {"rows": [objetos]}."""
+    if not isinstance(payload, dict):
+        raise ValueError("El cuerpo debe ser un objeto JSON.")
+    if not is_batch:
+        return [payload]
+    rows = payload.get("rows", [])
+    if not isinstance(rows, list):
+        raise ValueError("'rows' debe ser una lista de objetos.")
+    invalid = [i for i, row in enumerate(rows) if not isinstance(row, dict)]
+    if invalid:
+        raise ValueError(f"Las filas deben ser objetos JSON (filas inválidas: {invalid[:10]}).")
+    return rows
+
+
+def make_handler(service):
+    routes = {
+        "/predict": service.predict,
+        "/traditional": service.traditional,
+        "/analyze": service.analyze,
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, service.health())
+            else:
+                self._send(404, {"error": f"Ruta no encontrada: {self.path}"})
+
+        def do_POST(self):
+            path = self.path.rstrip("/")
+            is_batch = path.endswith("/batch")
+            handler = routes.get(path[: -len("/batch")] if is_batch else path)
+            if handler is None:
+                self._send(404, {"error": f"Ruta no encontrada: {self.path}"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                rows = parse_rows(payload, is_batch)
+                results = handler(rows)
+                self._send(200, {"results": results} if is_batch else results[0])
+            except (ValueError, TypeError, json.JSONDecodeError) as e:
+                self._send(400, {"error": str(e)})
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            # Sin log por solicitud: a tasas altas domina el tiempo de respuesta
+            pass
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Cola de conexiones amplia para ráfagas de clientes concurrentes
+    request_queue_size = 512
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, max_rows=1024, max_wait_ms=2.0):
+    service = InferenceService(ArtifactWatcher(), max_rows=max_rows, max_wait_ms=max_wait_ms)
+    server = _Server((host, port), make_handler(service))
+    print(f"GeoLiquefAI escuchando en http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def score_file(input_path, output_path):
+    """Procesa un CSV/Excel completo sin servidor (mismas columnas que el análisis por lotes)."""
+    _, model, scaler = ArtifactWatcher().get()
+    df = analyze_batch(read_batch_file(input_path, input_path), model, scaler, uncertainty=True)
+    df.to_csv(output_path, index=False)
+    print(f"{len(df)} filas procesadas -> {output_path}")
+
+
+def load_test(url, n_requests=2000, concurrency=32):
+    """Cliente local de carga: envía `n_requests` solicitudes /predict con `concurrency` hilos."""
+    payload = json.dumps({
+        "N1_60_cs": 15.0, "FC": 10.0, "D50": 0.25, "a_max": 0.4, "Mw": 7.5, "estres_v_ef": 100.0,
+    }).encode("utf-8")
+
+    def one_request(_):
+        start = time.perf_counter()
+        request = urllib.request.Request(
+            f"{url}/predict", data=payload, headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request) as response:
+            response.read()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = np.array(list(pool.map(one_request, range(n_requests))))
+    elapsed = time.perf_counter() - start
+
+    with urllib.request.urlopen(f"{url}/health") as response:
+        health = json.loads(response.read())
+    print(f"{n_requests} solicitudes en {elapsed:.2f} s ({n_requests / elapsed:.0f} req/s)")
+    print(f"Latencia p50 = {np.percentile(latencies, 50) * 1000:.1f} ms, "
+          f"p95 = {np.percentile(latencies, 95) * 1000:.1f} ms")
+    print(f"Lotes del bosque: {health['batches']} ({health['rows']} filas en total)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio local de inferencia de GeoLiquefAI.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_serve = sub.add_parser("serve", help="Inicia el servidor HTTP.")
+    p_serve.add_argument("--host", default=DEFAULT_HOST)
+    p_serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p_serve.add_argument("--max-batch", type=int, default=1024, help="Máximo de filas por micro-lote.")
+    p_serve.add_argument("--max-wait-ms", type=float, default=2.0, help="Espera máxima para completar un micro-lote.")
+
+    p_score = sub.add_parser("score", help="Procesa un archivo CSV/Excel sin servidor.")
+    p_score.add_argument("input")
+    p_score.add_argument("-o", "--output", default="resultados_geoliquefai.csv")
+
+    p_load = sub.add_parser("loadtest", help="Prueba de carga contra un servidor local.")
+    p_load.add_argument("--url", default=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}")
+    p_load.add_argument("--requests", type=int, default=2000)
+    p_load.add_argument("--concurrency", type=int, default=32)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args.host, args.port, args.max_batch, args.max_wait_ms)
+    elif args.command == "score":
+        score_file(args.input, args.output)
+    else:
+        load_test(args.url, args.requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
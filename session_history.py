@@ -0,0 +1,105 @@
+import shutil
+import tempfile
+import time
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+# Análisis individuales que se conservan por sesión; al superar el límite se
+# descarta el más antiguo, de modo que la memoria por usuario queda acotada
+HISTORY_MAX_SIZE = 20
+
+
+def compact_result(input_dict, proba_ia, risk_label_ia, fs_trad, risk_label_trad,
+                   trad_results, thresholds, x_scaled=None, explanation=None, model_variant="completo",
+                   uncertainty=None, model_version=None):
+    """
+    Resultado de un análisis individual en forma compacta: solo números y
+    textos de Python (sin figuras ni arrays grandes). La explicación SHAP se
+    guarda como sus valores y el valor base; el gráfico se dibuja al mostrarlo.
+    `uncertainty` es la dispersión de la probabilidad entre árboles y
+    `model_version` la versión publicada del modelo (None = artefactos base).
+    """
+    shap_values, shap_base = (None, None) if explanation is None else explanation
+    return {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "modelo": model_variant,
+        "version": model_version,
+        "input_dict": dict(input_dict),
+        "proba_ia": proba_ia,
+        "risk_label_ia": risk_label_ia,
+        "fs_trad": _to_float(fs_trad),
+        "risk_label_trad": risk_label_trad,
+        "trad_results": {key: _to_float(value) for key, value in trad_results.items()},
+        "thresholds": {key: _to_float(value) for key, value in thresholds.items()},
+        "x_scaled": None if x_scaled is None else tuple(np.ravel(x_scaled).tolist()),
+        "shap_values": None if shap_values is None else tuple(np.ravel(shap_values).tolist()),
+        "shap_base": None if shap_base is None else float(shap_base),
+        "uncertainty": None if uncertainty is None else {key: _to_float(value) for key, value in uncertainty.items()},
+    }
+
+
+def _to_float(value):
+    return None if value is None else float(value)
+
+
+class SessionWorkDir:
+    """
+    Directorio temporal de trabajo de una sesión (mapas regionales, reportes).
+    `renew()` borra el de la ejecución anterior antes de crear uno nuevo, de
+    modo que cada sesión ocupa como mucho un directorio; también se borra
+    cuando el objeto se libera (al descartarse el estado de la sesión) o al
+    terminar el proceso.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.path = None
+        self._finalizer = None
+
+    def renew(self):
+        self.cleanup()
+        self.path = tempfile.mkdtemp(prefix=self.prefix)
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.path, ignore_errors=True)
+        return self.path
+
+    def cleanup(self):
+        if self._finalizer is not None:
+            self._finalizer()
+        self.path = None
+        self._finalizer = None
+
+
+class AnalysisHistory:
+    """Historial acotado de análisis de una sesión (el más reciente al final)."""
+
+    def __init__(self, maxsize=HISTORY_MAX_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._next_id = 1
+
+    def add(self, result):
+        """Agrega un resultado, descarta los más antiguos si se supera el límite y devuelve su id."""
+        analysis_id = self._next_id
+        self._next_id += 1
+        self._items[analysis_id] = result
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+        return analysis_id
+
+    def get(self, analysis_id):
+        return self._items.get(analysis_id)
+
+    def latest(self):
+        return next(reversed(self._items.values()), None)
+
+    def ids(self):
+        """Ids de los análisis guardados, del más reciente al más antiguo."""
+        return list(reversed(self._items))
+
+    def clear(self):
+        self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
@@ -0,0 +1,90 @@
+"""
+Reporte de arranque en frío y memoria por proceso.
+
+Cada escenario se ejecuta en un proceso nuevo (arranque en frío real) que mide
+el tiempo hasta tener el modelo listo para predecir y su memoria residente:
+
+    legado     pickle de scikit-learn + shap, matplotlib y pandas al inicio
+    compilado  arrays .npy con mmap_mode, sin scikit-learn, shap ni matplotlib
+
+La memoria se desglosa en RssAnon (privada del proceso) y RssFile (páginas de
+archivos mapeados, compartidas entre procesos del mismo equipo). Solo Linux
+informa el desglose; en otros sistemas se reporta el máximo residente.
+
+Uso:
+    python startup_report.py [--json reporte_arranque.json]
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+SCENARIOS = {
+    "legado": """
+import joblib, numpy as np
+import pandas, shap, matplotlib.pyplot
+model = joblib.load("modelo_rf.joblib")
+scaler = joblib.load("scaler.joblib")
+""",
+    "compilado": """
+import numpy as np
+from compiled_forest import load_predictor, load_scaler
+import batch_analysis
+model = load_predictor()
+scaler = load_scaler()
+""",
+}
+
+# Se antepone/añade a cada escenario: cronómetro, una predicción y la medición de memoria
+PROLOGUE = "import time\n_t0 = time.perf_counter()\n"
+EPILOGUE = """
+_x = np.array([[15.0, 10.0, 0.25, 0.4, 2088.54, 7.5]])
+model.predict_proba(scaler.transform(_x))
+_elapsed = time.perf_counter() - _t0
+
+import json, resource, sys
+_mem = {}
+try:
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "RssAnon", "RssFile"):
+                _mem[key] = int(value.split()[0]) / 1024
+except OSError:
+    _maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    _mem["VmRSS"] = _maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+print(json.dumps({"tiempo_s": _elapsed, **_mem, "modulos": len(sys.modules)}))
+"""
+
+
+def run_scenario(code):
+    """Ejecuta un escenario en un intérprete nuevo y devuelve sus métricas."""
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", PROLOGUE + code + EPILOGUE],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reporte de arranque en frío y memoria por proceso.")
+    parser.add_argument("--json", help="Ruta para guardar los resultados en JSON.")
+    args = parser.parse_args()
+
+    report = {name: run_scenario(code) for name, code in SCENARIOS.items()}
+
+    print(f"{'Escenario':<12}{'Tiempo [s]':>12}{'RSS [MB]':>11}{'Privada [MB]':>14}{'Compartible [MB]':>18}{'Módulos':>9}")
+    for name, m in report.items():
+        print(
+            f"{name:<12}{m['tiempo_s']:>12.2f}{m.get('VmRSS', float('nan')):>11.1f}"
+            f"{m.get('RssAnon', float('nan')):>14.1f}{m.get('RssFile', float('nan')):>18.1f}{m['modulos']:>9}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Resultados guardados en '{args.json}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Configuración común de las pruebas: los módulos de la app están en la raíz del
+repositorio y leen sus artefactos (mmc2.csv, modelo_rf.joblib, ...) con rutas
+relativas, así que las pruebas corren desde allí.
+"""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PSF_TO_KPA = 1.0 / 20.8854
+FT_TO_M = 0.3048
+
+# Columna de mmc2.csv y factor a unidades de la app para cada entrada
+CASE_COLUMNS = {
+    "N1_60_cs": ("(N1) 60", 1.0),
+    "FC": ("FC %", 1.0),
+    "D50": ("D50 (mm)", 1.0),
+    "a_max": ("a max (g)", 1.0),
+    "estres_v_ef": ("sv' (psf)", PSF_TO_KPA),
+    "estres_v_total": ("sv (psf)", PSF_TO_KPA),
+    "z_m": ("Critical Depth (ft)", FT_TO_M),
+    "Mw": ("Magnitude for KMw", 1.0),
+}
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _repo_root():
+    previous = os.getcwd()
+    os.chdir(ROOT)
+    yield
+    os.chdir(previous)
+
+
+@pytest.fixture(scope="session")
+def cases():
+    """Casos completos de mmc2.csv en unidades de la app (kPa, m)."""
+    df_raw = pd.read_csv(os.path.join(ROOT, "mmc2.csv"), sep=";")
+    df_raw.columns = df_raw.columns.str.strip()
+    cases = pd.DataFrame(
+        {key: pd.to_numeric(df_raw[column], errors="coerce") * factor for key, (column, factor) in CASE_COLUMNS.items()}
+    )
+    return cases.dropna().reset_index(drop=True)
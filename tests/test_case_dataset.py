@@ -0,0 +1,54 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+import case_dataset
+from case_dataset import CSV_SEPARATOR, DATA_FILE, NUMERIC_COLUMNS, SCHEMA_COLUMNS, TEXT_COLUMNS, ingest, load_cases
+
+
+@pytest.fixture(scope="module")
+def expected():
+    """mmc2.csv leído completo con pandas, con los mismos tipos que el cache."""
+    df = pd.read_csv(DATA_FILE, sep=CSV_SEPARATOR, dtype=str)
+    df.columns = df.columns.str.strip()
+    out = pd.DataFrame({col: df[col].fillna("") for col in TEXT_COLUMNS})
+    for col in NUMERIC_COLUMNS:
+        out[col] = pd.to_numeric(df[col], errors="coerce").astype(np.float64)
+    return out[SCHEMA_COLUMNS]
+
+
+@pytest.mark.parametrize("chunksize", [1, 37, 100_000])
+def test_streamed_cache_matches_full_read(tmp_path, expected, chunksize):
+    cache_path = ingest(DATA_FILE, str(tmp_path / "casos.npz"), chunksize=chunksize)
+    cases = load_cases(DATA_FILE, cache_path)
+    pd.testing.assert_frame_equal(cases, expected)
+    assert list(tmp_path.iterdir()) == [tmp_path / "casos.npz"]
+
+
+def test_cache_is_regenerated_when_source_changes(tmp_path):
+    source = tmp_path / "casos.csv"
+    lines = open(DATA_FILE, encoding="latin-1").read().splitlines(keepends=True)
+    source.write_text("".join(lines[:11]), encoding="latin-1")
+    assert len(load_cases(str(source))) == 10
+    source.write_text("".join(lines[:6]), encoding="latin-1")
+    assert len(load_cases(str(source))) == 5
+
+
+def test_touched_source_refreshes_fingerprint_without_rehashing(tmp_path, monkeypatch):
+    source = tmp_path / "casos.csv"
+    shutil.copyfile(DATA_FILE, source)
+    cache_path = ingest(str(source))
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    expected_cases = load_cases(str(source))
+    with np.load(cache_path) as data:
+        assert data["__fingerprint__"][2] == str(stat.st_mtime_ns + 10**9)
+
+    def no_rehash(*args, **kwargs):
+        raise AssertionError("se volvió a calcular el SHA-256")
+
+    monkeypatch.setattr(case_dataset, "source_fingerprint", no_rehash)
+    pd.testing.assert_frame_equal(load_cases(str(source)), expected_cases)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["casos.csv", "casos_cache.npz"]
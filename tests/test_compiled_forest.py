@@ -0,0 +1,121 @@
+import time
+
+import joblib
+import numpy as np
+import pytest
+from compiled_forest import (
+    LARGE_BATCH_ROWS, CompiledForest, CompiledScaler, export_forest, export_scaler, load_predictor, predict_distribution,
+)
+from sklearn.ensemble import RandomForestClassifier
+
+
+@pytest.fixture(scope="module")
+def training_data():
+    from save_model import DATA_FILE, load_and_prepare_data
+
+    X, y = load_and_prepare_data(DATA_FILE)
+    return X, y.to_numpy()
+
+
+@pytest.fixture(scope="module")
+def saved_artifacts(training_data):
+    X, _ = training_data
+    model = joblib.load("modelo_rf.joblib")
+    scaler = joblib.load("scaler.joblib")
+    return model, scaler, scaler.transform(X)
+
+
+def compile_forest(model, tmp_path):
+    path = str(tmp_path / "bosque")
+    export_forest(model, path)
+    return CompiledForest.load(path)
+
+
+def test_compiled_scaler_matches_sklearn(training_data, saved_artifacts, tmp_path):
+    X, _ = training_data
+    _, scaler, X_scaled = saved_artifacts
+    export_scaler(scaler, str(tmp_path))
+    compiled = CompiledScaler.load(str(tmp_path))
+    np.testing.assert_allclose(compiled.transform(X.to_numpy()), X_scaled, rtol=0, atol=1e-12)
+
+
+def test_saved_model_compiles_to_same_probabilities(saved_artifacts, tmp_path):
+    model, _, X_scaled = saved_artifacts
+    compiled = compile_forest(model, tmp_path)
+    np.testing.assert_allclose(compiled.predict_proba(X_scaled), model.predict_proba(X_scaled), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(compiled.predict(X_scaled), model.predict(X_scaled))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 10_000])
+def test_compiled_forest_matches_sklearn_for_any_chunking(training_data, tmp_path, chunk_size):
+    X, y = training_data
+    model = RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0).fit(X.to_numpy(), y)
+    compiled = compile_forest(model, tmp_path)
+    # Filas fuera del rango de entrenamiento recorren las ramas extremas de cada árbol
+    X_test = np.vstack([X.to_numpy(), X.to_numpy()[:20] * 3.0, np.zeros((1, X.shape[1]))])
+    np.testing.assert_allclose(
+        compiled.predict_proba(X_test, chunk_size=chunk_size), model.predict_proba(X_test), rtol=0, atol=1e-12
+    )
+
+
+def test_distribution_matches_per_tree_probabilities(saved_artifacts, tmp_path):
+    model, _, X_scaled = saved_artifacts
+    compiled = compile_forest(model, tmp_path)
+    P = np.stack([tree.predict_proba(X_scaled)[:, 1] for tree in model.estimators_])
+    expected = {
+        "proba_ia": model.predict_proba(X_scaled)[:, 1],
+        "proba_ia_std": P.std(axis=0),
+        "proba_ia_p05": np.quantile(P, 0.05, axis=0),
+        "proba_ia_p50": np.quantile(P, 0.5, axis=0),
+        "proba_ia_p95": np.quantile(P, 0.95, axis=0),
+        "acuerdo_votos": ((P >= 0.5) == (P.mean(axis=0) >= 0.5)).mean(axis=0),
+    }
+    for source in (compiled, model):
+        distribution = predict_distribution(source, X_scaled)
+        assert set(distribution) == set(expected)
+        for key, values in expected.items():
+            np.testing.assert_allclose(distribution[key], values, rtol=0, atol=1e-12, err_msg=key)
+
+
+def test_distribution_is_independent_of_chunking(saved_artifacts, tmp_path):
+    model, _, X_scaled = saved_artifacts
+    compiled = compile_forest(model, tmp_path)
+    whole = compiled.predict_distribution(X_scaled)
+    chunked = compiled.predict_distribution(X_scaled, chunk_size=13)
+    for key in whole:
+        np.testing.assert_array_equal(whole[key], chunked[key])
+    assert ((whole["acuerdo_votos"] >= 0.5) & (whole["acuerdo_votos"] <= 1.0)).all()
+
+
+def _best_time(func, repeats=3):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def test_large_batches_go_to_sklearn(saved_artifacts, tmp_path):
+    model, _, X_scaled = saved_artifacts
+    export_forest(model, str(tmp_path))
+    predictor = load_predictor(str(tmp_path), "modelo_rf.joblib")
+    X_large = np.tile(X_scaled, (LARGE_BATCH_ROWS // len(X_scaled) + 1, 1))
+    np.testing.assert_allclose(predictor.predict_proba(X_large), model.predict_proba(X_large), rtol=0, atol=1e-12)
+    assert predictor._sklearn_model is not None
+    expected = predictor.predict_distribution(X_scaled)
+    tiled = predictor.predict_distribution(X_large)
+    for key, values in expected.items():
+        np.testing.assert_allclose(tiled[key][:len(X_scaled)], values, rtol=0, atol=1e-12, err_msg=key)
+
+
+@pytest.mark.parametrize("n_rows", [1, 10_000])
+def test_predictor_is_not_slower_than_sklearn(saved_artifacts, tmp_path, n_rows):
+    model, _, _ = saved_artifacts
+    export_forest(model, str(tmp_path))
+    predictor = load_predictor(str(tmp_path), "modelo_rf.joblib")
+    X = np.random.default_rng(0).normal(size=(n_rows, model.n_features_in_))
+    predictor.predict_proba(X)
+    # Margen para el ruido de medición: por debajo de LARGE_BATCH_ROWS el recorrido
+    # compilado es mucho más rápido y por encima se usa el mismo scikit-learn
+    assert _best_time(lambda: predictor.predict_proba(X)) <= 1.25 * _best_time(lambda: model.predict_proba(X))
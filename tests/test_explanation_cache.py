@@ -0,0 +1,57 @@
+import numpy as np
+from explanation_cache import ExplanationCache, LRUCache, make_key
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "a" pasa a ser el más reciente
+    cache.put("c", 3)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_lru_put_existing_key_refreshes_it():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("a", 10)
+    cache.put("c", 3)
+    assert cache.get("a") == 10
+    assert cache.get("b") is None
+
+
+def test_make_key_rounds_and_unifies_signed_zero():
+    assert make_key([0.0, 1.0]) == make_key([-0.0, 1.0 + 1e-7])
+    assert make_key([0.0, 1.0]) != make_key([0.0, 1.001])
+
+
+class _CountingExplainer:
+    """Explicador mínimo con la interfaz de shap.TreeExplainer (valores por clase)."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, x):
+        self.calls += 1
+
+        class Explanation:
+            values = np.stack([-x, x], axis=-1)
+            base_values = np.array([[0.4, 0.6]])
+        return Explanation
+
+
+def test_explanations_are_cached_per_input_and_evicted():
+    explainer = _CountingExplainer()
+    cache = ExplanationCache(explainer, ["a", "b"], maxsize=2)
+    values, base = cache.explain([1.0, 2.0])
+    np.testing.assert_array_equal(values, [1.0, 2.0])
+    assert base == 0.6
+    cache.explain([1.0, 2.0])
+    assert explainer.calls == 1
+    cache.explain([3.0, 4.0])
+    cache.explain([5.0, 6.0])
+    cache.explain([1.0, 2.0])  # desalojada por las dos anteriores
+    assert explainer.calls == 4
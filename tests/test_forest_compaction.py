@@ -0,0 +1,47 @@
+import joblib
+import numpy as np
+import pytest
+from compiled_forest import CompiledForest
+from forest_compaction import check_subset, perturb_cases, select_trees, split_cases, tree_probabilities
+
+
+@pytest.fixture(scope="module")
+def forest_and_cases():
+    from save_model import DATA_FILE, load_and_prepare_data
+
+    X, _ = load_and_prepare_data(DATA_FILE)
+    model = joblib.load("modelo_rf.joblib")
+    scaler = joblib.load("scaler.joblib")
+    return CompiledForest.from_model(model), scaler, scaler.transform(X)
+
+
+def test_split_is_disjoint_and_fixed():
+    selection, validation = split_cases(200)
+    assert len(selection) == 140 and len(validation) == 60
+    assert not set(selection) & set(validation)
+    np.testing.assert_array_equal(split_cases(200)[1], validation)
+
+
+def test_perturbation_is_relative_in_original_units(forest_and_cases):
+    _, scaler, X_scaled = forest_and_cases
+    unchanged = perturb_cases(X_scaled[:5], scaler, relative=0.0, copies=2)
+    np.testing.assert_allclose(unchanged[::2], X_scaled[:5], atol=1e-12)
+    perturbed = perturb_cases(X_scaled[:5], scaler, copies=200) * scaler.scale_ + scaler.mean_
+    original = np.repeat(X_scaled[:5] * scaler.scale_ + scaler.mean_, 200, axis=0)
+    ratio = perturbed[original != 0] / original[original != 0]
+    assert abs(ratio.std() - 0.10) < 0.01
+
+
+def test_full_forest_always_passes_and_subset_is_checked_out_of_sample(forest_and_cases):
+    compiled, scaler, X_scaled = forest_and_cases
+    selection, validation = split_cases(len(X_scaled))
+    every_tree = np.arange(compiled.n_estimators)
+    assert check_subset(compiled, every_tree, X_scaled[validation])["cumple_tolerancia"]
+
+    P = tree_probabilities(compiled, X_scaled[selection])
+    indices = select_trees(P, P.mean(axis=0))
+    in_sample = check_subset(compiled, indices, X_scaled[selection])
+    assert in_sample["cumple_tolerancia"]
+    held_out = check_subset(compiled, indices, X_scaled[validation])
+    assert set(held_out) == set(in_sample)
+    assert held_out["cumple_tolerancia"] == (held_out["max_abs_diff"] <= 0.05 and held_out["label_agreement"] == 1.0)
@@ -0,0 +1,53 @@
+import joblib
+import numpy as np
+import pytest
+from batch_analysis import BATCH_COLUMNS
+from inverse_solver import THRESHOLD_VARIABLES, _evaluate, solve_thresholds
+from traditional_method import calculate_traditional_fs_batch
+
+
+@pytest.fixture(scope="module")
+def model_and_scaler():
+    return joblib.load("modelo_rf.joblib"), joblib.load("scaler.joblib")
+
+
+@pytest.fixture(scope="module")
+def thresholds(cases, model_and_scaler):
+    sample = cases[BATCH_COLUMNS].head(40).reset_index(drop=True)
+    return sample, solve_thresholds(sample, *model_and_scaler)
+
+
+@pytest.mark.parametrize("variable", list(THRESHOLD_VARIABLES))
+def test_fs_threshold_gives_fs_equal_to_one(thresholds, variable):
+    sample, out = thresholds
+    solved = out[f"{variable}_crit_FS"].notna()
+    assert solved.any()
+    data = sample[solved].copy()
+    data[variable] = out.loc[solved, f"{variable}_crit_FS"]
+    np.testing.assert_allclose(calculate_traditional_fs_batch(data)["FS_trad"], 1.0, atol=1e-6)
+
+
+@pytest.mark.parametrize("variable", list(THRESHOLD_VARIABLES))
+def test_ia_threshold_brackets_p_equal_to_half(thresholds, model_and_scaler, variable):
+    # El bosque es escalonado: justo a cada lado del umbral la probabilidad cruza 0.5
+    sample, out = thresholds
+    solved = out[f"{variable}_crit_IA"].notna()
+    assert solved.any()
+    low, high = THRESHOLD_VARIABLES[variable]
+    step = (high - low) * 2.0 ** -25
+    M = sample.loc[solved, BATCH_COLUMNS].to_numpy(dtype=float)
+    j = BATCH_COLUMNS.index(variable)
+    below, above = M.copy(), M.copy()
+    below[:, j] = out.loc[solved, f"{variable}_crit_IA"] - step
+    above[:, j] = out.loc[solved, f"{variable}_crit_IA"] + step
+    p_below = _evaluate("IA", below, *model_and_scaler) - 0.5
+    p_above = _evaluate("IA", above, *model_and_scaler) - 0.5
+    assert (np.sign(p_below) * np.sign(p_above) <= 0).all()
+
+
+def test_unbracketed_rows_are_nan(cases, model_and_scaler):
+    # Suelo muy denso con sismo débil: el FS no llega a 1 en todo el intervalo de a_max
+    row = cases[BATCH_COLUMNS].head(1).copy()
+    row["N1_60_cs"], row["Mw"] = 45.0, 5.0
+    out = solve_thresholds(row, *model_and_scaler, variables=["a_max"])
+    assert np.isnan(out["a_max_crit_FS"].iloc[0])
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+from model_versions import (
+    MANIFEST_FILE, activate_version, current_version, list_versions, publish_version, staging_dir, verify_version,
+)
+
+
+def _publish(root, content):
+    staging = staging_dir(root)
+    os.makedirs(os.path.join(staging, "modelo_rf_arrays"))
+    with open(os.path.join(staging, "modelo_rf_arrays", "datos.bin"), "wb") as f:
+        f.write(content)
+    return publish_version(staging, {"arboles": [400, 450], "casos_agregados": 1}, root)
+
+
+def test_publish_activates_and_records_hashes(tmp_path):
+    root = str(tmp_path)
+    assert current_version(root) is None
+    first = _publish(root, b"uno")
+    second = _publish(root, b"dos")
+    assert first["version"].startswith("v001-") and second["version"].startswith("v002-")
+    assert current_version(root) == second["version"]
+    assert [m["version"] for m in list_versions(root)] == [first["version"], second["version"]]
+    assert set(second["archivos"]) == {"modelo_rf_arrays/datos.bin"}
+    assert verify_version(second["version"], root)
+    assert not [name for name in os.listdir(root) if name.startswith(".tmp-")]
+
+
+def test_verify_detects_modified_files(tmp_path):
+    root = str(tmp_path)
+    version = _publish(root, b"uno")["version"]
+    with open(os.path.join(root, version, "modelo_rf_arrays", "datos.bin"), "ab") as f:
+        f.write(b"!")
+    assert not verify_version(version, root)
+
+
+def test_activate_rolls_back_and_rejects_unknown_versions(tmp_path):
+    root = str(tmp_path)
+    first = _publish(root, b"uno")["version"]
+    _publish(root, b"dos")
+    activate_version(first, root)
+    assert current_version(root) == first
+    activate_version(None, root)
+    assert current_version(root) is None
+    with pytest.raises(ValueError):
+        activate_version("v999-inexistente", root)
+    assert os.path.exists(os.path.join(root, first, MANIFEST_FILE))
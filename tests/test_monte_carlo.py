@@ -0,0 +1,22 @@
+import joblib
+import numpy as np
+from compiled_forest import export_forest, load_predictor
+from monte_carlo import FACTOR_KEYS, UNCERTAINTY_COLUMNS, load_case_histories, run_monte_carlo
+
+
+def test_predictor_and_sklearn_give_the_same_distribution(tmp_path):
+    case = load_case_histories().iloc[0]
+    mean = {key: float(case[key]) for key in list(UNCERTAINTY_COLUMNS) + ["Mw"]}
+    std = {key: float(case[f"s_{key}"]) for key in list(UNCERTAINTY_COLUMNS) + FACTOR_KEYS}
+    model = joblib.load("modelo_rf.joblib")
+    scaler = joblib.load("scaler.joblib")
+    export_forest(model, str(tmp_path))
+    predictor = load_predictor(str(tmp_path), "modelo_rf.joblib")
+
+    # Bloques por encima y por debajo de LARGE_BATCH_ROWS
+    for chunk_size in (3_000, 300):
+        fast = run_monte_carlo(mean, std, predictor, scaler, n_samples=6_000, chunk_size=chunk_size)
+        reference = run_monte_carlo(mean, std, model, scaler, n_samples=6_000, chunk_size=chunk_size)
+        assert fast["n_samples_ia"] == fast["n_samples"] == 6_000
+        np.testing.assert_array_equal(fast["proba_hist"], reference["proba_hist"])
+        assert fast["P_IA_ge_05"] == reference["P_IA_ge_05"]
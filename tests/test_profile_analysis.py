@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+from profile_analysis import layer_thickness, liquefaction_indices
+
+
+def test_lpi_matches_hand_computed_two_layer_profile():
+    # Tramos [0, 2] y [2, 22] m; el segundo se recorta a [2, 20] (18 m, punto medio 11 m)
+    # LPI    = (1 - 0.5) * (10 - 0.5 * 1) * 2 + (1 - 0.8) * (10 - 0.5 * 11) * 18 = 9.5 + 16.2
+    # LPI_IA = 1.0 * 9.5 * 2 + 0.5 * 4.5 * 18 = 19.0 + 40.5
+    z = np.array([2.0, 22.0])
+    indices = liquefaction_indices(z, layer_thickness(z), fs=[0.5, 0.8], proba=[1.0, 0.5],
+                                   eps_v=[0.0, 0.0], saturated=[True, True])
+    assert indices["LPI"] == pytest.approx(25.7)
+    assert indices["LPI_IA"] == pytest.approx(59.5)
+
+
+def test_layers_below_lpi_depth_do_not_contribute():
+    z = np.array([21.0, 25.0])
+    dz = np.array([0.5, 4.0])
+    indices = liquefaction_indices(z, dz, fs=[0.1, 0.1], proba=[1.0, 1.0],
+                                   eps_v=[0.0, 0.0], saturated=[True, True])
+    assert indices["LPI"] == 0.0 and indices["LPI_IA"] == 0.0
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from regional_map import GRID_COLUMNS, grid_from_csv, rasterize, run_regional
+
+
+def test_header_only_csv_is_rejected(tmp_path):
+    source = tmp_path / "grilla.csv"
+    source.write_text(",".join(GRID_COLUMNS) + "\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="no tiene filas"):
+        grid_from_csv(str(source), str(tmp_path / "grilla"))
+
+
+def test_empty_grid_directory_is_rejected(tmp_path):
+    grid_path = tmp_path / "grilla"
+    grid_path.mkdir()
+    (grid_path / "meta.json").write_text('{"n_cells": 0}', encoding="utf-8")
+    with pytest.raises(ValueError, match="no tiene celdas"):
+        run_regional(str(grid_path), str(tmp_path / "salida"), 7.5, (0.0, 0.0))
+
+
+def test_rasterize_empty_grid_gives_blank_image(tmp_path):
+    grid_path, output_path = tmp_path / "grilla", tmp_path / "salida"
+    grid_path.mkdir()
+    output_path.mkdir()
+    for col in GRID_COLUMNS:
+        np.save(grid_path / f"{col}.npy", np.empty(0))
+    np.save(output_path / "proba_ia.npy", np.empty(0))
+    image, extent = rasterize(str(grid_path), str(output_path), "proba_ia", resolution=8)
+    assert image.shape == (8, 8) and np.isnan(image).all()
+    assert extent == [0.0, 1.0, 0.0, 1.0]
@@ -0,0 +1,41 @@
+import os
+
+import numpy as np
+from session_history import AnalysisHistory, SessionWorkDir, compact_result
+
+
+def _result(i):
+    return compact_result({"N1_60_cs": i}, 0.5, "Riesgo Moderado", 1.0, "No Licuefactible", {}, {},
+                          x_scaled=np.zeros((1, 6)), explanation=(np.ones(6), 0.4))
+
+
+def test_history_evicts_oldest_beyond_maxsize():
+    history = AnalysisHistory(maxsize=3)
+    ids = [history.add(_result(i)) for i in range(5)]
+    assert len(history) == 3
+    assert history.ids() == ids[:1:-1]
+    assert history.get(ids[0]) is None and history.get(ids[1]) is None
+    assert history.latest()["input_dict"] == {"N1_60_cs": 4}
+
+
+def test_compact_result_holds_only_python_values():
+    result = _result(1)
+    assert isinstance(result["x_scaled"], tuple) and isinstance(result["shap_values"], tuple)
+    assert all(isinstance(v, float) for v in result["shap_values"])
+    assert result["shap_base"] == 0.4
+
+
+def test_session_work_dir_keeps_a_single_directory():
+    work_dir = SessionWorkDir("prueba_geoliquefai_")
+    first = work_dir.renew()
+    second = work_dir.renew()
+    assert not os.path.exists(first) and os.path.isdir(second)
+    work_dir.cleanup()
+    assert not os.path.exists(second)
+
+
+def test_session_work_dir_is_removed_when_released():
+    work_dir = SessionWorkDir("prueba_geoliquefai_")
+    path = work_dir.renew()
+    del work_dir
+    assert not os.path.exists(path)
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from traditional_method import (
+    METHOD_COLUMNS, TRADITIONAL_COLUMNS, TRIGGERING_METHODS, calculate_traditional_fs, calculate_traditional_fs_batch,
+    evaluate_methods, method_columns,
+)
+
+OUTPUT_KEYS = ["FS_trad", "CSR", "CRR_adj", "rd", "MSF", "K_sigma"]
+
+
+def test_batch_matches_scalar_on_mmc2(cases):
+    batch = calculate_traditional_fs_batch(cases)
+    assert batch["valido"].all()
+    for i, row in enumerate(cases[TRADITIONAL_COLUMNS].to_dict(orient="records")):
+        scalar = calculate_traditional_fs(row)
+        for key in OUTPUT_KEYS:
+            assert batch[key][i] == pytest.approx(scalar[key], rel=1e-12), (i, key)
+
+
+def test_batch_marks_invalid_rows_without_aborting(cases):
+    data = cases[TRADITIONAL_COLUMNS].head(4).copy()
+    data.loc[data.index[1], "estres_v_ef"] = 0.0
+    data.loc[data.index[2], "a_max"] = np.nan
+    batch = calculate_traditional_fs_batch(data)
+    assert batch["valido"].tolist() == [True, False, False, True]
+    assert np.isnan(batch["FS_trad"][1:3]).all()
+    assert np.isfinite(batch["FS_trad"][[0, 3]]).all()
+
+
+def test_batch_accepts_scalars_and_arrays():
+    row = {"z_m": 5.0, "a_max": 0.3, "estres_v_total": 95.0, "estres_v_ef": 80.0, "Mw": 7.0, "N1_60_cs": 12.0}
+    batch = calculate_traditional_fs_batch({**row, "a_max": np.array([0.2, 0.3])})
+    assert batch["FS_trad"][1] == pytest.approx(calculate_traditional_fs(row)["FS_trad"], rel=1e-12)
+    assert batch["FS_trad"][0] > batch["FS_trad"][1]
+
+
+def test_simplified_method_matches_scalar(cases):
+    evaluated = evaluate_methods(cases, ["simplificado"])["simplificado"]
+    rows = cases[TRADITIONAL_COLUMNS].to_dict(orient="records")
+    expected = [calculate_traditional_fs(row)["FS_trad"] for row in rows]
+    np.testing.assert_allclose(evaluated["FS"], expected, rtol=1e-12)
+
+
+def test_single_pass_matches_methods_evaluated_alone(cases):
+    together = evaluate_methods(cases[METHOD_COLUMNS])
+    assert set(together) == set(TRIGGERING_METHODS)
+    for name in TRIGGERING_METHODS:
+        alone = evaluate_methods(cases[METHOD_COLUMNS], [name])[name]
+        for key, values in alone.items():
+            np.testing.assert_array_equal(together[name][key], values, err_msg=f"{name}.{key}")
+    columns = method_columns(together)
+    assert "P_L_cetin_2018" in columns and "FS_youd_2001" in columns
+
+
+def test_idriss_boulanger_k_sigma_does_not_grow_with_density(cases):
+    # C_sigma limita (N1)60cs a 37: sin el límite tiene un polo en ~54.9 y K_sigma crece
+    data = cases[METHOD_COLUMNS].head(1).copy()
+    data = data.loc[data.index.repeat(6)].reset_index(drop=True)
+    data["N1_60_cs"] = [20.0, 35.0, 45.0, 54.9, 60.0, 80.0]
+    data["estres_v_ef"] = 300.0
+    data["estres_v_total"] = 350.0
+    K_sigma = evaluate_methods(data, ["idriss_boulanger_2014"])["idriss_boulanger_2014"]["K_sigma"]
+    assert np.isfinite(K_sigma).all()
+    assert (np.diff(K_sigma) <= 1e-12).all()
+    assert (K_sigma <= 1.1).all()
+
+
+def test_fc_methods_require_fc(cases):
+    with pytest.raises(ValueError):
+        evaluate_methods(cases[TRADITIONAL_COLUMNS], ["youd_2001"])
@@ -1,72 +1,291 @@
-import numpy as np
-
-def calculate_traditional_fs(input_data: dict):
-    """
-    Calcula el Factor de Seguridad (FS) usando el método tradicional
-    simplificado (Seed & Idriss), basado en las fórmulas de tu notebook.
-    """
-    
-    try:
-        # Extraer variables del diccionario de entrada
-        z = input_data.get("z_m")           # Profundidad (m)
-        a_max = input_data.get("a_max")     # Aceleración máxima (g)
-        sv = input_data.get("estres_v_total") # Esfuerzo total (kPa)
-        sv_eff = input_data.get("estres_v_ef") # Esfuerzo efectivo (kPa)
-        Mw = input_data.get("Mw")           # Magnitud
-        N1_60_cs = input_data.get("N1_60_cs") # SPT corregido
-
-        g = 9.81 # Aceleración de la gravedad
-        Pa = 101.3  # Presión atmosférica en kPa
-
-        # 1. Cálculo del Esfuerzo Cíclico (CSR)
-        # Factor de reducción de esfuerzo (rd) - (Liao y Whitman, 1986)
-        if z <= 9.15:
-            rd = 1.0 - 0.00765 * z
-        else:
-            rd = 1.174 - 0.0267 * z
-            
-        CSR = 0.65 * (a_max) * (sv / sv_eff) * rd # a_max ya está en g
-
-        # 2. Factor de Escala de Magnitud (MSF) - (Idriss & Boulanger 2014)
-        MSF = 6.9 * np.exp(-Mw / 4) - 0.058
-        if MSF < 0.69: MSF = 0.69 # Límite inferior
-        
-        # 3. Factor de Corrección por Sobrecarga (K_sigma)
-        # (Boulanger & Idriss, 2014)
-        f = 0.5 # Asumiendo arenas
-        K_sigma = 1 - 0.007 * ((sv_eff / Pa)**1.32 - 1) # Simplificado
-        K_sigma = min(K_sigma, 1.1) # Límite superior
-
-        # 4. Resistencia Cíclica (CRR) - (Idriss & Boulanger 2014 para N1_60_cs)
-        # Esta es una fórmula común y robusta
-        if N1_60_cs < 37:
-            CRR_7_5 = np.exp(
-                (N1_60_cs / 14.1) + 
-                (N1_60_cs / 126)**2 - 
-                (N1_60_cs / 23.6)**3 + 
-                (N1_60_cs / 25.4)**4 - 2.8
-            )
-        else:
-            # Suelo demasiado denso para licuarse por este método
-            CRR_7_5 = 2.0 # Un valor alto para indicar no licuefacción
-
-
-        # 5. Factor de Seguridad (FS)
-        FS_trad = (CRR_7_5 * MSF * K_sigma) / CSR
-        
-        return {
-            "FS_trad": FS_trad,
-            "CSR": CSR,
-            "CRR_adj": CRR_7_5 * MSF * K_sigma,
-            "rd": rd,
-            "MSF": MSF,
-            "K_sigma": K_sigma
-        }
-
-    except Exception as e:
-        print(f"Error en cálculo tradicional: {e}")
-        return {
-            "FS_trad": None,
-            "CSR": None,
-            "CRR_adj": None
-        }
\ No newline at end of file
+from functools import cached_property
+
+import numpy as np
+
+def calculate_traditional_fs(input_data: dict):
+    """
+    Calcula el Factor de Seguridad (FS) usando el método tradicional
+    simplificado (Seed & Idriss), basado en las fórmulas de tu notebook.
+    """
+    
+    try:
+        # Extraer variables del diccionario de entrada
+        z = input_data.get("z_m")           # Profundidad (m)
+        a_max = input_data.get("a_max")     # Aceleración máxima (g)
+        sv = input_data.get("estres_v_total") # Esfuerzo total (kPa)
+        sv_eff = input_data.get("estres_v_ef") # Esfuerzo efectivo (kPa)
+        Mw = input_data.get("Mw")           # Magnitud
+        N1_60_cs = input_data.get("N1_60_cs") # SPT corregido
+
+        g = 9.81 # Aceleración de la gravedad
+        Pa = 101.3  # Presión atmosférica en kPa
+
+        # 1. Cálculo del Esfuerzo Cíclico (CSR)
+        # Factor de reducción de esfuerzo (rd) - (Liao y Whitman, 1986)
+        if z <= 9.15:
+            rd = 1.0 - 0.00765 * z
+        else:
+            rd = 1.174 - 0.0267 * z
+            
+        CSR = 0.65 * (a_max) * (sv / sv_eff) * rd # a_max ya está en g
+
+        # 2. Factor de Escala de Magnitud (MSF) - (Idriss & Boulanger 2014)
+        MSF = 6.9 * np.exp(-Mw / 4) - 0.058
+        if MSF < 0.69: MSF = 0.69 # Límite inferior
+        
+        # 3. Factor de Corrección por Sobrecarga (K_sigma)
+        # (Boulanger & Idriss, 2014)
+        f = 0.5 # Asumiendo arenas
+        K_sigma = 1 - 0.007 * ((sv_eff / Pa)**1.32 - 1) # Simplificado
+        K_sigma = min(K_sigma, 1.1) # Límite superior
+
+        # 4. Resistencia Cíclica (CRR) - (Idriss & Boulanger 2014 para N1_60_cs)
+        # Esta es una fórmula común y robusta
+        if N1_60_cs < 37:
+            CRR_7_5 = np.exp(
+                (N1_60_cs / 14.1) + 
+                (N1_60_cs / 126)**2 - 
+                (N1_60_cs / 23.6)**3 + 
+                (N1_60_cs / 25.4)**4 - 2.8
+            )
+        else:
+            # Suelo demasiado denso para licuarse por este método
+            CRR_7_5 = 2.0 # Un valor alto para indicar no licuefacción
+
+
+        # 5. Factor de Seguridad (FS)
+        FS_trad = (CRR_7_5 * MSF * K_sigma) / CSR
+        
+        return {
+            "FS_trad": FS_trad,
+            "CSR": CSR,
+            "CRR_adj": CRR_7_5 * MSF * K_sigma,
+            "rd": rd,
+            "MSF": MSF,
+            "K_sigma": K_sigma
+        }
+
+    except Exception as e:
+        print(f"Error en cálculo tradicional: {e}")
+        return {
+            "FS_trad": None,
+            "CSR": None,
+            "CRR_adj": None
+        }
+
+# Columnas de entrada requeridas por el método tradicional (mismas claves que el dict)
+TRADITIONAL_COLUMNS = ["z_m", "a_max", "estres_v_total", "estres_v_ef", "Mw", "N1_60_cs"]
+
+PA_KPA = 101.3  # Presión atmosférica en kPa
+
+# Los métodos con corrección por finos usan además el contenido de finos (FC, %).
+# Como en mmc2.csv (de donde sale la columna N1_60_cs del modelo de IA), esos
+# métodos toman N1_60_cs como (N1)60 y aplican su propia corrección a arena limpia.
+METHOD_COLUMNS = TRADITIONAL_COLUMNS + ["FC"]
+
+
+class LayerTerms:
+    """
+    Entradas de un lote de estratos como arrays y términos intermedios
+    compartidos entre métodos (σv/σ'v, σ'v/Pa, rd, exp(-Mw/4), ...). Cada
+    término se calcula una sola vez, la primera vez que un método lo pide.
+    """
+
+    def __init__(self, data):
+        missing = [col for col in TRADITIONAL_COLUMNS if col not in data]
+        if missing:
+            raise ValueError(f"Faltan columnas para el método tradicional: {missing}")
+        self.z, self.a_max, self.sv, self.sv_eff, self.Mw, self.N1_60 = np.broadcast_arrays(
+            *[np.asarray(data[col], dtype=float) for col in TRADITIONAL_COLUMNS]
+        )
+        self.has_fc = "FC" in data
+        self.FC = np.broadcast_to(np.asarray(data["FC"], dtype=float) if self.has_fc else np.nan, self.z.shape)
+
+        # Filas con datos faltantes o esfuerzo efectivo nulo se marcan como inválidas
+        self.valido = np.isfinite(self.z) & np.isfinite(self.a_max) & np.isfinite(self.sv) \
+            & np.isfinite(self.sv_eff) & np.isfinite(self.Mw) & np.isfinite(self.N1_60) \
+            & (self.sv_eff > 0)
+        self.sv_eff_safe = np.where(self.valido, self.sv_eff, 1.0)
+
+    @cached_property
+    def stress_ratio(self):
+        """σv / σ'v"""
+        return self.sv / self.sv_eff_safe
+
+    @cached_property
+    def sv_eff_pa(self):
+        """σ'v / Pa"""
+        return self.sv_eff_safe / PA_KPA
+
+    @cached_property
+    def exp_Mw_4(self):
+        """exp(-Mw / 4), común a los MSF de Idriss & Boulanger"""
+        return np.exp(-self.Mw / 4)
+
+    @cached_property
+    def rd_liao_whitman(self):
+        """rd de Liao y Whitman (1986)"""
+        return np.where(self.z <= 9.15, 1.0 - 0.00765 * self.z, 1.174 - 0.0267 * self.z)
+
+    @cached_property
+    def rd_idriss_boulanger(self):
+        """rd de Idriss y Boulanger (2014), función de la profundidad y de Mw"""
+        alpha = -1.012 - 1.126 * np.sin(self.z / 11.73 + 5.133)
+        beta = 0.106 + 0.118 * np.sin(self.z / 11.28 + 5.142)
+        return np.exp(alpha + beta * self.Mw)
+
+    def csr(self, rd):
+        """CSR = 0.65 a_max (σv/σ'v) rd"""
+        return 0.65 * self.a_max * self.stress_ratio * rd
+
+    @cached_property
+    def n1_60cs_idriss_boulanger(self):
+        """(N1)60cs con la corrección por finos de Idriss y Boulanger (2014)"""
+        fc = self.FC + 0.01
+        return self.N1_60 + np.exp(1.63 + 9.7 / fc - (15.7 / fc) ** 2)
+
+    @cached_property
+    def crr_idriss_boulanger(self):
+        """CRR para M = 7.5 y σ'v = Pa de Idriss y Boulanger (2014) con (N1)60cs corregido"""
+        return _crr_idriss_boulanger(self.n1_60cs_idriss_boulanger)
+
+
+def _crr_idriss_boulanger(N1_60_cs):
+    """CRR para M=7.5 (Idriss & Boulanger 2014); suelos densos (N1_60_cs >= 37) se fijan en 2.0"""
+    return np.where(
+        N1_60_cs < 37,
+        np.exp(
+            (N1_60_cs / 14.1)
+            + (N1_60_cs / 126) ** 2
+            - (N1_60_cs / 23.6) ** 3
+            + (N1_60_cs / 25.4) ** 4
+            - 2.8
+        ),
+        2.0,
+    )
+
+
+# --- Registro de métodos de disparo ---
+# nombre -> (etiqueta, función(LayerTerms) -> dict de arrays, columnas requeridas).
+# Cada función devuelve FS, CSR, CRR_adj, rd, MSF y K_sigma (y P_L si es probabilístico).
+TRIGGERING_METHODS = {}
+
+
+def triggering_method(name, label, columns=TRADITIONAL_COLUMNS):
+    """Registra una función de método de disparo en TRIGGERING_METHODS."""
+    def register(func):
+        TRIGGERING_METHODS[name] = (label, func, list(columns))
+        return func
+    return register
+
+
+@triggering_method("simplificado", "Seed & Idriss simplificado")
+def _simplified(t):
+    # Igual a `calculate_traditional_fs`: rd de Liao y Whitman, MSF de
+    # Idriss & Boulanger (2014) y K_sigma simplificado, sin corrección por finos
+    rd = t.rd_liao_whitman
+    CSR = t.csr(rd)
+    MSF = np.maximum(6.9 * t.exp_Mw_4 - 0.058, 0.69)
+    K_sigma = np.minimum(1 - 0.007 * (t.sv_eff_pa ** 1.32 - 1), 1.1)
+    CRR_adj = _crr_idriss_boulanger(t.N1_60) * MSF * K_sigma
+    return {"FS": CRR_adj / CSR, "CSR": CSR, "CRR_adj": CRR_adj, "rd": rd, "MSF": MSF, "K_sigma": K_sigma}
+
+
+@triggering_method("idriss_boulanger_2014", "Idriss & Boulanger (2014)", METHOD_COLUMNS)
+def _idriss_boulanger_2014(t):
+    N1_60_cs = t.n1_60cs_idriss_boulanger
+    rd = t.rd_idriss_boulanger
+    CSR = t.csr(rd)
+    # MSF para arenas, dependiente de la densidad
+    MSF_max = np.minimum(1.09 + (N1_60_cs / 31.5) ** 2, 2.2)
+    MSF = 1 + (MSF_max - 1) * (8.64 * t.exp_Mw_4 - 1.325)
+    # (N1)60cs se limita a 37 (IB2014): por encima el denominador se anula en ~54.9 y cambia de signo
+    C_sigma = np.minimum(1 / (18.9 - 2.55 * np.sqrt(np.minimum(N1_60_cs, 37.0))), 0.3)
+    K_sigma = np.minimum(1 - C_sigma * np.log(t.sv_eff_pa), 1.1)
+    CRR_adj = t.crr_idriss_boulanger * MSF * K_sigma
+    return {"FS": CRR_adj / CSR, "CSR": CSR, "CRR_adj": CRR_adj, "rd": rd, "MSF": MSF, "K_sigma": K_sigma}
+
+
+@triggering_method("youd_2001", "Youd et al. (2001)", METHOD_COLUMNS)
+def _youd_2001(t):
+    # Corrección por finos de Idriss y Seed (NCEER)
+    FC = t.FC
+    alpha = np.where(FC <= 5, 0.0, np.where(FC < 35, np.exp(1.76 - 190 / np.maximum(FC, 5) ** 2), 5.0))
+    beta = np.where(FC <= 5, 1.0, np.where(FC < 35, 0.99 + FC ** 1.5 / 1000, 1.2))
+    N = alpha + beta * t.N1_60
+    rd = t.rd_liao_whitman
+    CSR = t.csr(rd)
+    # Arenas con (N1)60cs >= 30 se consideran no licuables (CRR fijo en 2.0)
+    CRR_7_5 = np.where(N < 30, 1 / (34 - N) + N / 135 + 50 / (10 * N + 45) ** 2 - 1 / 200, 2.0)
+    MSF = 10 ** 2.24 / t.Mw ** 2.56
+    K_sigma = np.minimum(t.sv_eff_pa ** (0.7 - 1), 1.0)  # f = 0.7
+    CRR_adj = CRR_7_5 * MSF * K_sigma
+    return {"FS": CRR_adj / CSR, "CSR": CSR, "CRR_adj": CRR_adj, "rd": rd, "MSF": MSF, "K_sigma": K_sigma}
+
+
+@triggering_method("cetin_2018", "Cetin et al. (2018), probabilístico", METHOD_COLUMNS)
+def _cetin_2018(t):
+    from scipy.special import ndtr
+
+    # El rd de Cetin et al. requiere Vs,12; sin ese dato se usa el de Idriss y Boulanger
+    rd = t.rd_idriss_boulanger
+    CSR = t.csr(rd)
+    # Magnitud y sobrecarga entran en la ecuación: MSF y K_sigma no se aplican por separado
+    resistance = t.N1_60 * (1 + 0.00167 * t.FC) - 27.352 * np.log(t.Mw) \
+        - 3.958 * np.log(t.sv_eff_pa) + 0.089 * t.FC + 16.084
+    CRR_adj = np.exp(resistance / 11.771)  # CRR con P_L = 50 %
+    P_L = ndtr(-(resistance - 11.771 * np.log(CSR)) / 2.95)
+    ones = np.ones_like(CSR)
+    return {"FS": CRR_adj / CSR, "CSR": CSR, "CRR_adj": CRR_adj, "rd": rd, "MSF": ones, "K_sigma": ones,
+            "P_L": P_L}
+
+
+def evaluate_methods(data, methods=None):
+    """
+    Evalúa los métodos `methods` (nombres de TRIGGERING_METHODS; por defecto
+    todos) sobre un lote en una sola pasada vectorizada: las entradas y los
+    términos comunes se preparan una vez y los comparten todos los métodos.
+
+    `data`: DataFrame o dict de arrays/escalares. Devuelve {método: dict de
+    arrays} con las filas inválidas en NaN y la máscara `valido` de cada método.
+    """
+    terms = LayerTerms(data)
+    results = {}
+    for name in methods or list(TRIGGERING_METHODS):
+        label, func, columns = TRIGGERING_METHODS[name]
+        if "FC" in columns and not terms.has_fc:
+            raise ValueError(f"El método {label} requiere la columna FC.")
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            method = func(terms)
+        valido = terms.valido & np.isfinite(method["FS"])
+        method = {key: np.where(valido, values, np.nan) for key, values in method.items()}
+        method["valido"] = valido
+        results[name] = method
+    return results
+
+
+def method_columns(evaluated):
+    """
+    Columnas FS_<método> (y P_L_<método> para los probabilísticos) a partir
+    del resultado de `evaluate_methods`, para agregarlas a una tabla de lote.
+    """
+    columns = {}
+    for name, method in evaluated.items():
+        columns[f"FS_{name}"] = method["FS"]
+        if "P_L" in method:
+            columns[f"P_L_{name}"] = method["P_L"]
+    return columns
+
+
+def calculate_traditional_fs_batch(data):
+    """
+    Versión vectorizada de `calculate_traditional_fs` para muchos estratos a la vez.
+
+    `data` puede ser un DataFrame o un dict de arrays/escalares con las columnas
+    de TRADITIONAL_COLUMNS. Devuelve un dict de arrays (FS_trad, CSR, CRR_adj,
+    rd, MSF, K_sigma) más la máscara booleana `valido`; las filas inválidas
+    quedan en NaN en lugar de abortar todo el lote.
+    """
+    results = evaluate_methods(data, ["simplificado"])["simplificado"]
+    results["FS_trad"] = results.pop("FS")
+    return {key: results[key] for key in ["FS_trad", "CSR", "CRR_adj", "rd", "MSF", "K_sigma", "valido"]}